@@ -0,0 +1,89 @@
+import re
+
+from iconservice import *
+from iconservice.database.db import DatabaseObserver
+
+_ADDRESS_PATTERN = re.compile(r'(hx|cx)[0-9a-f]{40}')
+_NUMBER_PATTERN = re.compile(r'\d+')
+
+
+def normalize_key(key: bytes) -> str:
+    """
+    Returns a readable pattern of a SCORE storage key, e.g. 'RECORD_{n}_TOKEN_ID' for VarDB keys
+    and 'token_owner[]' for DictDB items. Token IDs, indexes and addresses are replaced with placeholders,
+    so that keys of the same kind are grouped together.
+    """
+    parts = key.split(b'|', 2)
+    if len(parts) < 2:
+        return '{raw}'
+
+    name = parts[1].decode('utf-8', errors='replace')
+    name = _ADDRESS_PATTERN.sub('{address}', name)
+    name = _NUMBER_PATTERN.sub('{n}', name)
+    if len(parts) == 3:
+        return f'{name}[]'
+    return name
+
+
+class StorageCounter(DatabaseObserver):
+    """
+    Database observer that counts reads, writes and deletes of a SCORE storage, together with
+    the number of bytes read and written. Counts are grouped by normalized key.
+    Counting is done only while enabled, so that state setup is not included in results.
+    """
+
+    def __init__(self):
+        super().__init__(self._on_get, self._on_put, self._on_delete)
+        self.enabled = False
+        self.keys = {}
+
+    def attach(self, score: IconScoreBase):
+        """
+        Attaches counter to SCORE database. Containers created in SCORE constructor keep the observer that was
+        set at their creation, so they are attached one by one.
+        """
+        score._db.set_observer(self)
+        for attribute in vars(score).values():
+            if isinstance(attribute, (VarDB, DictDB, ArrayDB)):
+                attribute._db.set_observer(self)
+
+    def reset(self):
+        self.keys = {}
+
+    def totals(self) -> dict:
+        totals = self._empty_counts()
+        for counts in self.keys.values():
+            for name, value in counts.items():
+                totals[name] += value
+        return totals
+
+    def report(self) -> dict:
+        report = self.totals()
+        report['keys'] = {key: dict(counts) for key, counts in sorted(self.keys.items())}
+        return report
+
+    def _record(self, key: bytes, name: str, size: int):
+        if not self.enabled:
+            return
+        counts = self.keys.setdefault(normalize_key(key), self._empty_counts())
+        counts[name] += 1
+        if name == 'reads':
+            counts['read_bytes'] += size
+        elif name == 'writes':
+            counts['write_bytes'] += size
+
+    def _on_get(self, context, key: bytes, value: bytes):
+        self._record(key, 'reads', len(value) if value else 0)
+
+    def _on_put(self, context, key: bytes, old_value: bytes, new_value: bytes):
+        if new_value:
+            self._record(key, 'writes', len(new_value))
+        elif old_value:
+            self._record(key, 'deletes', 0)
+
+    def _on_delete(self, context, key: bytes, old_value: bytes):
+        self._record(key, 'deletes', 0)
+
+    @staticmethod
+    def _empty_counts() -> dict:
+        return {'reads': 0, 'writes': 0, 'deletes': 0, 'read_bytes': 0, 'write_bytes': 0}
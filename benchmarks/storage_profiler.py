@@ -0,0 +1,71 @@
+import os
+import sys
+
+from iconservice import *
+
+from .storage_counter import StorageCounter, normalize_key
+
+_LIBRARY_PATHS = (os.sep + 'iconservice' + os.sep, os.sep + 'tbears' + os.sep)
+
+
+class StorageProfiler(StorageCounter):
+    """
+    Storage counter that attributes every storage access to the chain of SCORE methods that caused it.
+    Each access is recorded under a stack of method names, followed by the normalized key and the type
+    of access, e.g. ('transfer', '_transfer', '_remove_tokens_from', 'balanceOf', 'owned_token_count[]', 'read').
+    Stacks can be written in folded format used by flamegraph tools (flamegraph.pl, speedscope, inferno).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.stacks = {}
+
+    def reset(self):
+        super().reset()
+        self.stacks = {}
+
+    def folded_stacks(self) -> list:
+        """ Returns lines in folded stack format: 'method;helper;key;access count'. """
+        return [f"{';'.join(stack)} {count}" for stack, count in sorted(self.stacks.items())]
+
+    def write_folded_stacks(self, _path: str):
+        with open(_path, 'w') as folded_file:
+            for line in self.folded_stacks():
+                folded_file.write(line + '\n')
+
+    def call_tree(self) -> dict:
+        """
+        Returns stacks merged into a tree. Every node holds 'count' of accesses made by it and its children,
+        and 'children' keyed by method name, key pattern or access type.
+        """
+        tree = {'count': 0, 'children': {}}
+        for stack, count in self.stacks.items():
+            node = tree
+            node['count'] += count
+            for frame in stack:
+                node = node['children'].setdefault(frame, {'count': 0, 'children': {}})
+                node['count'] += count
+        return tree
+
+    def _record(self, key: bytes, name: str, size: int):
+        if not self.enabled:
+            return
+        super()._record(key, name, size)
+
+        access = {'reads': 'read', 'writes': 'write', 'deletes': 'delete'}[name]
+        stack = self._score_call_stack() + (normalize_key(key), access)
+        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    @staticmethod
+    def _score_call_stack() -> tuple:
+        """ Returns names of SCORE methods on the current call stack, outermost first. """
+        names = []
+        frame = sys._getframe(1)
+        while frame is not None:
+            code = frame.f_code
+            if isinstance(frame.f_locals.get('self'), IconScoreBase) and \
+                    not any(path in code.co_filename for path in _LIBRARY_PATHS):
+                names.append(code.co_name)
+            frame = frame.f_back
+        names.reverse()
+        return tuple(names)
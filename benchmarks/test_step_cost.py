@@ -0,0 +1,372 @@
+"""
+Step-cost benchmarks for external methods of Nebula SCOREs.
+
+Every method is called on a SCORE whose state was prepared with a given number of tokens per owner
+(listed tokens, sale records and whitelist records scale with it as well). Storage reads, writes and deletes
+of each call are counted and written to a JSON report. A call that needs more storage operations than
+recorded in the baseline fails the benchmark, and so does an external method that is not measured.
+
+Environment variables:
+    NEBULA_BENCHMARK_SIZES - comma separated state sizes (default: 1,100). Use 1,100,10000 for a full run.
+    NEBULA_BENCHMARK_REPORT - path of the JSON report (default: benchmarks/step_cost_report.json)
+    NEBULA_BENCHMARK_UPDATE_BASELINE - when set to 1, measured values are written to the baseline file
+"""
+import json
+import os
+
+from tbears.libs.scoretest.score_test_case import ScoreTestCase
+from iconservice import *
+from iconservice.iconscore.icon_score_constant import CONST_SCORE_FLAG, ScoreFlag
+
+from nebula_planet_token.nebula_planet_token import NebulaPlanetToken
+from nebula_spaceship_token.nebula_spaceship_token import NebulaSpaceshipToken
+from nebula_token_claiming.nebula_token_claiming import NebulaTokenClaiming
+from .storage_counter import StorageCounter
+
+DIR_PATH = os.path.abspath(os.path.dirname(__file__))
+BASELINE_PATH = os.path.join(DIR_PATH, 'step_cost_baseline.json')
+REPORT_PATH = os.environ.get('NEBULA_BENCHMARK_REPORT', os.path.join(DIR_PATH, 'step_cost_report.json'))
+SIZES = [int(size) for size in os.environ.get('NEBULA_BENCHMARK_SIZES', '1,100').split(',')]
+UPDATE_BASELINE = os.environ.get('NEBULA_BENCHMARK_UPDATE_BASELINE') == '1'
+
+GATED_COUNTS = ('reads', 'writes', 'deletes')
+TOKEN_PRICE = 1000000000000000000
+HOUR = 3600 * 1000 * 1000
+
+_results = {}
+
+
+def tearDownModule():
+    with open(REPORT_PATH, 'w') as report_file:
+        json.dump({'sizes': SIZES, 'results': _results}, report_file, indent=2, sort_keys=True)
+
+    if UPDATE_BASELINE:
+        baseline = _load_baseline()
+        for contract, methods in _results.items():
+            for method, sizes in methods.items():
+                for size, counts in sizes.items():
+                    baseline.setdefault(contract, {}).setdefault(method, {})[size] = \
+                        {name: counts[name] for name in GATED_COUNTS}
+        with open(BASELINE_PATH, 'w') as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+
+
+def _load_baseline() -> dict:
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as baseline_file:
+        return json.load(baseline_file)
+
+
+class StepCostTestCase(ScoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.counter = StorageCounter()
+        self.baseline = _load_baseline()
+        self.regressions = []
+        self.timestamp = 1600000000000000
+        self.block_height = 1
+        self.set_block(self.block_height, self.timestamp)
+
+    def advance_time(self, _duration: int):
+        self.block_height += 1
+        self.timestamp += _duration
+        self.set_block(self.block_height, self.timestamp)
+
+    def create_score(self, _score_class):
+        score = self.get_score_instance(_score_class, self.test_account1)
+        self.initialize_accounts({score.address: 10 ** 30})
+        self.counter.attach(score)
+        return score
+
+    def measure(self, _contract: str, _method: str, _size: int, _call):
+        """ Calls _call with storage counting enabled and compares result with the baseline. """
+        self.counter.reset()
+        self.counter.enabled = True
+        try:
+            _call()
+        finally:
+            self.counter.enabled = False
+
+        report = self.counter.report()
+        _results.setdefault(_contract, {}).setdefault(_method, {})[str(_size)] = report
+
+        expected = self.baseline.get(_contract, {}).get(_method, {}).get(str(_size))
+        if expected and not UPDATE_BASELINE:
+            for name in GATED_COUNTS:
+                if report[name] > expected[name]:
+                    self.regressions.append(
+                        f'{_contract}.{_method} (size {_size}): {name} {report[name]} > baseline {expected[name]}')
+
+    def assert_no_regressions(self):
+        self.assertEqual([], self.regressions, 'Storage operations per call increased:\n' + '\n'.join(self.regressions))
+
+    def assert_all_externals_measured(self, _score_class):
+        externals = {name for name, function in vars(_score_class).items()
+                     if ScoreFlag.EXTERNAL in ScoreFlag(getattr(function, CONST_SCORE_FLAG, 0))}
+        self.assertEqual(set(), externals - set(_results[_score_class.__name__]), 'External methods without benchmark')
+
+
+class TestTokenStepCost(StepCostTestCase):
+
+    def test_planet_token_step_cost(self):
+        for size in SIZES:
+            self._run_token_benchmark(NebulaPlanetToken, size)
+        self.assert_no_regressions()
+        self.assert_all_externals_measured(NebulaPlanetToken)
+
+    def test_spaceship_token_step_cost(self):
+        for size in SIZES:
+            self._run_token_benchmark(NebulaSpaceshipToken, size)
+        self.assert_no_regressions()
+        self.assert_all_externals_measured(NebulaSpaceshipToken)
+
+    def _prepare_token_state(self, _score, _size: int):
+        """ Mints _size tokens to test_account1, lists all of them and creates _size sale records. """
+        self.set_msg(self.test_account1)
+        for token_id in range(1, _size + 1):
+            _score.mint(self.test_account1, token_id, f'{token_id}.json')
+            _score.list_token(token_id, TOKEN_PRICE)
+            _score._create_sale_record(_token_id=token_id,
+                                       _type='sale_success',
+                                       _seller=self.test_account1,
+                                       _buyer=self.test_account2,
+                                       _starting_price=TOKEN_PRICE,
+                                       _final_price=TOKEN_PRICE,
+                                       _end_time=self.timestamp)
+
+    def _run_token_benchmark(self, _score_class, _size: int):
+        score = self.create_score(_score_class)
+        contract = _score_class.__name__
+        self._prepare_token_state(score, _size)
+        next_token_id = [_size]
+
+        def new_token() -> int:
+            next_token_id[0] += 1
+            self.set_msg(self.test_account1)
+            score.mint(self.test_account1, next_token_id[0], f'{next_token_id[0]}.json')
+            return next_token_id[0]
+
+        def measure(_method: str, _call, _sender: Address = None, _value: int = 0):
+            self.set_msg(_sender or self.test_account1, _value)
+            self.measure(contract, _method, _size, _call)
+
+        measure('mint', lambda: new_token())
+
+        token_id = new_token()
+        measure('approve', lambda: score.approve(self.test_account2, token_id))
+
+        token_id = new_token()
+        measure('transfer', lambda: score.transfer(self.test_account2, token_id))
+
+        token_id = new_token()
+        score.approve(self.test_account2, token_id)
+        measure('transferFrom', lambda: score.transferFrom(self.test_account1, self.test_account2, token_id),
+                self.test_account2)
+
+        token_id = new_token()
+        measure('list_token', lambda: score.list_token(token_id, TOKEN_PRICE))
+        measure('delist_token', lambda: score.delist_token(token_id))
+
+        token_id = new_token()
+        score.list_token(token_id, TOKEN_PRICE)
+        measure('purchase_token', lambda: score.purchase_token(token_id), self.test_account2, TOKEN_PRICE)
+
+        token_id = new_token()
+        measure('create_auction', lambda: score.create_auction(token_id, TOKEN_PRICE, 1))
+        measure('place_bid', lambda: score.place_bid(token_id), self.test_account2, TOKEN_PRICE)
+        measure('get_auction_info', lambda: score.get_auction_info(token_id))
+        measure('get_bid_history', lambda: score.get_bid_history(token_id))
+
+        unsold_token_id = new_token()
+        score.create_auction(unsold_token_id, TOKEN_PRICE, 1)
+
+        cancelled_token_id = new_token()
+        score.create_auction(cancelled_token_id, TOKEN_PRICE, 24)
+        measure('cancel_auction', lambda: score.cancel_auction(cancelled_token_id))
+
+        dutch_token_id = new_token()
+        measure('create_dutch_auction',
+                lambda: score.create_dutch_auction(dutch_token_id, 2 * TOKEN_PRICE, TOKEN_PRICE, 1))
+        measure('get_dutch_auction_info', lambda: score.get_dutch_auction_info(dutch_token_id))
+        measure('purchase_dutch_auction', lambda: score.purchase_dutch_auction(dutch_token_id), self.test_account2,
+                2 * TOKEN_PRICE)
+
+        batched_token_id = new_token()
+        measure('create_batched_auction', lambda: score.create_batched_auction(batched_token_id, TOKEN_PRICE, 1))
+        measure('place_batched_bid', lambda: score.place_batched_bid(batched_token_id), self.test_account2, TOKEN_PRICE)
+        self.set_msg(self.test_account2, TOKEN_PRICE)
+        score.place_batched_bid(batched_token_id)
+        measure('get_batched_auction_info', lambda: score.get_batched_auction_info(batched_token_id))
+
+        self.advance_time(2 * HOUR)
+        measure('finalize_auction', lambda: score.finalize_auction(token_id), self.test_account2)
+        measure('return_unsold_item', lambda: score.return_unsold_item(unsold_token_id))
+        measure('settle_auction', lambda: score.settle_auction(batched_token_id))
+        measure('refund_balance', lambda: score.refund_balance(self.test_account2))
+        measure('withdraw_refund', lambda: score.withdraw_refund(), self.test_account2)
+
+        token_id = new_token()
+        measure('make_offer', lambda: score.make_offer(token_id), self.test_account2, TOKEN_PRICE)
+        measure('offers_for_token', lambda: score.offers_for_token(token_id))
+        measure('token_offer_count', lambda: score.token_offer_count(token_id))
+        measure('cancel_offer', lambda: score.cancel_offer(token_id), self.test_account2)
+        self.set_msg(self.test_account2, TOKEN_PRICE)
+        score.make_offer(token_id)
+        measure('accept_offer', lambda: score.accept_offer(token_id))
+
+        token_id = new_token()
+        measure('make_collection_offer', lambda: score.make_collection_offer(), self.test_account2, TOKEN_PRICE)
+        measure('cancel_collection_offer', lambda: score.cancel_collection_offer(score._collection_offer_count.get()),
+                self.test_account2)
+        self.set_msg(self.test_account2, TOKEN_PRICE)
+        score.make_collection_offer()
+        measure('best_collection_offer', lambda: score.best_collection_offer())
+        measure('get_collection_offer', lambda: score.get_collection_offer(score._collection_offer_count.get()))
+        measure('open_collection_offer_count', lambda: score.open_collection_offer_count())
+        measure('accept_collection_offer', lambda: score.accept_collection_offer(token_id))
+
+        token_id = new_token()
+        measure('set_token_URI', lambda: score.set_token_URI(token_id, 'custom.json'))
+        measure('burn', lambda: score.burn(token_id))
+
+        token_id = new_token()
+        token_ids = list(range(1, min(_size, 100) + 1))
+        measure('balanceOf', lambda: score.balanceOf(self.test_account1))
+        measure('ownerOf', lambda: score.ownerOf(token_id))
+        measure('getApproved', lambda: score.getApproved(token_id))
+        measure('tokenURI', lambda: score.tokenURI(token_id))
+        measure('tokenByIndex', lambda: score.tokenByIndex(1))
+        measure('tokenOfOwnerByIndex', lambda: score.tokenOfOwnerByIndex(self.test_account1, 1))
+        measure('totalSupply', lambda: score.totalSupply())
+        measure('owned_tokens', lambda: score.owned_tokens(self.test_account1))
+        measure('owners_of', lambda: score.owners_of(token_ids))
+        measure('token_URIs', lambda: score.token_URIs(token_ids))
+        measure('token_details', lambda: score.token_details(token_ids))
+        measure('exists_batch', lambda: score.exists_batch(token_ids))
+        measure('get_token_price', lambda: score.get_token_price(1))
+        measure('listed_tokens', lambda: score.listed_tokens(0))
+        measure('listed_tokens_by_owner', lambda: score.listed_tokens_by_owner(self.test_account1))
+        measure('get_listed_token_by_index', lambda: score.get_listed_token_by_index(1))
+        measure('get_listed_token_of_owner_by_index',
+                lambda: score.get_listed_token_of_owner_by_index(self.test_account1, 1))
+        measure('get_sale_record', lambda: score.get_sale_record(1))
+        measure('sale_record_count', lambda: score.sale_record_count())
+        measure('name', lambda: score.name())
+        measure('symbol', lambda: score.symbol())
+        measure('metadata_base_URL', lambda: score.metadata_base_URL())
+        measure('token_URI_template', lambda: score.token_URI_template())
+        measure('seller_fee', lambda: score.seller_fee())
+        measure('get_approved_contract', lambda: score.get_approved_contract())
+        measure('total_listed_token_count', lambda: score.total_listed_token_count())
+        measure('listed_token_count_by_owner', lambda: score.listed_token_count_by_owner(self.test_account1))
+        measure('listed_tokens_by_cursor', lambda: score.listed_tokens_by_cursor())
+        measure('listings_of_owner', lambda: score.listings_of_owner(self.test_account1))
+        measure('sale_record_capacity', lambda: score.sale_record_capacity())
+        measure('token_sale_record_count', lambda: score.token_sale_record_count(1))
+        measure('seller_sale_record_count', lambda: score.seller_sale_record_count(self.test_account1))
+        measure('buyer_sale_record_count', lambda: score.buyer_sale_record_count(self.test_account2))
+        measure('token_sale_history', lambda: score.token_sale_history(1))
+        measure('sales_by_seller', lambda: score.sales_by_seller(self.test_account1))
+        measure('purchases_by_buyer', lambda: score.purchases_by_buyer(self.test_account2))
+        measure('sale_stats', lambda: score.sale_stats())
+        day = self.timestamp // score._DAY_IN_MICROSECONDS
+        measure('daily_volume', lambda: score.daily_volume(day, day))
+        measure('marketplace_overview', lambda: score.marketplace_overview())
+        measure('migration_status', lambda: score.migration_status())
+
+        measure('set_metadata_base_URL', lambda: score.set_metadata_base_URL('https://example.com/'))
+        measure('set_token_URI_template', lambda: score.set_token_URI_template('{id}.json'))
+        measure('set_seller_fee', lambda: score.set_seller_fee(2500))
+        measure('set_approved_contract', lambda: score.set_approved_contract(self.test_account2))
+        measure('assign_treasurer', lambda: score.assign_treasurer(self.test_account1))
+        measure('assign_minter', lambda: score.assign_minter(self.test_account1))
+        measure('pause_contract', lambda: score.pause_contract())
+        measure('unpause_contract', lambda: score.unpause_contract())
+        measure('restrict_sale', lambda: score.restrict_sale())
+        measure('unrestrict_sale', lambda: score.unrestrict_sale())
+        measure('withdraw', lambda: score.withdraw(1))
+        capacity = score._sale_record_count.get() + 100
+        measure('set_sale_record_capacity', lambda: score.set_sale_record_capacity(capacity))
+
+        # Snapshot import and storage migration need a paused contract
+        self.set_msg(self.test_account1)
+        score.pause_contract()
+        token_ids = [next_token_id[0] + 1, next_token_id[0] + 2, next_token_id[0] + 3]
+        measure('import_tokens', lambda: score.import_tokens(self.test_account1, token_ids, ['imported.json'] * 3))
+        measure('import_listings', lambda: score.import_listings(self.test_account1, token_ids,
+                                                                 [TOKEN_PRICE, -1, score._DUTCH_AUCTION_PRICE]))
+        measure('import_auction',
+                lambda: score.import_auction(token_ids[1], TOKEN_PRICE, self.timestamp, self.timestamp + HOUR))
+        measure('import_dutch_auction', lambda: score.import_dutch_auction(token_ids[2], 2 * TOKEN_PRICE, TOKEN_PRICE,
+                                                                           self.timestamp, self.timestamp + HOUR))
+        measure('import_sale_records',
+                lambda: score.import_sale_records([token_ids[0]], ['sale_success'], [self.test_account1],
+                                                  [self.test_account2], [TOKEN_PRICE], [TOKEN_PRICE],
+                                                  [self.timestamp], [self.timestamp]))
+        measure('close_snapshot_import', lambda: score.close_snapshot_import())
+
+        # Last migration step runs again over listings that already use the new layout
+        score._storage_version.set(len(score._migration_steps()) - 1)
+        score.on_update()
+        measure('run_migration', lambda: score.run_migration(100))
+
+
+class TestClaimingStepCost(StepCostTestCase):
+
+    def test_token_claiming_step_cost(self):
+        for size in SIZES:
+            self._run_claiming_benchmark(size)
+        self.assert_no_regressions()
+        self.assert_all_externals_measured(NebulaTokenClaiming)
+
+    def _run_claiming_benchmark(self, _size: int):
+        score = self.create_score(NebulaTokenClaiming)
+        contract = NebulaTokenClaiming.__name__
+        nft_address = Address.from_string(f"cx{'1234' * 10}")
+        self.set_msg(self.test_account1)
+        score.set_nonfungible_token_contract(nft_address)
+        self.patch_internal_method(nft_address, 'ownerOf', lambda _tokenId: score.address)
+
+        # Every listed token has one whitelist record
+        for token_id in range(1, _size + 1):
+            score.list_token(token_id, TOKEN_PRICE)
+            score.add_whitelist_record(token_id, self.test_account2, TOKEN_PRICE)
+
+        def measure(_method: str, _call, _sender: Address = None, _value: int = 0):
+            self.set_msg(_sender or self.test_account1, _value)
+            self.measure(contract, _method, _size, _call)
+
+        token_id = _size + 1
+        measure('list_token', lambda: score.list_token(token_id, TOKEN_PRICE))
+        measure('add_whitelist_record', lambda: score.add_whitelist_record(token_id, self.test_account2, TOKEN_PRICE))
+        measure('get_whitelist_record', lambda: score.get_whitelist_record(token_id, self.test_account2))
+        measure('get_token_listing', lambda: score.get_token_listing(token_id))
+        measure('claim_token', lambda: score.claim_token(token_id), self.test_account2, TOKEN_PRICE)
+
+        token_ids = [_size + 2, _size + 3]
+        self.set_msg(self.test_account1)
+        for claimed_token_id in token_ids:
+            score.list_token(claimed_token_id, TOKEN_PRICE)
+            score.add_whitelist_record(claimed_token_id, self.test_account2, TOKEN_PRICE)
+        measure('claim_tokens', lambda: score.claim_tokens(token_ids), self.test_account2, 2 * TOKEN_PRICE)
+
+        token_id = _size + 4
+        self.set_msg(self.test_account1)
+        score.list_token(token_id, TOKEN_PRICE)
+        measure('delist_token', lambda: score.delist_token(token_id))
+        measure('name', lambda: score.name())
+        measure('get_whitelist_duration', lambda: score.get_whitelist_duration())
+        measure('get_nonfungible_token_contract_address', lambda: score.get_nonfungible_token_contract_address())
+        measure('transferToken', lambda: score.transferToken(self.test_account2, 1))
+        measure('total_listed_token_count', lambda: score.total_listed_token_count())
+        measure('set_whitelist_duration', lambda: score.set_whitelist_duration(60))
+        measure('assign_distributor', lambda: score.assign_distributor(self.test_account1))
+        measure('assign_treasurer', lambda: score.assign_treasurer(self.test_account1))
+        measure('assign_operator', lambda: score.assign_operator(self.test_account1))
+        measure('set_nonfungible_token_contract', lambda: score.set_nonfungible_token_contract(nft_address))
+        measure('withdraw', lambda: score.withdraw(1))
+
+        self.advance_time(2 * HOUR)
+        measure('prune_expired_whitelists', lambda: score.prune_expired_whitelists(100))
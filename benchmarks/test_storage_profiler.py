@@ -0,0 +1,50 @@
+from tbears.libs.scoretest.score_test_case import ScoreTestCase
+from iconservice import *
+
+from nebula_planet_token.nebula_planet_token import NebulaPlanetToken
+from .storage_profiler import StorageProfiler
+
+
+class TestStorageProfiler(ScoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.score = self.get_score_instance(NebulaPlanetToken, self.test_account1)
+        self.profiler = StorageProfiler()
+        self.profiler.attach(self.score)
+
+    def test_attributes_accesses_to_score_methods(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 1, "1.json")
+
+        self.profiler.enabled = True
+        self.score.transfer(self.test_account2, 1)
+        self.profiler.enabled = False
+
+        stacks = self.profiler.stacks
+        self.assertEqual(stacks[('transfer', '_transfer', '_add_tokens_to', 'token_owner[]', 'write')], 1)
+        self.assertEqual(stacks[('transfer', '_transfer', '_remove_tokens_from', '_remove_owner_token_index',
+                                 '{address}_{n}', 'delete')], 1)
+        self.assertEqual(sum(stacks.values()), self.profiler.totals()['reads'] + self.profiler.totals()['writes'] +
+                         self.profiler.totals()['deletes'])
+
+    def test_folded_stacks_and_call_tree(self):
+        self.set_msg(self.test_account1)
+
+        self.profiler.enabled = True
+        self.score.set_seller_fee(2500)
+        self.profiler.enabled = False
+
+        self.assertEqual(self.profiler.folded_stacks(), [
+            'set_seller_fee;director;read 1',
+            'set_seller_fee;seller_fee;write 1'
+        ])
+        tree = self.profiler.call_tree()
+        self.assertEqual(tree['count'], 2)
+        self.assertEqual(tree['children']['set_seller_fee']['children']['seller_fee']['count'], 1)
+
+    def test_does_not_record_when_disabled(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 1, "1.json")
+
+        self.assertEqual(self.profiler.stacks, {})
@@ -0,0 +1,110 @@
+"""
+Simulated marketplace workload for Nebula SCOREs.
+
+A seeded sequence of listings, repricings, purchases, auctions, bids and claims is executed against local
+SCORE instances. Storage operations of every call are counted and reported as p50/p99 per method, together
+with the growth of token SCORE storage over time.
+
+Environment variables:
+    NEBULA_WORKLOAD_SEED - random seed (default: 1)
+    NEBULA_WORKLOAD_USERS - number of users (default: 50)
+    NEBULA_WORKLOAD_TOKENS - number of tokens minted before the workload starts (default: 200)
+    NEBULA_WORKLOAD_OPERATIONS - number of workload actions (default: 300)
+    NEBULA_WORKLOAD_REPORT - path of the JSON report (default: benchmarks/workload_report.json)
+"""
+import json
+import os
+
+from tbears.libs.scoretest.score_test_case import ScoreTestCase
+from iconservice import *
+
+from nebula_planet_token.nebula_planet_token import NebulaPlanetToken
+from nebula_token_claiming.nebula_token_claiming import NebulaTokenClaiming
+from .workload import CLAIMING_CONTRACT, DEFAULT_WEIGHTS, ICX, TOKEN_CONTRACT, MarketplaceWorkload, \
+    WorkloadDriver, percentile
+
+DIR_PATH = os.path.abspath(os.path.dirname(__file__))
+REPORT_PATH = os.environ.get('NEBULA_WORKLOAD_REPORT', os.path.join(DIR_PATH, 'workload_report.json'))
+SEED = int(os.environ.get('NEBULA_WORKLOAD_SEED', '1'))
+USER_COUNT = int(os.environ.get('NEBULA_WORKLOAD_USERS', '50'))
+TOKEN_COUNT = int(os.environ.get('NEBULA_WORKLOAD_TOKENS', '200'))
+OPERATION_COUNT = int(os.environ.get('NEBULA_WORKLOAD_OPERATIONS', '300'))
+
+
+def create_users(_count: int) -> list:
+    return [Address.from_prefix_and_int(AddressPrefix.EOA, index) for index in range(1, _count + 1)]
+
+
+class TestMarketplaceWorkload(ScoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.users = create_users(USER_COUNT)
+
+    def _create_scores(self) -> dict:
+        token_score = self.get_score_instance(NebulaPlanetToken, self.test_account1)
+        claiming_score = self.get_score_instance(NebulaTokenClaiming, self.test_account1)
+        nft_address = Address.from_string(f"cx{'1234' * 10}")
+        self.set_msg(self.test_account1)
+        claiming_score.set_nonfungible_token_contract(nft_address)
+        self.patch_internal_method(nft_address, 'ownerOf', lambda _tokenId: claiming_score.address)
+
+        balances = {user: 10 ** 9 * ICX for user in self.users}
+        balances[token_score.address] = 10 ** 9 * ICX
+        self.initialize_accounts(balances)
+        return {TOKEN_CONTRACT: token_score, CLAIMING_CONTRACT: claiming_score}
+
+    def test_marketplace_workload(self):
+        workload = MarketplaceWorkload(SEED, self.users, TOKEN_COUNT, self.test_account1)
+        driver = WorkloadDriver(self, self._create_scores())
+        driver.execute(workload.setup_operations(), _measure=False)
+        driver.sample_state()
+
+        driver.execute(workload.operations(OPERATION_COUNT))
+        driver.sample_state()
+
+        report = driver.report()
+        report.update({"seed": SEED, "users": USER_COUNT, "tokens": TOKEN_COUNT})
+        with open(REPORT_PATH, 'w') as report_file:
+            json.dump(report, report_file, indent=2, sort_keys=True)
+
+        self.assertEqual(report['failures'], {})
+        self.assertEqual(sorted(report['methods']), sorted([
+            'NebulaPlanetToken.create_auction',
+            'NebulaPlanetToken.delist_token',
+            'NebulaPlanetToken.finalize_auction',
+            'NebulaPlanetToken.list_token',
+            'NebulaPlanetToken.place_bid',
+            'NebulaPlanetToken.purchase_token',
+            'NebulaPlanetToken.return_unsold_item',
+            'NebulaTokenClaiming.add_whitelist_record',
+            'NebulaTokenClaiming.claim_token',
+            'NebulaTokenClaiming.list_token',
+        ]))
+        self.assertEqual(report['state_growth'][0]['operations'], 0)
+
+    def test_workload_is_reproducible(self):
+        def generate(_seed: int) -> list:
+            workload = MarketplaceWorkload(_seed, self.users, TOKEN_COUNT, self.test_account1)
+            return workload.setup_operations() + list(workload.operations(OPERATION_COUNT))
+
+        self.assertEqual(generate(SEED), generate(SEED))
+        self.assertNotEqual(generate(SEED), generate(SEED + 1))
+
+    def test_generates_only_weighted_actions(self):
+        weights = {name: 0 for name in DEFAULT_WEIGHTS}
+        weights['list_token'] = 1
+        workload = MarketplaceWorkload(SEED, self.users, 10, self.test_account1, weights)
+        workload.setup_operations()
+
+        operations = list(workload.operations(10))
+
+        self.assertEqual({operation.method for operation in operations}, {'list_token'})
+        self.assertEqual(len(workload.listings), 10)
+
+    def test_percentile(self):
+        values = list(range(100, 0, -1))
+
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 99), 7)
@@ -0,0 +1,261 @@
+import math
+import random
+from collections import namedtuple
+
+from iconservice import *
+
+from nebula_snapshot.storage import dump_score_storage
+from .storage_counter import StorageCounter
+
+ICX = 1000000000000000000
+SECOND = 1000 * 1000
+HOUR = 3600 * SECOND
+
+TOKEN_CONTRACT = 'token'
+CLAIMING_CONTRACT = 'claiming'
+
+# Operation of a workload. Contract is TOKEN_CONTRACT or CLAIMING_CONTRACT, time is block timestamp.
+Operation = namedtuple('Operation', ['contract', 'method', 'sender', 'value', 'params', 'time'])
+
+DEFAULT_WEIGHTS = {
+    'list_token': 20,
+    'reprice_token': 10,
+    'purchase_token': 15,
+    'create_auction': 10,
+    'place_bid': 25,
+    'finalize_auction': 10,
+    'return_unsold_item': 5,
+    'claim_token': 5,
+}
+
+
+class MarketplaceWorkload:
+    """
+    Generates a seeded, reproducible sequence of marketplace operations. The generator keeps its own model
+    of token owners, listings and auctions, so every generated operation is valid when operations are
+    executed in order. Actions are picked by weight among the ones possible in the current state:
+    listing, repricing (delist + list), purchasing, creating auctions, bidding, finalizing auctions,
+    returning unsold items and claiming whitelisted tokens from the claiming contract.
+    """
+
+    def __init__(self, _seed: int, _users: list, _token_count: int, _minter: Address, _weights: dict = None,
+                 _start_time: int = 1600000000000000):
+        self._random = random.Random(_seed)
+        self._users = _users
+        self._token_count = _token_count
+        self._minter = _minter
+        self._weights = _weights or DEFAULT_WEIGHTS
+        self.now = _start_time
+        self.owners = {}
+        self.listings = {}
+        self.auctions = {}
+        self._next_claimable_token_id = 1
+
+    def setup_operations(self) -> list:
+        """ Returns mint operations creating initial tokens, owned by randomly picked users. """
+        operations = []
+        for token_id in range(1, self._token_count + 1):
+            owner = self._random.choice(self._users)
+            self.owners[token_id] = owner
+            operations.append(self._operation(TOKEN_CONTRACT, 'mint', self._minter, 0,
+                                              {"_to": owner, "_token_id": token_id, "_token_URI": f'{token_id}.json'}))
+        return operations
+
+    def operations(self, _count: int):
+        """ Yields operations of _count randomly picked actions. Some actions consist of several operations. """
+        actions = {
+            'list_token': self._list_token,
+            'reprice_token': self._reprice_token,
+            'purchase_token': self._purchase_token,
+            'create_auction': self._create_auction,
+            'place_bid': self._place_bid,
+            'finalize_auction': self._finalize_auction,
+            'return_unsold_item': self._return_unsold_item,
+            'claim_token': self._claim_token,
+        }
+        for _ in range(_count):
+            self.now += self._random.randint(1, 120) * SECOND
+            candidates = {name: self._candidates(name) for name in self._weights}
+            names = sorted(name for name, tokens in candidates.items() if tokens and self._weights[name])
+            name = self._random.choices(names, [self._weights[name] for name in names])[0]
+            yield from actions[name](candidates[name])
+
+    def _candidates(self, _action: str) -> list:
+        if _action in ('list_token', 'create_auction'):
+            return [token_id for token_id in self.owners if token_id not in self.listings]
+        if _action in ('reprice_token', 'purchase_token'):
+            return [token_id for token_id, price in self.listings.items() if price != -1]
+        if _action == 'place_bid':
+            return [token_id for token_id, auction in self.auctions.items() if self.now <= auction['end_time']]
+        if _action == 'finalize_auction':
+            return [token_id for token_id, auction in self.auctions.items()
+                    if self.now >= auction['end_time'] and auction['bidder']]
+        if _action == 'return_unsold_item':
+            return [token_id for token_id, auction in self.auctions.items()
+                    if self.now >= auction['end_time'] and not auction['bidder']]
+        if _action == 'claim_token':
+            return [self._next_claimable_token_id]
+        return []
+
+    def _operation(self, _contract: str, _method: str, _sender: Address, _value: int, _params: dict) -> Operation:
+        return Operation(_contract, _method, _sender, _value, _params, self.now)
+
+    def _price(self) -> int:
+        return self._random.randint(1, 100) * ICX
+
+    def _other_user(self, _user: Address) -> Address:
+        while True:
+            user = self._random.choice(self._users)
+            if user != _user or len(self._users) == 1:
+                return user
+
+    def _list_token(self, _token_ids: list):
+        token_id = self._random.choice(_token_ids)
+        price = self._price()
+        self.listings[token_id] = price
+        yield self._operation(TOKEN_CONTRACT, 'list_token', self.owners[token_id], 0,
+                              {"_token_id": token_id, "_price": price})
+
+    def _reprice_token(self, _token_ids: list):
+        token_id = self._random.choice(_token_ids)
+        price = self._price()
+        self.listings[token_id] = price
+        owner = self.owners[token_id]
+        yield self._operation(TOKEN_CONTRACT, 'delist_token', owner, 0, {"_token_id": token_id})
+        yield self._operation(TOKEN_CONTRACT, 'list_token', owner, 0, {"_token_id": token_id, "_price": price})
+
+    def _purchase_token(self, _token_ids: list):
+        token_id = self._random.choice(_token_ids)
+        buyer = self._other_user(self.owners[token_id])
+        price = self.listings.pop(token_id)
+        self.owners[token_id] = buyer
+        yield self._operation(TOKEN_CONTRACT, 'purchase_token', buyer, price, {"_token_id": token_id})
+
+    def _create_auction(self, _token_ids: list):
+        token_id = self._random.choice(_token_ids)
+        starting_price = self._price()
+        self.listings[token_id] = -1
+        self.auctions[token_id] = {"end_time": self.now + HOUR, "starting_price": starting_price, "bid": 0,
+                                   "bidder": None}
+        yield self._operation(TOKEN_CONTRACT, 'create_auction', self.owners[token_id], 0,
+                              {"_token_id": token_id, "_starting_price": starting_price, "_duration_in_hours": 1})
+
+    def _place_bid(self, _token_ids: list):
+        token_id = self._random.choice(_token_ids)
+        auction = self.auctions[token_id]
+        bidder = self._other_user(self.owners[token_id])
+        amount = auction['starting_price'] if not auction['bid'] else auction['bid'] * 11 // 10 + 1
+        if self.now > auction['end_time'] - 60 * SECOND:
+            auction['end_time'] += 120 * SECOND
+        auction['bid'] = amount
+        auction['bidder'] = bidder
+        yield self._operation(TOKEN_CONTRACT, 'place_bid', bidder, amount, {"_token_id": token_id})
+
+    def _finalize_auction(self, _token_ids: list):
+        token_id = self._random.choice(_token_ids)
+        auction = self.auctions.pop(token_id)
+        seller = self.owners[token_id]
+        del self.listings[token_id]
+        self.owners[token_id] = auction['bidder']
+        sender = self._random.choice([seller, auction['bidder']])
+        yield self._operation(TOKEN_CONTRACT, 'finalize_auction', sender, 0, {"_token_id": token_id})
+
+    def _return_unsold_item(self, _token_ids: list):
+        token_id = self._random.choice(_token_ids)
+        del self.auctions[token_id]
+        del self.listings[token_id]
+        yield self._operation(TOKEN_CONTRACT, 'return_unsold_item', self.owners[token_id], 0,
+                              {"_token_id": token_id})
+
+    def _claim_token(self, _token_ids: list):
+        token_id = _token_ids[0]
+        self._next_claimable_token_id += 1
+        base_price = self._price()
+        claimer = self._random.choice(self._users)
+        yield self._operation(CLAIMING_CONTRACT, 'list_token', self._minter, 0,
+                              {"_token_id": token_id, "_base_price": base_price})
+        yield self._operation(CLAIMING_CONTRACT, 'add_whitelist_record', self._minter, 0,
+                              {"_token_id": token_id, "_address": claimer, "_modified_price": base_price})
+        yield self._operation(CLAIMING_CONTRACT, 'claim_token', claimer, base_price, {"_token_id": token_id})
+
+
+def percentile(_values: list, _percent: float) -> int:
+    """ Returns nearest-rank percentile of given values. """
+    ordered = sorted(_values)
+    rank = max(1, math.ceil(_percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class WorkloadDriver:
+    """
+    Executes workload operations against SCORE instances of a ScoreTestCase and measures storage operations
+    of every call. State size of the token SCORE (number of storage entries and their bytes) is sampled
+    every _sample_interval operations.
+    """
+
+    def __init__(self, _test_case, _scores: dict, _sample_interval: int = 100):
+        self._test_case = _test_case
+        self._scores = _scores
+        self._sample_interval = _sample_interval
+        self._counter = StorageCounter()
+        for score in _scores.values():
+            self._counter.attach(score)
+        self._block_height = 0
+        self.costs = {}
+        self.failures = {}
+        self.state_growth = []
+        self.operation_count = 0
+
+    def execute(self, _operations, _measure: bool = True):
+        for operation in _operations:
+            self._execute(operation, _measure)
+            if _measure:
+                self.operation_count += 1
+                if self.operation_count % self._sample_interval == 0:
+                    self.sample_state()
+
+    def sample_state(self):
+        entries = list(dump_score_storage(self._scores[TOKEN_CONTRACT]))
+        self.state_growth.append({
+            "operations": self.operation_count,
+            "keys": len(entries),
+            "bytes": sum(len(key) + len(value) for key, value in entries)
+        })
+
+    def report(self) -> dict:
+        methods = {}
+        for method, costs in sorted(self.costs.items()):
+            methods[method] = {
+                "count": len(costs),
+                "p50": percentile(costs, 50),
+                "p99": percentile(costs, 99),
+                "max": max(costs),
+                "mean": round(sum(costs) / len(costs), 2)
+            }
+        return {
+            "operations": self.operation_count,
+            "methods": methods,
+            "state_growth": self.state_growth,
+            "failures": self.failures
+        }
+
+    def _execute(self, _operation: Operation, _measure: bool):
+        self._block_height += 1
+        self._test_case.set_block(self._block_height, _operation.time)
+        self._test_case.set_msg(_operation.sender, _operation.value)
+        score = self._scores[_operation.contract]
+        method = f'{score.name()}.{_operation.method}'
+
+        self._counter.reset()
+        self._counter.enabled = _measure
+        try:
+            getattr(score, _operation.method)(**_operation.params)
+        except IconScoreException as e:
+            self.failures.setdefault(method, []).append(e.message)
+            return
+        finally:
+            self._counter.enabled = False
+
+        if _measure:
+            totals = self._counter.totals()
+            self.costs.setdefault(method, []).append(totals['reads'] + totals['writes'] + totals['deletes'])
@@ -0,0 +1,38 @@
+"""
+Opt-in storage profiling for local tests.
+
+Set NEBULA_STORAGE_PROFILE to a file path to profile storage accesses of every SCORE created through
+ScoreTestCase.get_score_instance. Accesses are written to that path in folded stack format, e.g.
+
+    NEBULA_STORAGE_PROFILE=storage.folded python -m pytest nebula_planet_token
+    flamegraph.pl storage.folded > storage.svg
+"""
+import os
+
+_profile_path = os.environ.get('NEBULA_STORAGE_PROFILE')
+_profiler = None
+
+
+def pytest_configure(config):
+    global _profiler
+    if not _profile_path:
+        return
+
+    from tbears.libs.scoretest.score_test_case import ScoreTestCase
+    from benchmarks.storage_profiler import StorageProfiler
+
+    _profiler = StorageProfiler()
+    _profiler.enabled = True
+    get_score_instance = ScoreTestCase.get_score_instance
+
+    def get_profiled_score_instance(*args, **kwargs):
+        score = get_score_instance(*args, **kwargs)
+        _profiler.attach(score)
+        return score
+
+    ScoreTestCase.get_score_instance = staticmethod(get_profiled_score_instance)
+
+
+def pytest_unconfigure(config):
+    if _profiler is not None:
+        _profiler.write_folded_stacks(_profile_path)
@@ -0,0 +1,42 @@
+"""
+Indexes eventlogs of Nebula token SCOREs into an SQLite database.
+
+    python -m nebula_indexer --db market.db --contract cx... --blocks blocks/
+    python -m nebula_indexer --db market.db --contract cx... --rpc http://127.0.0.1:9000/api/v3
+"""
+import argparse
+
+from .indexer import EventIndexer
+from .sources import JsonRpcSource, read_block_files
+
+
+def main(_args: list = None):
+    parser = argparse.ArgumentParser(prog='nebula_indexer', description='Index Nebula SCORE eventlogs into SQLite')
+    parser.add_argument('--db', required=True, help='SQLite database file')
+    parser.add_argument('--contract', required=True, action='append', help='SCORE address to index (repeatable)')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--blocks', help='Directory or file with block JSON files')
+    source.add_argument('--rpc', help='ICON JSON-RPC v3 endpoint')
+    parser.add_argument('--from-height', type=int, help='First block height when reading from RPC')
+    parser.add_argument('--to-height', type=int, help='Last block height when reading from RPC')
+    args = parser.parse_args(_args)
+
+    indexer = EventIndexer(args.db, args.contract)
+    try:
+        if args.blocks:
+            blocks = read_block_files(args.blocks)
+        else:
+            from_height = args.from_height if args.from_height is not None else indexer.last_block_height + 1
+            blocks = JsonRpcSource(args.rpc).blocks(from_height, args.to_height)
+
+        processed_count = 0
+        for block in blocks:
+            if indexer.process_block(block):
+                processed_count += 1
+        print(f'Processed {processed_count} blocks, last block height: {indexer.last_block_height}')
+    finally:
+        indexer.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+import sqlite3
+
+ZERO_ADDRESS = 'hx0000000000000000000000000000000000000000'
+
+_AMOUNT_COLUMNS = ('price', 'current_bid', 'starting_price')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tokens (
+    contract TEXT NOT NULL,
+    token_id INTEGER NOT NULL,
+    owner TEXT NOT NULL,
+    approved TEXT,
+    updated_block INTEGER NOT NULL,
+    PRIMARY KEY (contract, token_id)
+);
+CREATE INDEX IF NOT EXISTS tokens_owner ON tokens (contract, owner);
+
+CREATE TABLE IF NOT EXISTS listings (
+    contract TEXT NOT NULL,
+    token_id INTEGER NOT NULL,
+    seller TEXT NOT NULL,
+    type TEXT NOT NULL,
+    price TEXT,
+    current_bid TEXT,
+    highest_bidder TEXT,
+    end_time INTEGER,
+    listed_block INTEGER NOT NULL,
+    PRIMARY KEY (contract, token_id)
+);
+CREATE INDEX IF NOT EXISTS listings_seller ON listings (contract, seller);
+
+CREATE TABLE IF NOT EXISTS sales (
+    sale_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    contract TEXT NOT NULL,
+    token_id INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    seller TEXT NOT NULL,
+    buyer TEXT,
+    starting_price TEXT,
+    price TEXT,
+    block_height INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sales_token ON sales (contract, token_id);
+
+CREATE TABLE IF NOT EXISTS roles (
+    contract TEXT NOT NULL,
+    role TEXT NOT NULL,
+    address TEXT NOT NULL,
+    block_height INTEGER NOT NULL,
+    PRIMARY KEY (contract, role)
+);
+
+CREATE TABLE IF NOT EXISTS indexer_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def parse_int(_value) -> int:
+    """ Parses an integer from eventlog value, which is hex string ('0x1f') in JSON-RPC results. """
+    if isinstance(_value, int):
+        return _value
+    return int(_value, 16) if _value.startswith(('0x', '-0x')) else int(_value)
+
+
+class EventIndexer:
+    """
+    Builds a queryable SQLite database of token ownership, listings and sales from eventlogs of Nebula
+    token SCOREs. Blocks have to be processed in order. Blocks that were already processed are skipped,
+    so indexing can be resumed at any time.
+
+    Prices are stored as decimal strings, since amounts in loop do not fit into SQLite integers.
+    """
+
+    def __init__(self, _database: str, _contracts: list):
+        self._connection = sqlite3.connect(_database)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.executescript(_SCHEMA)
+        self._contracts = set(_contracts)
+        self._handlers = {
+            'Transfer': self._on_transfer,
+            'Approval': self._on_approval,
+            'ListToken': self._on_list_token,
+            'DelistToken': self._on_delist_token,
+            'PurchaseToken': self._on_purchase_token,
+            'PurchaseTokenWithPrice': self._on_purchase_token_with_price,
+            'AuctionCreated': self._on_auction_created,
+            'DutchAuctionCreated': self._on_dutch_auction_created,
+            'BatchedAuctionCreated': self._on_batched_auction_created,
+            'BidPlaced': self._on_bid_placed,
+            'BidCollected': self._on_bid_collected,
+            'AuctionFinalized': self._on_auction_finalized,
+            'AuctionCancelled': self._on_auction_cancelled,
+            'AuctionUnsold': self._on_auction_unsold,
+            'OfferAccepted': self._on_offer_accepted,
+            'CollectionOfferAccepted': self._on_collection_offer_accepted,
+            'AssignRole': self._on_assign_role,
+        }
+        self._delisted_listings = {}
+
+    def close(self):
+        self._connection.close()
+
+    # ================================================
+    #  Processing
+    # ================================================
+
+    @property
+    def last_block_height(self) -> int:
+        row = self._connection.execute(
+            "SELECT value FROM indexer_state WHERE key = 'last_block_height'").fetchone()
+        return int(row['value']) if row else -1
+
+    def process_block(self, _block: dict) -> bool:
+        """
+        Processes all eventlogs in receipts of a block. Block is a result of icx_getBlockByHeight with an
+        additional 'receipts' list holding icx_getTransactionResult results of its transactions.
+        Returns False when block was already processed.
+        """
+        height = parse_int(_block['height'])
+        if height <= self.last_block_height:
+            return False
+
+        timestamp = parse_int(_block.get('time_stamp', 0))
+        with self._connection:
+            for receipt in _block.get('receipts', []):
+                self._process_receipt(receipt, height, timestamp)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO indexer_state (key, value) VALUES ('last_block_height', ?)", (str(height),))
+        return True
+
+    def _process_receipt(self, _receipt: dict, _height: int, _timestamp: int):
+        if parse_int(_receipt.get('status', 1)) != 1:
+            return
+        self._delisted_listings = {}
+        for event_log in _receipt.get('eventLogs', []):
+            contract = event_log['scoreAddress']
+            if contract not in self._contracts:
+                continue
+            signature = event_log['indexed'][0]
+            handler = self._handlers.get(signature.split('(')[0])
+            if handler:
+                values = event_log['indexed'][1:] + event_log.get('data', [])
+                handler(contract, values, _height, _timestamp, _receipt['txHash'])
+
+    # ================================================
+    #  Event handlers
+    # ================================================
+
+    def _on_transfer(self, _contract: str, _values: list, _height: int, _timestamp: int, _tx_hash: str):
+        to, token_id = _values[1], parse_int(_values[2])
+        if to == ZERO_ADDRESS:
+            self._connection.execute("DELETE FROM tokens WHERE contract = ? AND token_id = ?", (_contract, token_id))
+            self._connection.execute("DELETE FROM listings WHERE contract = ? AND token_id = ?", (_contract, token_id))
+            return
+        self._connection.execute(
+            "INSERT OR REPLACE INTO tokens (contract, token_id, owner, approved, updated_block) VALUES (?, ?, ?, NULL, ?)",
+            (_contract, token_id, to, _height))
+
+    def _on_approval(self, _contract: str, _values: list, _height: int, _timestamp: int, _tx_hash: str):
+        approved, token_id = _values[1], parse_int(_values[2])
+        self._connection.execute(
+            "UPDATE tokens SET approved = ?, updated_block = ? WHERE contract = ? AND token_id = ?",
+            (approved, _height, _contract, token_id))
+
+    def _on_list_token(self, _contract: str, _values: list, _height: int, _timestamp: int, _tx_hash: str):
+        seller, token_id, price = _values[0], parse_int(_values[1]), parse_int(_values[2])
+        self._insert_listing(_contract, token_id, seller, 'fixed', price, _height)
+
+    def _on_auction_created(self, _contract: str, _values: list, _height: int, _timestamp: int, _tx_hash: str):
+        seller, token_id, starting_price = _values[0], parse_int(_values[1]), parse_int(_values[2])
+        self._insert_listing(_contract, token_id, seller, 'auction', starting_price, _height, parse_int(_values[4]))
+
+    def _on_dutch_auction_created(self, _contract: str, _values: list, _height: int, _timestamp: int,
+                                  _tx_hash: str):
+        seller, token_id, start_price = _values[0], parse_int(_values[1]), parse_int(_values[2])
+        self._insert_listing(_contract, token_id, seller, 'dutch_auction', start_price, _height, parse_int(_values[5]))
+
+    def _on_batched_auction_created(self, _contract: str, _values: list, _height: int, _timestamp: int,
+                                    _tx_hash: str):
+        seller, token_id, starting_price = _values[0], parse_int(_values[1]), parse_int(_values[2])
+        self._insert_listing(_contract, token_id, seller, 'batched_auction', starting_price, _height,
+                             parse_int(_values[4]))
+
+    def _on_bid_placed(self, _contract: str, _values: list, _height: int, _timestamp: int, _tx_hash: str):
+        bidder, token_id = _values[0], parse_int(_values[1])
+        amount, end_time = parse_int(_values[2]), parse_int(_values[3])
+        self._connection.execute(
+            "UPDATE listings SET current_bid = ?, highest_bidder = ?, end_time = ? WHERE contract = ? AND token_id = ?",
+            (str(amount), bidder, end_time, _contract, token_id))
+
+    def _on_bid_collected(self, _contract: str, _values: list, _height: int, _timestamp: int, _tx_hash: str):
+        bidder, token_id, amount = _values[0], parse_int(_values[1]), parse_int(_values[2])
+        listing = self._connection.execute(
+            "SELECT current_bid FROM listings WHERE contract = ? AND token_id = ?", (_contract, token_id)).fetchone()
+        # Batched auctions keep every bid until settlement, the earliest of the highest bids wins
+        if listing and (listing['current_bid'] is None or amount > int(listing['current_bid'])):
+            self._connection.execute(
+                "UPDATE listings SET current_bid = ?, highest_bidder = ? WHERE contract = ? AND token_id = ?",
+                (str(amount), bidder, _contract, token_id))
+
+    def _insert_listing(self, _contract: str, _token_id: int, _seller: str, _type: str, _price, _height: int,
+                        _end_time: int = None):
+        self._connection.execute(
+            "INSERT OR REPLACE INTO listings (contract, token_id, seller, type, price, end_time, listed_block) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (_contract, _token_id, _seller, _type, None if _price is None else str(_price), _end_time, _height))
+
+    def _on_delist_token(self, _contract: str, _values: list, _height: int, _timestamp: int, _tx_hash: str):
+        token_id = parse_int(_values[1])
+        listing = self._connection.execute(
+            "SELECT type, price FROM listings WHERE contract = ? AND token_id = ?", (_contract, token_id)).fetchone()
+        if listing:
+            # Sales and auction endings delist the token before emitting their own event, so the listing
+            # is kept for the sale record
+            self._delisted_listings[(_contract, token_id)] = listing
+        self._connection.execute("DELETE FROM listings WHERE contract = ? AND token_id = ?", (_contract, token_id))
+
+    def _on_purchase_token(self, _contract: str, _values: list, _height: int, _timestamp: int, _tx_hash: str):
+        seller, buyer, token_id = _values[0], _values[1], parse_int(_values[2])
+        price = self._delisted_price(_contract, token_id)
+        self._insert_sale(_contract, token_id, self._purchase_type(_contract, token_id), seller, buyer, price, price,
+                          _height, _timestamp, _tx_hash)
+
+    def _on_purchase_token_with_price(self, _contract: str, _values: list, _height: int, _timestamp: int,
+                                      _tx_hash: str):
+        seller, buyer, token_id, price = _values[0], _values[1], parse_int(_values[2]), parse_int(_values[3])
+        # Contracts emit PurchaseToken first, the sale recorded for it gets the exact price. Dutch auctions keep
+        # their start price as starting price.
+        sale_type = self._purchase_type(_contract, token_id)
+        starting_price = self._delisted_price(_contract, token_id) if sale_type == 'dutch_auction_success' else price
+        updated = self._connection.execute(
+            "UPDATE sales SET starting_price = ?, price = ? "
+            "WHERE contract = ? AND token_id = ? AND tx_hash = ? AND type = ?",
+            (None if starting_price is None else str(starting_price), str(price), _contract, token_id, _tx_hash,
+             sale_type))
+        if not updated.rowcount:
+            self._insert_sale(_contract, token_id, sale_type, seller, buyer, starting_price, price, _height,
+                              _timestamp, _tx_hash)
+
+    def _purchase_type(self, _contract: str, _token_id: int) -> str:
+        listing = self._delisted_listings.get((_contract, _token_id))
+        return 'dutch_auction_success' if listing and listing['type'] == 'dutch_auction' else 'sale_success'
+
+    def _on_auction_finalized(self, _contract: str, _values: list, _height: int, _timestamp: int, _tx_hash: str):
+        seller, buyer, token_id, price = _values[0], _values[1], parse_int(_values[2]), parse_int(_values[3])
+        starting_price = self._delisted_price(_contract, token_id)
+        self._insert_sale(_contract, token_id, 'auction_success', seller, buyer, starting_price, price, _height,
+                          _timestamp, _tx_hash)
+
+    def _on_auction_cancelled(self, _contract: str, _values: list, _height: int, _timestamp: int, _tx_hash: str):
+        self._insert_auction_ending(_contract, _values, 'auction_cancelled', _height, _timestamp, _tx_hash)
+
+    def _on_auction_unsold(self, _contract: str, _values: list, _height: int, _timestamp: int, _tx_hash: str):
+        self._insert_auction_ending(_contract, _values, 'auction_unsold', _height, _timestamp, _tx_hash)
+
+    def _on_offer_accepted(self, _contract: str, _values: list, _height: int, _timestamp: int, _tx_hash: str):
+        seller, buyer, token_id, amount = _values[0], _values[1], parse_int(_values[2]), parse_int(_values[3])
+        self._insert_sale(_contract, token_id, 'offer_accepted', seller, buyer, amount, amount, _height, _timestamp,
+                          _tx_hash)
+
+    def _on_collection_offer_accepted(self, _contract: str, _values: list, _height: int, _timestamp: int,
+                                      _tx_hash: str):
+        seller, buyer, token_id, amount = _values[1], _values[2], parse_int(_values[3]), parse_int(_values[4])
+        self._insert_sale(_contract, token_id, 'collection_offer_accepted', seller, buyer, amount, amount, _height,
+                          _timestamp, _tx_hash)
+
+    def _insert_auction_ending(self, _contract: str, _values: list, _type: str, _height: int, _timestamp: int,
+                               _tx_hash: str):
+        seller, token_id = _values[0], parse_int(_values[1])
+        starting_price = self._delisted_price(_contract, token_id)
+        self._insert_sale(_contract, token_id, _type, seller, None, starting_price, None, _height, _timestamp,
+                          _tx_hash)
+
+    def _delisted_price(self, _contract: str, _token_id: int):
+        listing = self._delisted_listings.get((_contract, _token_id))
+        return listing['price'] if listing else None
+
+    def _insert_sale(self, _contract: str, _token_id: int, _type: str, _seller: str, _buyer, _starting_price,
+                     _price, _height: int, _timestamp: int, _tx_hash: str):
+        self._connection.execute(
+            "INSERT INTO sales (contract, token_id, type, seller, buyer, starting_price, price, block_height, "
+            "timestamp, tx_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (_contract, _token_id, _type, _seller, _buyer,
+             None if _starting_price is None else str(_starting_price), None if _price is None else str(_price),
+             _height, _timestamp, _tx_hash))
+
+    def _on_assign_role(self, _contract: str, _values: list, _height: int, _timestamp: int, _tx_hash: str):
+        role, address = _values[0], _values[1]
+        self._connection.execute(
+            "INSERT OR REPLACE INTO roles (contract, role, address, block_height) VALUES (?, ?, ?, ?)",
+            (_contract, role, address, _height))
+
+    # ================================================
+    #  Queries
+    # ================================================
+
+    def owner_of(self, _contract: str, _token_id: int):
+        row = self._connection.execute(
+            "SELECT owner FROM tokens WHERE contract = ? AND token_id = ?", (_contract, _token_id)).fetchone()
+        return row['owner'] if row else None
+
+    def tokens_of_owner(self, _contract: str, _owner: str) -> list:
+        rows = self._connection.execute(
+            "SELECT token_id FROM tokens WHERE contract = ? AND owner = ? ORDER BY token_id", (_contract, _owner))
+        return [row['token_id'] for row in rows]
+
+    def listings(self, _contract: str, _offset: int = 0, _limit: int = 100, _seller: str = None) -> list:
+        query = "SELECT token_id, seller, type, price, current_bid, highest_bidder, end_time, listed_block " \
+                "FROM listings WHERE contract = ?"
+        params = [_contract]
+        if _seller:
+            query += " AND seller = ?"
+            params.append(_seller)
+        query += " ORDER BY token_id LIMIT ? OFFSET ?"
+        params += [_limit, _offset]
+        return [self._row_to_dict(row) for row in self._connection.execute(query, params)]
+
+    def sales(self, _contract: str, _token_id: int = None, _offset: int = 0, _limit: int = 100) -> list:
+        query = "SELECT sale_id, token_id, type, seller, buyer, starting_price, price, block_height, timestamp, " \
+                "tx_hash FROM sales WHERE contract = ?"
+        params = [_contract]
+        if _token_id is not None:
+            query += " AND token_id = ?"
+            params.append(_token_id)
+        query += " ORDER BY sale_id DESC LIMIT ? OFFSET ?"
+        params += [_limit, _offset]
+        return [self._row_to_dict(row) for row in self._connection.execute(query, params)]
+
+    def role(self, _contract: str, _role: str):
+        row = self._connection.execute(
+            "SELECT address FROM roles WHERE contract = ? AND role = ?", (_contract, _role)).fetchone()
+        return row['address'] if row else None
+
+    @staticmethod
+    def _row_to_dict(_row: sqlite3.Row) -> dict:
+        result = dict(_row)
+        for column in _AMOUNT_COLUMNS:
+            if result.get(column) is not None:
+                result[column] = int(result[column])
+        return result
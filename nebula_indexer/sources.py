@@ -0,0 +1,58 @@
+import json
+import os
+import urllib.request
+
+
+def read_block_files(_path: str):
+    """
+    Yields blocks from JSON files in _path directory (or a single file), sorted by file name.
+    A file holds one block or a list of blocks in the format accepted by EventIndexer.process_block.
+    """
+    if os.path.isdir(_path):
+        file_names = sorted(os.path.join(_path, name) for name in os.listdir(_path) if name.endswith('.json'))
+    else:
+        file_names = [_path]
+
+    for file_name in file_names:
+        with open(file_name) as block_file:
+            content = json.load(block_file)
+        for block in content if isinstance(content, list) else [content]:
+            yield block
+
+
+class JsonRpcSource:
+    """
+    Reads blocks and transaction results from ICON JSON-RPC v3 API, e.g. local tbears server at
+    http://127.0.0.1:9000/api/v3.
+    """
+
+    def __init__(self, _url: str):
+        self._url = _url
+        self._request_id = 0
+
+    def _call(self, _method: str, _params: dict):
+        self._request_id += 1
+        payload = json.dumps({'jsonrpc': '2.0', 'id': self._request_id, 'method': _method, 'params': _params})
+        request = urllib.request.Request(self._url, payload.encode(), {'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request) as response:
+            result = json.load(response)
+        if 'error' in result:
+            raise RuntimeError(f"{_method} failed: {result['error']}")
+        return result['result']
+
+    def last_block_height(self) -> int:
+        return self._call('icx_getLastBlock', {})['height']
+
+    def block(self, _height: int) -> dict:
+        block = self._call('icx_getBlockByHeight', {'height': hex(_height)})
+        block['receipts'] = [self._call('icx_getTransactionResult', {'txHash': transaction['txHash']})
+                             for transaction in block.get('confirmed_transaction_list', [])
+                             if 'txHash' in transaction]
+        return block
+
+    def blocks(self, _from_height: int, _to_height: int = None):
+        """ Yields blocks from _from_height to _to_height (inclusive, defaults to last block). """
+        if _to_height is None:
+            _to_height = self.last_block_height()
+        for height in range(_from_height, _to_height + 1):
+            yield self.block(height)
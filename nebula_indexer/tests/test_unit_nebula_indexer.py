@@ -0,0 +1,260 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from ..indexer import EventIndexer, ZERO_ADDRESS
+from ..sources import read_block_files
+
+CONTRACT = f"cx{'1234' * 10}"
+OTHER_CONTRACT = f"cx{'5678' * 10}"
+SELLER = f"hx{'1' * 40}"
+BUYER = f"hx{'2' * 40}"
+
+
+def event(_signature: str, *_indexed, _data: list = None, _contract: str = CONTRACT) -> dict:
+    return {
+        "scoreAddress": _contract,
+        "indexed": [_signature] + [hex(value) if isinstance(value, int) else value for value in _indexed],
+        "data": _data or []
+    }
+
+
+def block(_height: int, *_event_logs, _status: str = "0x1") -> dict:
+    return {
+        "height": _height,
+        "time_stamp": 1600000000000000 + _height,
+        "receipts": [{"txHash": f"0x{_height:064x}", "status": _status, "eventLogs": list(_event_logs)}]
+    }
+
+
+class TestEventIndexer(TestCase):
+
+    def setUp(self):
+        self.indexer = EventIndexer(':memory:', [CONTRACT])
+
+    def tearDown(self):
+        self.indexer.close()
+
+    def test_indexes_minted_and_transferred_tokens(self):
+        self.indexer.process_block(block(1, event("Transfer(Address,Address,int)", ZERO_ADDRESS, SELLER, 1)))
+        self.indexer.process_block(block(2, event("Transfer(Address,Address,int)", SELLER, BUYER, 1)))
+
+        self.assertEqual(self.indexer.owner_of(CONTRACT, 1), BUYER)
+        self.assertEqual(self.indexer.tokens_of_owner(CONTRACT, SELLER), [])
+        self.assertEqual(self.indexer.tokens_of_owner(CONTRACT, BUYER), [1])
+
+    def test_removes_burned_tokens(self):
+        self.indexer.process_block(block(1, event("Transfer(Address,Address,int)", ZERO_ADDRESS, SELLER, 1)))
+        self.indexer.process_block(block(2, event("Transfer(Address,Address,int)", SELLER, ZERO_ADDRESS, 1)))
+
+        self.assertEqual(self.indexer.owner_of(CONTRACT, 1), None)
+
+    def test_indexes_listings(self):
+        self.indexer.process_block(block(1,
+                                         event("ListToken(Address,int,int)", SELLER, 1, 10 ** 18),
+                                         event("ListToken(Address,int,int)", SELLER, 2, 2 * 10 ** 18)))
+        self.indexer.process_block(block(2, event("DelistToken(Address,int)", SELLER, 1)))
+
+        listings = self.indexer.listings(CONTRACT)
+
+        self.assertEqual(len(listings), 1)
+        self.assertEqual(listings[0]['token_id'], 2)
+        self.assertEqual(listings[0]['price'], 2 * 10 ** 18)
+        self.assertEqual(listings[0]['type'], 'fixed')
+
+    def test_indexes_purchase_with_price_of_delisted_token(self):
+        self.indexer.process_block(block(1,
+                                         event("Transfer(Address,Address,int)", ZERO_ADDRESS, SELLER, 1),
+                                         event("ListToken(Address,int,int)", SELLER, 1, 10 ** 18)))
+        self.indexer.process_block(block(2,
+                                         event("DelistToken(Address,int)", SELLER, 1),
+                                         event("Transfer(Address,Address,int)", SELLER, BUYER, 1),
+                                         event("PurchaseToken(Address,Address,int)", SELLER, BUYER, 1)))
+
+        sales = self.indexer.sales(CONTRACT, 1)
+
+        self.assertEqual(len(sales), 1)
+        self.assertEqual(sales[0]['seller'], SELLER)
+        self.assertEqual(sales[0]['buyer'], BUYER)
+        self.assertEqual(sales[0]['price'], 10 ** 18)
+        self.assertEqual(sales[0]['type'], 'sale_success')
+        self.assertEqual(self.indexer.owner_of(CONTRACT, 1), BUYER)
+        self.assertEqual(self.indexer.listings(CONTRACT), [])
+
+    def test_indexes_approvals_and_roles(self):
+        self.indexer.process_block(block(1,
+                                         event("Transfer(Address,Address,int)", ZERO_ADDRESS, SELLER, 1),
+                                         event("Approval(Address,Address,int)", SELLER, BUYER, 1),
+                                         event("AssignRole(str,Address)", "Minter", SELLER)))
+
+        self.assertEqual(self.indexer.role(CONTRACT, "Minter"), SELLER)
+        self.assertEqual(self.indexer.listings(CONTRACT), [])
+
+    def test_ignores_other_contracts_and_failed_transactions(self):
+        self.indexer.process_block(block(1, event("Transfer(Address,Address,int)", ZERO_ADDRESS, SELLER, 1,
+                                                  _contract=OTHER_CONTRACT)))
+        self.indexer.process_block(block(2, event("Transfer(Address,Address,int)", ZERO_ADDRESS, SELLER, 2),
+                                         _status="0x0"))
+
+        self.assertEqual(self.indexer.owner_of(CONTRACT, 1), None)
+        self.assertEqual(self.indexer.owner_of(CONTRACT, 2), None)
+
+    def test_skips_already_processed_blocks(self):
+        self.assertTrue(self.indexer.process_block(block(1, event("ListToken(Address,int,int)", SELLER, 1, 10))))
+        self.assertFalse(self.indexer.process_block(block(1, event("DelistToken(Address,int)", SELLER, 1))))
+
+        self.assertEqual(self.indexer.last_block_height, 1)
+        self.assertEqual(len(self.indexer.listings(CONTRACT)), 1)
+
+    def test_reads_block_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, '0001.json'), 'w') as block_file:
+                json.dump([block(1), block(2)], block_file)
+            with open(os.path.join(directory, '0002.json'), 'w') as block_file:
+                json.dump(block(3), block_file)
+
+            heights = [block_data['height'] for block_data in read_block_files(directory)]
+
+        self.assertEqual(heights, [1, 2, 3])
+
+    def test_uses_price_of_priced_purchase_event(self):
+        self.indexer.process_block(block(1,
+                                         event("Transfer(Address,Address,int)", ZERO_ADDRESS, SELLER, 1),
+                                         event("ListToken(Address,int,int)", SELLER, 1, 10 ** 18)))
+        self.indexer.process_block(block(2,
+                                         event("DelistToken(Address,int)", SELLER, 1),
+                                         event("Transfer(Address,Address,int)", SELLER, BUYER, 1),
+                                         event("PurchaseToken(Address,Address,int)", SELLER, BUYER, 1),
+                                         event("PurchaseTokenWithPrice(Address,Address,int,int)", SELLER, BUYER, 1,
+                                               _data=[hex(10 ** 18)])))
+
+        sales = self.indexer.sales(CONTRACT, 1)
+
+        self.assertEqual(len(sales), 1)
+        self.assertEqual(sales[0]['price'], 10 ** 18)
+
+    def test_indexes_auction_with_bids(self):
+        self.indexer.process_block(block(1,
+                                         event("Transfer(Address,Address,int)", ZERO_ADDRESS, SELLER, 1),
+                                         event("AuctionCreated(Address,int,int,int,int)", SELLER, 1,
+                                               _data=[hex(10 ** 18), hex(1000), hex(2000)])))
+        self.indexer.process_block(block(2, event("BidPlaced(Address,int,int,int)", BUYER, 1,
+                                                  _data=[hex(2 * 10 ** 18), hex(2120)])))
+
+        listing = self.indexer.listings(CONTRACT)[0]
+
+        self.assertEqual(listing['type'], 'auction')
+        self.assertEqual(listing['price'], 10 ** 18)
+        self.assertEqual(listing['current_bid'], 2 * 10 ** 18)
+        self.assertEqual(listing['highest_bidder'], BUYER)
+        self.assertEqual(listing['end_time'], 2120)
+
+    def test_indexes_batched_auction_with_collected_bids(self):
+        self.indexer.process_block(block(1,
+                                         event("Transfer(Address,Address,int)", ZERO_ADDRESS, SELLER, 1),
+                                         event("BatchedAuctionCreated(Address,int,int,int,int)", SELLER, 1,
+                                               _data=[hex(10 ** 18), hex(1000), hex(2000)])))
+        self.indexer.process_block(block(2,
+                                         event("BidCollected(Address,int,int)", BUYER, 1, _data=[hex(2 * 10 ** 18)]),
+                                         event("BidCollected(Address,int,int)", SELLER, 1, _data=[hex(10 ** 18)]),
+                                         event("BidCollected(Address,int,int)", SELLER, 1,
+                                               _data=[hex(2 * 10 ** 18)])))
+
+        listing = self.indexer.listings(CONTRACT)[0]
+
+        self.assertEqual(listing['type'], 'batched_auction')
+        self.assertEqual(listing['price'], 10 ** 18)
+        self.assertEqual(listing['current_bid'], 2 * 10 ** 18)
+        self.assertEqual(listing['highest_bidder'], BUYER)
+        self.assertEqual(listing['end_time'], 2000)
+
+    def test_indexes_finalized_auction(self):
+        self.indexer.process_block(block(1,
+                                         event("Transfer(Address,Address,int)", ZERO_ADDRESS, SELLER, 1),
+                                         event("AuctionCreated(Address,int,int,int,int)", SELLER, 1,
+                                               _data=[hex(10 ** 18), hex(1000), hex(2000)])))
+        self.indexer.process_block(block(2,
+                                         event("DelistToken(Address,int)", SELLER, 1),
+                                         event("Transfer(Address,Address,int)", SELLER, BUYER, 1),
+                                         event("AuctionFinalized(Address,Address,int,int)", SELLER, BUYER, 1,
+                                               _data=[hex(3 * 10 ** 18)])))
+
+        sale = self.indexer.sales(CONTRACT, 1)[0]
+
+        self.assertEqual(sale['type'], 'auction_success')
+        self.assertEqual(sale['starting_price'], 10 ** 18)
+        self.assertEqual(sale['price'], 3 * 10 ** 18)
+        self.assertEqual(self.indexer.owner_of(CONTRACT, 1), BUYER)
+        self.assertEqual(self.indexer.listings(CONTRACT), [])
+
+    def test_indexes_cancelled_and_unsold_auctions(self):
+        self.indexer.process_block(block(1,
+                                         event("AuctionCreated(Address,int,int,int,int)", SELLER, 1,
+                                               _data=[hex(10 ** 18), hex(1000), hex(2000)]),
+                                         event("AuctionCreated(Address,int,int,int,int)", SELLER, 2,
+                                               _data=[hex(10 ** 18), hex(1000), hex(2000)])))
+        self.indexer.process_block(block(2,
+                                         event("DelistToken(Address,int)", SELLER, 1),
+                                         event("AuctionCancelled(Address,int)", SELLER, 1)))
+        self.indexer.process_block(block(3,
+                                         event("DelistToken(Address,int)", SELLER, 2),
+                                         event("AuctionUnsold(Address,int)", SELLER, 2)))
+
+        sales = self.indexer.sales(CONTRACT)
+
+        self.assertEqual([(sale['token_id'], sale['type']) for sale in sales],
+                         [(2, 'auction_unsold'), (1, 'auction_cancelled')])
+        self.assertEqual(sales[0]['starting_price'], 10 ** 18)
+        self.assertEqual(sales[0]['buyer'], None)
+        self.assertEqual(self.indexer.listings(CONTRACT), [])
+
+    def test_indexes_purchased_dutch_auction(self):
+        self.indexer.process_block(block(1,
+                                         event("Transfer(Address,Address,int)", ZERO_ADDRESS, SELLER, 1),
+                                         event("DutchAuctionCreated(Address,int,int,int,int,int)", SELLER, 1,
+                                               _data=[hex(3 * 10 ** 18), hex(10 ** 18), hex(1000), hex(2000)])))
+
+        listing = self.indexer.listings(CONTRACT)[0]
+        self.assertEqual(listing['type'], 'dutch_auction')
+        self.assertEqual(listing['price'], 3 * 10 ** 18)
+        self.assertEqual(listing['end_time'], 2000)
+
+        self.indexer.process_block(block(2,
+                                         event("DelistToken(Address,int)", SELLER, 1),
+                                         event("Transfer(Address,Address,int)", SELLER, BUYER, 1),
+                                         event("PurchaseToken(Address,Address,int)", SELLER, BUYER, 1),
+                                         event("PurchaseTokenWithPrice(Address,Address,int,int)", SELLER, BUYER, 1,
+                                               _data=[hex(2 * 10 ** 18)])))
+
+        sales = self.indexer.sales(CONTRACT, 1)
+
+        self.assertEqual(len(sales), 1)
+        self.assertEqual(sales[0]['type'], 'dutch_auction_success')
+        self.assertEqual(sales[0]['starting_price'], 3 * 10 ** 18)
+        self.assertEqual(sales[0]['price'], 2 * 10 ** 18)
+        self.assertEqual(self.indexer.listings(CONTRACT), [])
+
+    def test_indexes_accepted_offer(self):
+        self.indexer.process_block(block(1, event("Transfer(Address,Address,int)", ZERO_ADDRESS, SELLER, 1)))
+        self.indexer.process_block(block(2,
+                                         event("Transfer(Address,Address,int)", SELLER, BUYER, 1),
+                                         event("OfferAccepted(Address,Address,int,int)", SELLER, BUYER, 1,
+                                               _data=[hex(2 * 10 ** 18)])))
+
+        sale = self.indexer.sales(CONTRACT, 1)[0]
+
+        self.assertEqual((sale['type'], sale['buyer'], sale['price']), ('offer_accepted', BUYER, 2 * 10 ** 18))
+        self.assertEqual(self.indexer.owner_of(CONTRACT, 1), BUYER)
+
+    def test_indexes_accepted_collection_offer(self):
+        self.indexer.process_block(block(1, event("Transfer(Address,Address,int)", ZERO_ADDRESS, SELLER, 1)))
+        self.indexer.process_block(block(2,
+                                         event("Transfer(Address,Address,int)", SELLER, BUYER, 1),
+                                         event("CollectionOfferAccepted(int,Address,Address,int,int)", 7, SELLER,
+                                               BUYER, _data=[hex(1), hex(10 ** 18)])))
+
+        sale = self.indexer.sales(CONTRACT, 1)[0]
+
+        self.assertEqual((sale['type'], sale['seller'], sale['buyer'], sale['price']),
+                         ('collection_offer_accepted', SELLER, BUYER, 10 ** 18))
@@ -8,6 +8,8 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
     _TOKEN_OWNER = 'token_owner'  # Track token owner against token ID
     _TOKEN_APPROVALS = 'token_approvals'  # Track token approved owner against token ID
     _TOKEN_URIS = 'token_URIs'  # Track token URIs against token ID
+    _MINTED_TOKENS = 'minted_tokens'  # Bitmap of minted token IDs, one int value holds 256 token IDs
+    _BURNED_TOKENS = 'burned_tokens'  # Bitmap of burned token IDs, one int value holds 256 token IDs
     _OWNED_TOKENS = 'owned_tokens'  # Track tokens against token owners
     _TOTAL_SUPPLY = 'total_supply'  # Tracks total number of valid tokens (excluding ones with zero address)
     _LISTED_TOKEN_PRICES = 'listed_planet_prices'  # Tracks listed token prices against token IDs
@@ -19,14 +21,50 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
     _IS_PAUSED = 'is_paused' # Boolean value that indicates whether a contract is paused
     _IS_RESTRICTED_SALE = 'is_restricted_sale' # Boolean value that indicates if secondary token sales are restricted
     _METADATA_BASE_URL = 'metadata_base_url' # Base URL that is combined with provided token_URI when token gets minted
+    _TOKEN_URI_TEMPLATE = 'token_URI_template' # Template for token URIs (e.g. '{id}.json'). Only URIs that differ from it are stored.
     _SALE_RECORD_COUNT = 'sale_record_count'  # Number of sale records (includes successful fixed price sales and all auctions)
+    _SALE_RECORD_CAPACITY = 'sale_record_capacity'  # Number of stored sale records, older ones get archived to eventlogs. Zero keeps all records.
+    _SALE_COUNT = 'sale_count'  # Tracks number of sale records against record type
+    _SALE_VOLUME = 'sale_volume'  # Tracks sum of final prices of sale records against record type
+    _TOKEN_SALE_RECORD_COUNT = 'token_sale_record_count'  # Tracks number of sale records against token ID
+    _SELLER_SALE_RECORD_COUNT = 'seller_sale_record_count'  # Tracks number of sale records against seller address
+    _BUYER_SALE_RECORD_COUNT = 'buyer_sale_record_count'  # Tracks number of purchase records against buyer address
+    _TOKEN_SALE_RECORD_START = 'token_sale_record_start'  # Tracks number of archived records removed from token sale history
+    _SELLER_SALE_RECORD_START = 'seller_sale_record_start'  # Tracks number of archived records removed from seller index
+    _BUYER_SALE_RECORD_START = 'buyer_sale_record_start'  # Tracks number of archived records removed from buyer index
+    _MAX_SALE_PRICE = 'max_sale_price'  # Highest final price of successful sales
+    _DAILY_SALE_VOLUME = 'daily_sale_volume'  # Tracks sum of final prices of successful sales against day number
+    _DAILY_SALE_COUNT = 'daily_sale_count'  # Tracks number of successful sales against day number
+    _LISTING_SEQUENCE = 'listing_sequence'  # Sequence number of the most recent listing, used for cursor based pagination
+    _FLOOR_HEAP_SIZE = 'floor_heap_size'  # Number of fixed price listings in the min-heap used for floor price
+    _COLLECTION_OFFER_COUNT = 'collection_offer_count'  # Number of collection offers ever made, used as offer ID
+    _COLLECTION_OFFER_HEAP_SIZE = 'collection_offer_heap_size'  # Number of open collection offers in the max-heap
+    _REFUND_BALANCE = 'refund_balance'  # Tracks returned offers and bids that can be withdrawn against bidder address
     _SELLER_FEE = 'seller_fee' # Percentage that the marketplace takes from each token sale. Number is divided by 100000 to get the percentage value. (e.g 2500 equals 2.5%)
     _APPROVED_CONTRACT = 'approved_contract' # Address of an approved contract that interact with Nebula contract to approve token transfers.
+    _SNAPSHOT_IMPORT_CLOSED = 'snapshot_import_closed' # Boolean value that indicates whether importing state snapshots is permanently disabled
+    _STORAGE_VERSION = 'storage_version'  # Number of migration steps applied to storage, 0 for contracts deployed before versioning
+    _MIGRATION_CURSOR = 'migration_cursor'  # Number of items processed by the migration step that is in progress
+    _MIGRATION_ITEM_COUNT = 'migration_item_count'  # Number of items present at contract update against pending migration step
 
     _MAX_ITERATION_LOOP = 100
     _MINIMUM_BID_INCREMENT = 5
+    _BID_HISTORY_SIZE = 100  # Number of most recent bids kept in bid history of an auction
+    _MAX_TOKEN_OFFERS = 100  # Number of offers kept for a token, the lowest one is returned when a higher offer is made
     _ICX_TO_LOOPS = 1000000000000000000
 
+    _SALE_RECORD_TYPES = ('sale_success', 'auction_success', 'auction_unsold', 'auction_cancelled',
+                          'dutch_auction_success', 'offer_accepted', 'collection_offer_accepted')
+    _SUCCESSFUL_SALE_TYPES = ('sale_success', 'auction_success', 'dutch_auction_success', 'offer_accepted',
+                              'collection_offer_accepted')
+    _DUTCH_AUCTION_PRICE = -2  # Listed token price marking a Dutch auction, English auctions are marked with -1
+    _BATCHED_AUCTION_PRICE = -3  # Listed token price marking an auction that collects bids and settles them at the end
+    _DAY_IN_MICROSECONDS = 24 * 3600 * 1000 * 1000
+    _SALE_RECORD_MIGRATION_STEP = 3  # Migration step that adds sale records created before indexes to the indexes
+
+    _TOKEN_ID_PLACEHOLDER = '{id}'
+    _BITMAP_SLOT_SIZE = 256
+
     _ZERO_ADDRESS = Address.from_prefix_and_int(AddressPrefix.EOA, 0)
 
     def __init__(self, db: IconScoreDatabase) -> None:
@@ -35,6 +73,8 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
         self._token_owner = DictDB(self._TOKEN_OWNER, db, value_type=Address)
         self._token_approvals = DictDB(self._TOKEN_APPROVALS, db, value_type=Address)
         self._token_URIs = DictDB(self._TOKEN_URIS, db, value_type=str)
+        self._minted_tokens = DictDB(self._MINTED_TOKENS, db, value_type=int)
+        self._burned_tokens = DictDB(self._BURNED_TOKENS, db, value_type=int)
         self._total_supply = VarDB(self._TOTAL_SUPPLY, db, value_type=int)
         self._total_listed_token_count = VarDB(self._TOTAL_LISTED_TOKEN_COUNT, db, value_type=int)
         self._owner_listed_token_count = DictDB(self._OWNER_LISTED_TOKEN_COUNT, db, value_type=int)
@@ -45,9 +85,31 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
         self._is_paused = VarDB(self._IS_PAUSED, db, value_type=bool)
         self._is_restricted_sale = VarDB(self._IS_RESTRICTED_SALE, db, value_type=bool)
         self._metadataBaseURL = VarDB(self._METADATA_BASE_URL, db, value_type=str)
+        self._token_URI_template = VarDB(self._TOKEN_URI_TEMPLATE, db, value_type=str)
         self._sale_record_count = VarDB(self._SALE_RECORD_COUNT, db, value_type=int)
+        self._sale_record_capacity = VarDB(self._SALE_RECORD_CAPACITY, db, value_type=int)
+        self._sale_count = DictDB(self._SALE_COUNT, db, value_type=int)
+        self._sale_volume = DictDB(self._SALE_VOLUME, db, value_type=int)
+        self._token_sale_record_count = DictDB(self._TOKEN_SALE_RECORD_COUNT, db, value_type=int)
+        self._seller_sale_record_count = DictDB(self._SELLER_SALE_RECORD_COUNT, db, value_type=int)
+        self._buyer_sale_record_count = DictDB(self._BUYER_SALE_RECORD_COUNT, db, value_type=int)
+        self._token_sale_record_start = DictDB(self._TOKEN_SALE_RECORD_START, db, value_type=int)
+        self._seller_sale_record_start = DictDB(self._SELLER_SALE_RECORD_START, db, value_type=int)
+        self._buyer_sale_record_start = DictDB(self._BUYER_SALE_RECORD_START, db, value_type=int)
+        self._max_sale_price = VarDB(self._MAX_SALE_PRICE, db, value_type=int)
+        self._daily_sale_volume = DictDB(self._DAILY_SALE_VOLUME, db, value_type=int)
+        self._daily_sale_count = DictDB(self._DAILY_SALE_COUNT, db, value_type=int)
+        self._listing_sequence = VarDB(self._LISTING_SEQUENCE, db, value_type=int)
+        self._floor_heap_size = VarDB(self._FLOOR_HEAP_SIZE, db, value_type=int)
+        self._collection_offer_count = VarDB(self._COLLECTION_OFFER_COUNT, db, value_type=int)
+        self._collection_offer_heap_size = VarDB(self._COLLECTION_OFFER_HEAP_SIZE, db, value_type=int)
+        self._refund_balance = DictDB(self._REFUND_BALANCE, db, value_type=int)
         self._seller_fee = VarDB(self._SELLER_FEE, db, value_type=int)
         self._approved_contract = VarDB(self._APPROVED_CONTRACT, db, value_type=Address)
+        self._snapshot_import_closed = VarDB(self._SNAPSHOT_IMPORT_CLOSED, db, value_type=bool)
+        self._storage_version = VarDB(self._STORAGE_VERSION, db, value_type=int)
+        self._migration_cursor = VarDB(self._MIGRATION_CURSOR, db, value_type=int)
+        self._migration_item_count = DictDB(self._MIGRATION_ITEM_COUNT, db, value_type=int)
 
         self._db = db
 
@@ -60,9 +122,19 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
         self._is_restricted_sale.set(False)
         self._metadataBaseURL.set('')
         self._seller_fee.set(0) # equals 2.5%
+        self._storage_version.set(len(self._migration_steps()))
 
     def on_update(self) -> None:
         super().on_update()
+        # Snapshot import is only meant for fresh deployments, contracts upgraded in place keep their state
+        self._snapshot_import_closed.set(True)
+        # Items created after the update are stored in the new layout, so pending migration steps only process
+        # items that existed at the first update which introduced them
+        steps = self._migration_steps()
+        for step in range(self._storage_version.get() + 1, len(steps) + 1):
+            if step not in self._migration_item_count:
+                get_item_count, _ = steps[step - 1]
+                self._migration_item_count[step] = get_item_count()
 
     @external(readonly=True)
     def name(self) -> str:
@@ -164,12 +236,60 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
         self._ensure_positive(_tokenId)
         owner = self._token_owner[_tokenId]
         if owner is None:
+            if self._is_token_burned(_tokenId):
+                revert("Invalid _tokenId. NFT is burned")
             revert("Invalid _tokenId. NFT is not minted")
         if self._is_zero_address(owner):
             revert("Invalid _tokenId. NFT is burned")
 
         return owner
 
+    @external(readonly=True)
+    def owners_of(self, _token_ids: List[int]) -> dict:
+        """
+        Returns dict of token owners, where key is _tokenId and value is owner address.
+        Value is None for tokens that are not minted or are burned. Maximum 100 tokens can be queried at once.
+        """
+        self._check_batch_size(_token_ids)
+        owners = {}
+        for token_id in _token_ids:
+            owners[str(token_id)] = self._get_valid_token_owner(token_id)
+        return owners
+
+    def _get_valid_token_owner(self, _token_id: int):
+        # Returns owner of a token or None when token is not minted or is burned.
+        owner = self._token_owner[_token_id]
+        if owner is None or self._is_zero_address(owner):
+            return None
+        return owner
+
+    @external(readonly=True)
+    def exists_batch(self, _token_ids: List[int]) -> dict:
+        """
+        Returns dict of token existence, where key is _tokenId and value is True for minted tokens that are
+        not burned. Maximum 100 tokens can be queried at once.
+        """
+        self._check_batch_size(_token_ids)
+        minted_slots = {}
+        burned_slots = {}
+        result = {}
+        for token_id in _token_ids:
+            slot, bit = self._get_bitmap_position(token_id)
+            if slot not in minted_slots:
+                minted_slots[slot] = self._minted_tokens[slot]
+            if minted_slots[slot] & bit:
+                if slot not in burned_slots:
+                    burned_slots[slot] = self._burned_tokens[slot]
+                result[str(token_id)] = not burned_slots[slot] & bit
+            else:
+                # Tokens minted before minted bitmap was introduced are only tracked by owner
+                result[str(token_id)] = self._get_valid_token_owner(token_id) is not None
+        return result
+
+    def _check_batch_size(self, _token_ids: list):
+        if len(_token_ids) > self._MAX_ITERATION_LOOP:
+            revert(f'Can not query more than {self._MAX_ITERATION_LOOP} tokens at once')
+
     @external(readonly=True)
     def getApproved(self, _tokenId: int) -> Address:
         """
@@ -250,9 +370,10 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
         self._ensure_positive(_token_id)
         if self._minter.get() != self.msg.sender:
             revert('You are not allowed to mint tokens')
-        if _token_id in self._token_owner:
+        if self._is_token_minted(_token_id):
             revert("Token already exists")
         self._add_tokens_to(_to, _token_id)
+        self._set_bitmap_bit(self._minted_tokens, _token_id)
         self._set_token_URI(_token_id, _token_URI)
         self._create_new_token_index(_token_id)
         self.Transfer(self._ZERO_ADDRESS, _to, _token_id)
@@ -265,17 +386,42 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
         self._burn(_token_id)
 
     def _burn(self, _token_id: int):
+        # Bids of an auction are held by the contract until the auction ends, so auctioned tokens can not be burned
+        self._check_that_token_is_not_auctioned(_token_id)
         self._clear_approval(_token_id)
         token_owner = self.ownerOf(_token_id)
         if self.get_token_price(_token_id):
             self._delist_token(token_owner, _token_id)
         self._remove_tokens_from(token_owner, _token_id)
+        del self._token_owner[_token_id]
+        self._set_bitmap_bit(self._burned_tokens, _token_id)
         self._remove_token_URI(_token_id)
         tokenIndex = self._get_token_index_by_token_id(_token_id)
         self._adjust_token_index(tokenIndex)
 
         self.Transfer(token_owner, self._ZERO_ADDRESS, _token_id)
 
+    def _get_bitmap_position(self, _token_id: int) -> tuple:
+        # Returns bitmap slot and bit mask of a given token ID
+        return _token_id // self._BITMAP_SLOT_SIZE, 1 << (_token_id % self._BITMAP_SLOT_SIZE)
+
+    def _set_bitmap_bit(self, _bitmap: DictDB, _token_id: int):
+        slot, bit = self._get_bitmap_position(_token_id)
+        _bitmap[slot] = _bitmap[slot] | bit
+
+    def _is_bitmap_bit_set(self, _bitmap: DictDB, _token_id: int) -> bool:
+        slot, bit = self._get_bitmap_position(_token_id)
+        return _bitmap[slot] & bit != 0
+
+    def _is_token_minted(self, _token_id: int) -> bool:
+        # Tokens minted before minted bitmap was introduced are recognized by their owner entry while they exist
+        # and by the burned bitmap after they are burned
+        return self._is_bitmap_bit_set(self._minted_tokens, _token_id) or _token_id in self._token_owner or \
+            self._is_token_burned(_token_id)
+
+    def _is_token_burned(self, _token_id: int) -> bool:
+        return self._is_bitmap_bit_set(self._burned_tokens, _token_id)
+
     def _is_zero_address(self, _address: Address) -> bool:
         # Check if address is zero address
         if _address == self._ZERO_ADDRESS:
@@ -319,16 +465,68 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
         """
         self._ensure_positive(_tokenId)
 
-        token_URI = self._token_URIs[_tokenId]
+        token_URI = self._get_token_URI(self._token_URI_template.get(), _tokenId)
         if token_URI is None:
             revert("NFT with given _tokenId does not have metadata")
-        if self._is_zero_address(token_URI):
-            revert("Invalid _tokenId. NFT is burned")
 
         baseURL = self._metadataBaseURL.get()
 
         return baseURL + token_URI
 
+    @external(readonly=True)
+    def token_URIs(self, _token_ids: List[int]) -> dict:
+        """
+        Returns dict of token URIs, where key is _tokenId and value is URI.
+        Value is None for tokens without metadata. Maximum 100 tokens can be queried at once.
+        """
+        self._check_batch_size(_token_ids)
+        base_URL = self._metadataBaseURL.get()
+        template = self._token_URI_template.get()
+        token_URIs = {}
+        for token_id in _token_ids:
+            token_URIs[str(token_id)] = self._get_full_token_URI(base_URL, template, token_id)
+        return token_URIs
+
+    @external(readonly=True)
+    def token_details(self, _token_ids: List[int]) -> dict:
+        """
+        Returns dict of token owners and URIs, where key is _tokenId and value is a dict with "owner"
+        and "token_URI". Values are None for tokens that are not minted or are burned.
+        Maximum 100 tokens can be queried at once.
+        """
+        self._check_batch_size(_token_ids)
+        base_URL = self._metadataBaseURL.get()
+        template = self._token_URI_template.get()
+        details = {}
+        for token_id in _token_ids:
+            details[str(token_id)] = {
+                "owner": self._get_valid_token_owner(token_id),
+                "token_URI": self._get_full_token_URI(base_URL, template, token_id)
+            }
+        return details
+
+    def _get_full_token_URI(self, _base_URL: str, _template: str, _token_id: int):
+        # Returns base URL combined with token URI or None when token has no metadata.
+        token_URI = self._get_token_URI(_template, _token_id)
+        if token_URI is None:
+            return None
+        return _base_URL + token_URI
+
+    def _get_token_URI(self, _template: str, _token_id: int):
+        """
+        Returns token URI without base URL. Tokens without a stored URI use the URI template, as long as
+        the token exists. Returns None when token has no metadata.
+        """
+        token_URI = self._token_URIs[_token_id]
+        if token_URI:
+            return token_URI
+        if _template and self._get_valid_token_owner(_token_id) is not None:
+            return self._render_token_URI(_template, _token_id)
+        return None
+
+    def _render_token_URI(self, _template: str, _token_id: int) -> str:
+        return _template.replace(self._TOKEN_ID_PLACEHOLDER, str(_token_id))
+
     @external
     def set_token_URI(self, _token_id: int, _token_URI: str):
         """
@@ -340,6 +538,12 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
 
     def _set_token_URI(self, _token_id: int, _token_URI: str):
         self._ensure_positive(_token_id)
+        template = self._token_URI_template.get()
+        if template and (not _token_URI or _token_URI == self._render_token_URI(template, _token_id)):
+            # URI follows the template, so there is no need to store it
+            if _token_id in self._token_URIs:
+                del self._token_URIs[_token_id]
+            return
         self._token_URIs[_token_id] = _token_URI
 
     def _remove_token_URI(self, _token_id: int):
@@ -351,6 +555,25 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
             revert('You do not have permission set metadata base URL')
         self._metadataBaseURL.set(_base_URL)
 
+    @external(readonly=True)
+    def metadata_base_URL(self) -> str:
+        return self._metadataBaseURL.get()
+
+    @external
+    def set_token_URI_template(self, _template: str):
+        """
+        Sets URI template used for tokens without a stored URI. Placeholder '{id}' is replaced with token ID,
+        e.g. '{id}.json'. Tokens minted with a URI that matches the template don't store their URI, so changing
+        or clearing the template also changes URIs of these tokens.
+        """
+        if self._minter.get() != self.msg.sender:
+            revert('You do not have permission set token URI template')
+        self._token_URI_template.set(_template)
+
+    @external(readonly=True)
+    def token_URI_template(self) -> str:
+        return self._token_URI_template.get()
+
     @external
     def set_seller_fee(self, _new_fee: int):
         if self._director.get() != self.msg.sender:
@@ -416,9 +639,8 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
             self._set_owner_token_index(_from, index, last_token)
         self._remove_owner_token_index(_from, last_index)
 
-        # Remove token ownership and subtract owner's token count by 1
+        # Subtract owner's token count by 1. Token ownership is overwritten by new owner or removed on burn.
         self._owned_token_count[_from] -= 1
-        self._token_owner[_token_id] = self._ZERO_ADDRESS
 
     @external(readonly=True)
     def tokenByIndex(self, _index: int) -> int:
@@ -448,7 +670,7 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
         lastToken = self.tokenByIndex(lastIndex)
         self._remove_token_index(_token_id)
         self._remove_token_index(lastIndex)
-        if lastIndex > 1:
+        if _token_id != lastIndex:
             self._set_token_index(_token_id, lastToken)
         self._decrement_total_supply()
 
@@ -503,7 +725,7 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
             revert("Token is already listed")
 
     def _check_that_token_is_not_auctioned(self, _token_id):
-        if self._listed_token_prices[str(_token_id)] == -1:
+        if self._listed_token_prices[str(_token_id)] in (-1, self._BATCHED_AUCTION_PRICE):
             revert("Token is currently on auction")
 
     def _check_that_token_is_on_auction(self, _token_id):
@@ -535,12 +757,12 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
         self._check_that_token_is_not_auctioned(_token_id)
         self._check_that_token_is_not_listed(_token_id)
 
-        self._increment_listed_token_count()
-        self._set_listed_token_index(self._total_listed_token_count.get(), _token_id)
+        self._add_token_listing(_token_id)
         self._listed_token_prices[str(_token_id)] = _price
+        self._add_to_floor_heap(_token_id, _price)
 
         self._owner_listed_token_count[sender] += 1
-        self._set_owner_listed_token_index(sender, self._owner_listed_token_count[sender], _token_id)
+        self._set_owner_listed_token_index(sender, self._owner_listed_token_count[sender], _token_id, _price)
         self.ListToken(owner, _token_id, _price)
 
     @external(readonly=True)
@@ -567,6 +789,33 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
                 tokens[str(token_id)] = price # Convert tokenId to string so it can be used as key
         return tokens
 
+    @external(readonly=True)
+    def listed_tokens_by_cursor(self, _cursor: int = 0, _limit: int = 100) -> dict:
+        """
+        Returns tokens listed for sale (key is _tokenId, value is price, -1 for auctions, -2 for Dutch auctions or
+        -3 for batched auctions) in the order they were listed, together with next_cursor to pass to the following
+        call. Listings get an increasing sequence number, so listings removed or added between calls do not shift
+        the remaining ones and every listing is returned exactly once. Checks _limit (up to 100) sequence numbers
+        after _cursor, so a page can contain less tokens than _limit even if has_more is True.
+        """
+        if _cursor < 0:
+            revert('Cursor can not be negative')
+        if _limit < 1 or _limit > self._MAX_ITERATION_LOOP:
+            revert(f'Limit needs to be between 1 and {self._MAX_ITERATION_LOOP}')
+
+        last_sequence = self._listing_sequence.get()
+        next_cursor = max(min(_cursor + _limit, last_sequence), _cursor)
+        tokens = {}
+        for sequence in range(_cursor + 1, next_cursor + 1):
+            token_id = self._listing_sequence_token(sequence).get()
+            if token_id:
+                tokens[str(token_id)] = self.get_token_price(token_id)
+        return {
+            "tokens": tokens,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor < last_sequence
+        }
+
     @external(readonly=True)
     def listed_token_count_by_owner(self, _owner: Address) -> int:
         """ Returns total number of tokens listed for sale by _owner. """
@@ -582,17 +831,49 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
         required. Optional parameter _offset can be used to get next batch of tokens.
         For example: listedTokens(100) returns tokens 101-200.
         """
-        iteration_count = self.listed_token_count_by_owner(_owner)
-        if self._MAX_ITERATION_LOOP < self.total_listed_token_count():
-            iteration_count = self._MAX_ITERATION_LOOP
+        last_index = min(self.listed_token_count_by_owner(_owner), offset + self._MAX_ITERATION_LOOP)
         tokens = {}
-        for x in range(1 + offset, iteration_count + offset + 1):
-            token_id = self.get_listed_token_of_owner_by_index(_owner, x)
-            price = self.get_token_price(token_id)
-            if token_id and price:
-                tokens[str(token_id)] = price # Convert tokenId to string so it can be used as key
+        for x in range(1 + offset, last_index + 1):
+            token_id, price = self._get_owner_listing(_owner, x)
+            tokens[str(token_id)] = price # Convert tokenId to string so it can be used as key
         return tokens
 
+    @external(readonly=True)
+    def listings_of_owner(self, _owner: Address, _cursor: int = 0, _limit: int = 100) -> dict:
+        """
+        Returns up to _limit (maximum 100) listings of _owner after position _cursor of owner's listing index.
+        Every listing has token_id, price (-1 for auctions, -2 for Dutch auctions, -3 for batched auctions) and type
+        ('fixed', 'auction', 'dutch_auction' or 'batched_auction'). Pass returned next_cursor to get the following
+        page. Delisting moves owner's last listing into the freed position.
+        """
+        if _cursor < 0:
+            revert('Cursor can not be negative')
+        if _limit < 1 or _limit > self._MAX_ITERATION_LOOP:
+            revert(f'Limit needs to be between 1 and {self._MAX_ITERATION_LOOP}')
+
+        listing_count = self.listed_token_count_by_owner(_owner)
+        next_cursor = max(min(_cursor + _limit, listing_count), _cursor)
+        listings = []
+        for index in range(_cursor + 1, next_cursor + 1):
+            token_id, price = self._get_owner_listing(_owner, index)
+            listing_type = 'fixed'
+            if price == -1:
+                listing_type = 'auction'
+            elif price == self._DUTCH_AUCTION_PRICE:
+                listing_type = 'dutch_auction'
+            elif price == self._BATCHED_AUCTION_PRICE:
+                listing_type = 'batched_auction'
+            listings.append({
+                "token_id": token_id,
+                "price": price,
+                "type": listing_type
+            })
+        return {
+            "listings": listings,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor < listing_count
+        }
+
     @external
     def delist_token(self, _token_id: int):
         """ Removes token from sale. Throws if token is not listed. Throws if sender does not own the token. """
@@ -607,21 +888,37 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
         self._delist_token(owner, _token_id)
 
     def _delist_token(self, _owner: Address, _token_id: int):
+        if self.get_token_price(_token_id) == self._DUTCH_AUCTION_PRICE:
+            self._finish_dutch_auction(_token_id)
+        self._remove_from_floor_heap(_token_id)
         self._remove_token_listing(_token_id)
         self._remove_owner_token_listing(_owner, _token_id)
         self.clear_token_price(_token_id)
 
         self.DelistToken(_owner, _token_id)
 
+    def _add_token_listing(self, _token_id: int):
+        """ Appends token to listing index and gives the listing next sequence number. """
+        self._increment_listed_token_count()
+        self._set_listed_token_index(self._total_listed_token_count.get(), _token_id)
+        self._set_listing_sequence(_token_id)
+
     def _remove_token_listing(self, _tokenId: int):
         """ Adjusts token indexes by deleting token that is about to be removed and moving last token in its place. """
+        sequence = self._token_listing_sequence(_tokenId).get()
+        if sequence:
+            self._listing_sequence_token(sequence).remove()
+            self._token_listing_sequence(_tokenId).remove()
         active_index = self._get_listed_token_index_by_token_id(_tokenId)
         last_index = self.total_listed_token_count()
         last_token = self.get_listed_token_by_index(last_index)
         self._remove_listed_token_index(active_index)
         self._remove_listed_token_index(last_index)
-        if last_index > 1:
+        if active_index != last_index:
             self._set_listed_token_index(active_index, last_token)
+            if self._storage_version.get() < len(self._migration_steps()):
+                # Listing moved to a position the running migration step may have already passed
+                self._migrate_listed_token(last_token)
         self._decrement_listed_token_count()
 
     def _remove_owner_token_listing(self, _owner: Address, _token_id: int):
@@ -631,11 +928,11 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
         """
         active_index = self._get_listed_token_of_owner_by_token_id(_owner, _token_id)
         last_index = self.listed_token_count_by_owner(_owner)
-        last_token = self.get_listed_token_of_owner_by_index(_owner, last_index)
+        last_listing = self._owner_listed_token_index(_owner, last_index).get()
         self._remove_owner_listed_token_index(_owner, active_index)
         self._remove_owner_listed_token_index(_owner, last_index)
-        if last_index > 1:
-            self._set_owner_listed_token_index(_owner, active_index, last_token)
+        if active_index != last_index:
+            self._owner_listed_token_index(_owner, active_index).set(last_listing)
         self._owner_listed_token_count[_owner] -= 1
 
     def _get_listed_token_of_owner_by_token_id(self, _owner: Address, _token_id: int) -> int:
@@ -700,6 +997,7 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
                                  _end_time=self.now())
 
         self.PurchaseToken(seller, buyer, _token_id)
+        self.PurchaseTokenWithPrice(seller, buyer, _token_id, token_price)
 
     def _calculate_seller_fee(self, price: int) -> int:
         return price * self._seller_fee.get() / 100000
@@ -721,12 +1019,23 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
         """
         result = self._owner_listed_token_index(_owner, _index).get()
         if result:
-            return int(result)
+            return int(result.partition(':')[0])
         else:
             return 0
 
-    def _set_owner_listed_token_index(self, _address: Address, _index: int, _token_id: int):
-        self._owner_listed_token_index(_address, _index).set(str(_token_id))
+    def _get_owner_listing(self, _owner: Address, _index: int) -> tuple:
+        """ Returns token ID and price of _owner's listing on index _index, or (0, 0) when there is none. """
+        listing = self._owner_listed_token_index(_owner, _index).get()
+        if not listing:
+            return 0, 0
+        token_id, _, price = listing.partition(':')
+        # Listings created before prices were stored in owner's listing index only hold token ID
+        return int(token_id), int(price) if price else self.get_token_price(int(token_id))
+
+    def _set_owner_listed_token_index(self, _address: Address, _index: int, _token_id: int, _price: int):
+        # Price is stored together with token ID (e.g. '12:1000'), so owner's listings are read with one read each.
+        # Listing price does not change while token is listed.
+        self._owner_listed_token_index(_address, _index).set(f'{_token_id}:{_price}')
 
     def _remove_owner_listed_token_index(self, _address: Address, _index: int):
         self._owner_listed_token_index(_address, _index).remove()
@@ -753,6 +1062,18 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
         self._listed_token_index(_index).remove()
         self._listed_token(token_id).remove()
 
+    def _listing_sequence_token(self, _sequence: int) -> VarDB:
+        return VarDB(f'LISTING_SEQUENCE_{str(_sequence)}', self._db, value_type=int)
+
+    def _token_listing_sequence(self, _token_id: int) -> VarDB:
+        return VarDB(f'LISTING_{str(_token_id)}_SEQUENCE', self._db, value_type=int)
+
+    def _set_listing_sequence(self, _token_id: int):
+        sequence = self._listing_sequence.get() + 1
+        self._listing_sequence.set(sequence)
+        self._listing_sequence_token(sequence).set(_token_id)
+        self._token_listing_sequence(_token_id).set(sequence)
+
     def _find_listed_token_index_by_token_id(self, _owner: Address, _token_id: int) -> int:
         # Returns listing index of a given _token_id of _owner. Returns 0 when no result.
         number_of_tokens = self.listed_token_count_by_owner(_owner)
@@ -761,6 +1082,81 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
                 return x
         return 0
 
+    # ================================================
+    #  Floor price
+    # ================================================
+
+    def _floor_heap_token(self, _position: int) -> VarDB:
+        return VarDB(f'FLOOR_HEAP_{str(_position)}', self._db, value_type=int)
+
+    def _floor_heap_position(self, _token_id: int) -> VarDB:
+        return VarDB(f'FLOOR_HEAP_POSITION_{str(_token_id)}', self._db, value_type=int)
+
+    def _floor_price(self) -> int:
+        """ Returns the lowest price of tokens listed with a fixed price, 0 when there are no such listings. """
+        if not self._floor_heap_size.get():
+            return 0
+        return self.get_token_price(self._floor_heap_token(1).get())
+
+    def _add_to_floor_heap(self, _token_id: int, _price: int):
+        """
+        Adds fixed price listing to a binary min-heap ordered by price. Heap is stored as FLOOR_HEAP_{position}
+        entries together with reverse FLOOR_HEAP_POSITION_{token_id} entries, so that any listing can be removed
+        in O(log n) storage operations.
+        """
+        size = self._floor_heap_size.get() + 1
+        self._floor_heap_size.set(size)
+        self._sift_floor_heap_up(size, _token_id, _price)
+
+    def _remove_from_floor_heap(self, _token_id: int):
+        position = self._floor_heap_position(_token_id).get()
+        if not position:
+            return  # Auctions and listings created before floor heap was introduced are not in the heap
+        size = self._floor_heap_size.get()
+        last_token = self._floor_heap_token(size).get()
+        self._floor_heap_token(size).remove()
+        self._floor_heap_position(_token_id).remove()
+        self._floor_heap_size.set(size - 1)
+        if position == size:
+            return
+
+        # Last token takes the freed position and is moved up or down to restore heap order
+        last_price = self.get_token_price(last_token)
+        new_position = self._sift_floor_heap_up(position, last_token, last_price)
+        if new_position == position:
+            self._sift_floor_heap_down(position, last_token, last_price, size - 1)
+
+    def _sift_floor_heap_up(self, _position: int, _token_id: int, _price: int) -> int:
+        while _position > 1:
+            parent = _position // 2
+            parent_token = self._floor_heap_token(parent).get()
+            if self.get_token_price(parent_token) <= _price:
+                break
+            self._set_floor_heap_token(_position, parent_token)
+            _position = parent
+        self._set_floor_heap_token(_position, _token_id)
+        return _position
+
+    def _sift_floor_heap_down(self, _position: int, _token_id: int, _price: int, _size: int):
+        while _position * 2 <= _size:
+            child = _position * 2
+            child_token = self._floor_heap_token(child).get()
+            child_price = self.get_token_price(child_token)
+            if child < _size:
+                right_token = self._floor_heap_token(child + 1).get()
+                right_price = self.get_token_price(right_token)
+                if right_price < child_price:
+                    child, child_token, child_price = child + 1, right_token, right_price
+            if child_price >= _price:
+                break
+            self._set_floor_heap_token(_position, child_token)
+            _position = child
+        self._set_floor_heap_token(_position, _token_id)
+
+    def _set_floor_heap_token(self, _position: int, _token_id: int):
+        self._floor_heap_token(_position).set(_token_id)
+        self._floor_heap_position(_token_id).set(_position)
+
     # ================================================
     #  Auction
     # ================================================
@@ -783,6 +1179,13 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
     def _auction_item_seller(self, _token_id: int) -> VarDB:
         return VarDB(f'AUCTION_{str(_token_id)}_SELLER', self._db, value_type=Address)
 
+    def _auction_item_bid_count(self, _token_id: int) -> VarDB:
+        return VarDB(f'AUCTION_{str(_token_id)}_BID_COUNT', self._db, value_type=int)
+
+    def _auction_item_bid(self, _token_id: int, _slot: int) -> VarDB:
+        # Bid is stored as '{bidder}:{amount}:{timestamp}' in one of _BID_HISTORY_SIZE slots
+        return VarDB(f'AUCTION_{str(_token_id)}_BID_{str(_slot)}', self._db, value_type=str)
+
     @external
     def create_auction(self,  _token_id: int, _starting_price: int, _duration_in_hours: int):
         """
@@ -802,11 +1205,10 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
         if _duration_in_hours > 336:
             revert("Auction duration can not be longer than two weeks")
 
-        self._increment_listed_token_count()
-        self._set_listed_token_index(self._total_listed_token_count.get(), _token_id)
+        self._add_token_listing(_token_id)
         self._listed_token_prices[str(_token_id)] = -1
         self._owner_listed_token_count[sender] += 1
-        self._set_owner_listed_token_index(sender, self._owner_listed_token_count[sender], _token_id)
+        self._set_owner_listed_token_index(sender, self._owner_listed_token_count[sender], _token_id, -1)
 
         start_time = self.now()
         end_time = start_time + _duration_in_hours * 3600 * 1000 * 1000
@@ -816,6 +1218,8 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
         self._auction_item_starting_price(_token_id).set(_starting_price)
         self._auction_item_seller(_token_id).set(owner)
 
+        self.AuctionCreated(owner, _token_id, _starting_price, start_time, end_time)
+
     def _finish_auction(self, _token_id):
         self._auction_item_start_time(_token_id).remove()
         self._auction_item_end_time(_token_id).remove()
@@ -823,6 +1227,48 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
         self._auction_item_current_bid(_token_id).remove()
         self._auction_item_highest_bidder(_token_id).remove()
         self._auction_item_seller(_token_id).remove()
+        self._clear_bid_history(_token_id)
+
+    def _add_to_bid_history(self, _token_id: int, _bidder: Address, _amount: int, _time: int):
+        """ Appends a bid to auction's bid history. Once history is full, every bid overwrites the oldest one. """
+        bid_count = self._auction_item_bid_count(_token_id).get() + 1
+        self._auction_item_bid_count(_token_id).set(bid_count)
+        slot = (bid_count - 1) % self._BID_HISTORY_SIZE + 1
+        self._auction_item_bid(_token_id, slot).set(f'{str(_bidder)}:{_amount}:{_time}')
+
+    def _clear_bid_history(self, _token_id: int):
+        # All bids are also available in BidPlaced eventlogs
+        bid_count = self._auction_item_bid_count(_token_id).get()
+        if not bid_count:
+            return
+        for slot in range(1, min(bid_count, self._BID_HISTORY_SIZE) + 1):
+            self._auction_item_bid(_token_id, slot).remove()
+        self._auction_item_bid_count(_token_id).remove()
+
+    @external(readonly=True)
+    def get_bid_history(self, _token_id: int, _offset: int = 0, _limit: int = 100) -> list:
+        """
+        Returns bids (bidder, amount and timestamp) of an ongoing or unclaimed auction in the order they were
+        placed. Only 100 most recent bids are kept. Skips _offset oldest kept bids and returns maximum _limit bids.
+        Maximum 100 bids can be requested at once. History is removed when auction is finished.
+        """
+        if _offset < 0:
+            revert('Offset can not be negative')
+        if _limit < 1 or _limit > self._MAX_ITERATION_LOOP:
+            revert(f'Limit needs to be between 1 and {self._MAX_ITERATION_LOOP}')
+
+        bid_count = self._auction_item_bid_count(_token_id).get()
+        first_bid = max(bid_count - self._BID_HISTORY_SIZE, 0) + 1
+        bids = []
+        for bid_number in range(first_bid + _offset, min(first_bid + _offset + _limit - 1, bid_count) + 1):
+            slot = (bid_number - 1) % self._BID_HISTORY_SIZE + 1
+            bidder, amount, timestamp = self._auction_item_bid(_token_id, slot).get().split(':')
+            bids.append({
+                "bidder": Address.from_string(bidder),
+                "amount": int(amount),
+                "timestamp": int(timestamp)
+            })
+        return bids
 
     @external(readonly=True)
     def get_auction_info(self, _token_id: int) -> dict:
@@ -899,6 +1345,7 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
 
         self._auction_item_highest_bidder(_token_id).set(self.msg.sender)
         self._auction_item_current_bid(_token_id).set(self.msg.value)
+        self._add_to_bid_history(_token_id, self.msg.sender, self.msg.value, self.now())
 
         # If bid existed, return last bid to previous high bidder
         if last_bidder:
@@ -906,7 +1353,10 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
 
         # When a last minute bid is place, the auction end time will be extended by one minute.
         if self.now() > end_time - 1000 * 1000 * 60:
-            self._auction_item_end_time(_token_id).set(end_time + 1000 * 1000 * 120)
+            end_time += 1000 * 1000 * 120
+            self._auction_item_end_time(_token_id).set(end_time)
+
+        self.BidPlaced(self.msg.sender, _token_id, self.msg.value, end_time)
 
     @external
     def finalize_auction(self, _token_id: int):
@@ -944,6 +1394,8 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
         fee = self._calculate_seller_fee(last_bid)
         self.icx.transfer(seller, int(last_bid - fee))
 
+        self.AuctionFinalized(seller, buyer, _token_id, last_bid)
+
     @external
     def return_unsold_item(self, _token_id: int):
         """
@@ -971,6 +1423,8 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
         self._delist_token(owner, _token_id)
         self._finish_auction(_token_id)
 
+        self.AuctionUnsold(owner, _token_id)
+
     @external
     def cancel_auction(self, _token_id: int):
         """
@@ -1001,37 +1455,825 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
         self._delist_token(owner, _token_id)
         self._finish_auction(_token_id)
 
+        self.AuctionCancelled(owner, _token_id)
+
+    # ================================================
+    #  Dutch auction
+    # ================================================
+
+    def _dutch_auction_start_price(self, _token_id: int) -> VarDB:
+        return VarDB(f'DUTCH_AUCTION_{str(_token_id)}_START_PRICE', self._db, value_type=int)
+
+    def _dutch_auction_end_price(self, _token_id: int) -> VarDB:
+        return VarDB(f'DUTCH_AUCTION_{str(_token_id)}_END_PRICE', self._db, value_type=int)
+
+    def _dutch_auction_start_time(self, _token_id: int) -> VarDB:
+        return VarDB(f'DUTCH_AUCTION_{str(_token_id)}_START_TIME', self._db, value_type=int)
+
+    def _dutch_auction_end_time(self, _token_id: int) -> VarDB:
+        return VarDB(f'DUTCH_AUCTION_{str(_token_id)}_END_TIME', self._db, value_type=int)
+
+    def _check_that_token_is_on_dutch_auction(self, _token_id):
+        if self._listed_token_prices[str(_token_id)] != self._DUTCH_AUCTION_PRICE:
+            revert("Token is not on Dutch auction")
+
+    @external
+    def create_dutch_auction(self, _token_id: int, _start_price: int, _end_price: int, _duration_in_hours: int):
+        """
+        Creates a Dutch auction for given _token_id. Price falls linearly from _start_price to _end_price during
+        the auction and stays at _end_price after it ends, until the token is purchased or delisted. Maximum
+        auction duration is 336 hours (2 weeks). Throws if sale is restricted or contract is paused. Throws when
+        token is already listed. Throws when sender does not own the token. Throws when prices are not positive.
+        """
+        owner = self.ownerOf(_token_id)
+        sender = self.msg.sender
+        self._check_that_sale_is_not_restricted()
+        self._check_that_contract_is_unpaused()
+        self._check_that_sender_is_nft_owner(owner)
+        self._check_that_token_is_not_listed(_token_id)
+        self._check_that_price_is_positive(_start_price)
+        self._check_that_price_is_positive(_end_price)
+
+        if _end_price > _start_price:
+            revert("End price can not be higher than start price")
+        if _duration_in_hours < 1:
+            revert("Auction duration needs to be at least one hour")
+        if _duration_in_hours > 336:
+            revert("Auction duration can not be longer than two weeks")
+
+        self._add_token_listing(_token_id)
+        self._listed_token_prices[str(_token_id)] = self._DUTCH_AUCTION_PRICE
+        self._owner_listed_token_count[sender] += 1
+        self._set_owner_listed_token_index(sender, self._owner_listed_token_count[sender], _token_id,
+                                           self._DUTCH_AUCTION_PRICE)
+
+        start_time = self.now()
+        end_time = start_time + _duration_in_hours * 3600 * 1000 * 1000
+
+        self._dutch_auction_start_price(_token_id).set(_start_price)
+        self._dutch_auction_end_price(_token_id).set(_end_price)
+        self._dutch_auction_start_time(_token_id).set(start_time)
+        self._dutch_auction_end_time(_token_id).set(end_time)
+
+        self.DutchAuctionCreated(owner, _token_id, _start_price, _end_price, start_time, end_time)
+
+    def _finish_dutch_auction(self, _token_id: int):
+        self._dutch_auction_start_price(_token_id).remove()
+        self._dutch_auction_end_price(_token_id).remove()
+        self._dutch_auction_start_time(_token_id).remove()
+        self._dutch_auction_end_time(_token_id).remove()
+
+    def _dutch_auction_price(self, _token_id: int, _time: int) -> int:
+        """ Returns price of a Dutch auction at given _time, so the falling price never has to be written. """
+        start_price = self._dutch_auction_start_price(_token_id).get()
+        end_price = self._dutch_auction_end_price(_token_id).get()
+        start_time = self._dutch_auction_start_time(_token_id).get()
+        end_time = self._dutch_auction_end_time(_token_id).get()
+        if _time >= end_time:
+            return end_price
+        elapsed = max(_time - start_time, 0)
+        return start_price - (start_price - end_price) * elapsed // (end_time - start_time)
+
+    @external(readonly=True)
+    def get_dutch_auction_info(self, _token_id: int) -> dict:
+        """ Returns Dutch auction details of _token_id together with its price at current block time. """
+        self._check_that_token_is_on_dutch_auction(_token_id)
+        return {
+            "token_id": _token_id,
+            "seller": self.ownerOf(_token_id),
+            "start_price": self._dutch_auction_start_price(_token_id).get(),
+            "end_price": self._dutch_auction_end_price(_token_id).get(),
+            "start_time": self._dutch_auction_start_time(_token_id).get(),
+            "end_time": self._dutch_auction_end_time(_token_id).get(),
+            "current_price": self._dutch_auction_price(_token_id, self.now())
+        }
+
+    @external
+    @payable
+    def purchase_dutch_auction(self, _token_id: int):
+        """
+        Purchases a token on Dutch auction for its current price. Sent ICX amount has to cover the current price,
+        the amount above it is returned to buyer, so the price falling before transaction is executed does not make
+        the purchase fail. The NFT is sent to buyer and the price (minus fee, if applicable) to seller.
+        """
+        self._check_that_contract_is_unpaused()
+        self._check_that_token_is_on_dutch_auction(_token_id)
+
+        price = self._dutch_auction_price(_token_id, self.now())
+        if self.msg.value < price:
+            revert(f'Sent ICX amount ({self.msg.value}) is lower than current auction price ({price})')
+
+        seller = self.ownerOf(_token_id)
+        buyer = self.msg.sender
+        start_price = self._dutch_auction_start_price(_token_id).get()
+        start_time = self._dutch_auction_start_time(_token_id).get()
+        self._delist_token(seller, _token_id)
+        self._transfer(seller, buyer, _token_id)
+
+        fee = self._calculate_seller_fee(price)
+
+        self.icx.transfer(seller, int(price - fee))
+        self.icx.transfer(self.address, int(fee))
+        if self.msg.value > price:
+            self.icx.transfer(buyer, self.msg.value - price)
+
+        self._create_sale_record(_token_id=_token_id,
+                                 _type='dutch_auction_success',
+                                 _seller=seller,
+                                 _buyer=buyer,
+                                 _starting_price=start_price,
+                                 _final_price=price,
+                                 _start_time=start_time,
+                                 _end_time=self.now())
+
+        self.PurchaseToken(seller, buyer, _token_id)
+        self.PurchaseTokenWithPrice(seller, buyer, _token_id, price)
+
+    # ================================================
+    #  Batched auction
+    # ================================================
+
+    def _batched_auction_starting_price(self, _token_id: int) -> VarDB:
+        return VarDB(f'BATCHED_AUCTION_{str(_token_id)}_STARTING_PRICE', self._db, value_type=int)
+
+    def _batched_auction_start_time(self, _token_id: int) -> VarDB:
+        return VarDB(f'BATCHED_AUCTION_{str(_token_id)}_START_TIME', self._db, value_type=int)
+
+    def _batched_auction_end_time(self, _token_id: int) -> VarDB:
+        return VarDB(f'BATCHED_AUCTION_{str(_token_id)}_END_TIME', self._db, value_type=int)
+
+    def _batched_auction_bid_count(self, _token_id: int) -> VarDB:
+        return VarDB(f'BATCHED_AUCTION_{str(_token_id)}_BID_COUNT', self._db, value_type=int)
+
+    def _batched_auction_bid(self, _token_id: int, _number: int) -> VarDB:
+        # Escrowed deposit of a bid, stored as '{bidder}:{amount}'
+        return VarDB(f'BATCHED_AUCTION_{str(_token_id)}_BID_{str(_number)}', self._db, value_type=str)
+
+    def _batched_auction_settled_count(self, _token_id: int) -> VarDB:
+        return VarDB(f'BATCHED_AUCTION_{str(_token_id)}_SETTLED_COUNT', self._db, value_type=int)
+
+    def _batched_auction_best_bid(self, _token_id: int) -> VarDB:
+        return VarDB(f'BATCHED_AUCTION_{str(_token_id)}_BEST_BID', self._db, value_type=int)
+
+    def _check_that_token_is_on_batched_auction(self, _token_id):
+        if self._listed_token_prices[str(_token_id)] != self._BATCHED_AUCTION_PRICE:
+            revert("Token is not on batched auction")
+
+    def _get_batched_bid(self, _token_id: int, _number: int) -> tuple:
+        bidder, amount = self._batched_auction_bid(_token_id, _number).get().split(':')
+        return Address.from_string(bidder), int(amount)
+
+    @external
+    def create_batched_auction(self, _token_id: int, _starting_price: int, _duration_in_hours: int):
+        """
+        Creates an auction for given _token_id that collects bids until it ends and settles them afterwards with
+        settle_auction. Placing a bid only appends it to the auction's escrow ledger, outbid deposits are credited
+        to refund balances during settlement and the auction end time is never extended. Maximum auction duration is 336 hours
+        (2 weeks). Throws if sale is restricted or contract is paused. Throws when token is already listed.
+        Throws when sender does not own the token. Throws when starting price is not positive.
+        """
+        owner = self.ownerOf(_token_id)
+        sender = self.msg.sender
+        self._check_that_sale_is_not_restricted()
+        self._check_that_contract_is_unpaused()
+        self._check_that_sender_is_nft_owner(owner)
+        self._check_that_token_is_not_listed(_token_id)
+        self._check_that_price_is_positive(_starting_price)
+
+        if _duration_in_hours < 1:
+            revert("Auction duration needs to be at least one hour")
+        if _duration_in_hours > 336:
+            revert("Auction duration can not be longer than two weeks")
+
+        self._add_token_listing(_token_id)
+        self._listed_token_prices[str(_token_id)] = self._BATCHED_AUCTION_PRICE
+        self._owner_listed_token_count[sender] += 1
+        self._set_owner_listed_token_index(sender, self._owner_listed_token_count[sender], _token_id,
+                                           self._BATCHED_AUCTION_PRICE)
+
+        start_time = self.now()
+        end_time = start_time + _duration_in_hours * 3600 * 1000 * 1000
+
+        self._batched_auction_starting_price(_token_id).set(_starting_price)
+        self._batched_auction_start_time(_token_id).set(start_time)
+        self._batched_auction_end_time(_token_id).set(end_time)
+
+        self.BatchedAuctionCreated(owner, _token_id, _starting_price, start_time, end_time)
+
+    @external
+    @payable
+    def place_batched_bid(self, _token_id: int):
+        """
+        Places a bid on a batched auction. Sent ICX is held in escrow until the auction is settled, when the highest
+        bid wins (the earliest one on a tie) and all other bids are credited to refund balances of their bidders. Bidding again places a separate bid.
+        Throws if auction has ended. Throws if bid amount is lower than starting price.
+        """
+        self._check_that_contract_is_unpaused()
+        self._check_that_token_is_on_batched_auction(_token_id)
+
+        if self.now() > self._batched_auction_end_time(_token_id).get():
+            revert('Can not place a bid. The auction has already ended.')
+        starting_price = self._batched_auction_starting_price(_token_id).get()
+        if self.msg.value < starting_price:
+            revert(f'Your bid ({self.msg.value}) is lower than starting price ({starting_price})')
+
+        bid_count = self._batched_auction_bid_count(_token_id).get() + 1
+        self._batched_auction_bid_count(_token_id).set(bid_count)
+        self._batched_auction_bid(_token_id, bid_count).set(f'{str(self.msg.sender)}:{self.msg.value}')
+
+        self.BidCollected(self.msg.sender, _token_id, self.msg.value)
+
+    @external(readonly=True)
+    def get_batched_auction_info(self, _token_id: int) -> dict:
+        """
+        Returns details of a batched auction. Status is 'active' while bids are collected and 'ended' when the
+        auction waits for settle_auction, settled_bids is the number of bids processed by settlement so far.
+        """
+        self._check_that_token_is_on_batched_auction(_token_id)
+        end_time = self._batched_auction_end_time(_token_id).get()
+        return {
+            "token_id": _token_id,
+            "status": 'active' if self.now() <= end_time else 'ended',
+            "seller": self.ownerOf(_token_id),
+            "starting_price": self._batched_auction_starting_price(_token_id).get(),
+            "start_time": self._batched_auction_start_time(_token_id).get(),
+            "end_time": end_time,
+            "bid_count": self._batched_auction_bid_count(_token_id).get(),
+            "settled_bids": self._batched_auction_settled_count(_token_id).get()
+        }
+
+    @external
+    def settle_auction(self, _token_id: int):
+        """
+        Settles an ended batched auction, callable by anyone. Every call processes up to 100 collected bids and
+        credits deposits of bids that are outbid to refund balances of their bidders (see withdraw_refund), so
+        auctions with many bids are settled over several calls. The call
+        that processes the last bid sends the token to the highest bidder and ICX to seller (minus fee, if
+        applicable), or keeps the token with seller when no bid was placed.
+        """
+        self._check_that_token_is_on_batched_auction(_token_id)
+        end_time = self._batched_auction_end_time(_token_id).get()
+        if self.now() <= end_time:
+            revert('Auction has not ended yet')
+
+        bid_count = self._batched_auction_bid_count(_token_id).get()
+        settled_count = self._batched_auction_settled_count(_token_id).get()
+        best_number = self._batched_auction_best_bid(_token_id).get()
+        best_bid = self._get_batched_bid(_token_id, best_number) if best_number else None
+
+        last_number = min(settled_count + self._MAX_ITERATION_LOOP, bid_count)
+        for number in range(settled_count + 1, last_number + 1):
+            bid = self._get_batched_bid(_token_id, number)
+            if best_bid and bid[1] <= best_bid[1]:
+                self._return_batched_bid(_token_id, number, bid)
+                continue
+            if best_bid:
+                self._return_batched_bid(_token_id, best_number, best_bid)
+            best_number, best_bid = number, bid
+
+        if last_number < bid_count:
+            self._batched_auction_settled_count(_token_id).set(last_number)
+            self._batched_auction_best_bid(_token_id).set(best_number)
+            return
+
+        seller = self.ownerOf(_token_id)
+        starting_price = self._batched_auction_starting_price(_token_id).get()
+        start_time = self._batched_auction_start_time(_token_id).get()
+        if best_bid:
+            buyer, amount = best_bid
+            self._create_sale_record(_token_id=_token_id,
+                                     _type='auction_success',
+                                     _seller=seller,
+                                     _buyer=buyer,
+                                     _starting_price=starting_price,
+                                     _final_price=amount,
+                                     _start_time=start_time,
+                                     _end_time=end_time)
+            self._batched_auction_bid(_token_id, best_number).remove()
+            self._finish_batched_auction(_token_id)
+
+            self._transfer(seller, buyer, _token_id)
+            fee = self._calculate_seller_fee(amount)
+            self.icx.transfer(seller, int(amount - fee))
+
+            self.AuctionFinalized(seller, buyer, _token_id, amount)
+        else:
+            self._create_sale_record(_token_id=_token_id,
+                                     _type='auction_unsold',
+                                     _seller=seller,
+                                     _starting_price=starting_price,
+                                     _start_time=start_time,
+                                     _end_time=end_time)
+            self._finish_batched_auction(_token_id)
+            self._delist_token(seller, _token_id)
+
+            self.AuctionUnsold(seller, _token_id)
+
+    def _return_batched_bid(self, _token_id: int, _number: int, _bid: tuple):
+        self._batched_auction_bid(_token_id, _number).remove()
+        self._credit_refund(_bid[0], _bid[1])
+
+    def _finish_batched_auction(self, _token_id: int):
+        self._batched_auction_starting_price(_token_id).remove()
+        self._batched_auction_start_time(_token_id).remove()
+        self._batched_auction_end_time(_token_id).remove()
+        self._batched_auction_bid_count(_token_id).remove()
+        self._batched_auction_settled_count(_token_id).remove()
+        self._batched_auction_best_bid(_token_id).remove()
+
+    # ================================================
+    #  Refunds
+    # ================================================
+
+    def _credit_refund(self, _address: Address, _amount: int):
+        """
+        Adds ICX returned during a transaction of another account to refund balance of _address. Refunds are not
+        sent right away, so a bidder that can not receive ICX does not block offers and settlements of others.
+        """
+        self._refund_balance[_address] += _amount
+        self.RefundCredited(_address, _amount)
+
+    @external
+    def withdraw_refund(self):
+        """ Sends refund balance of sender (returned offers and outbid batched auction bids) to sender. """
+        amount = self._refund_balance[self.msg.sender]
+        if not amount:
+            revert('There is no refund to withdraw')
+        self._refund_balance.remove(self.msg.sender)
+        self.icx.transfer(self.msg.sender, amount)
+        self.RefundWithdrawn(self.msg.sender, amount)
+
+    @external(readonly=True)
+    def refund_balance(self, _address: Address) -> int:
+        """ Returns amount of returned offers and bids that _address can withdraw with withdraw_refund. """
+        return self._refund_balance[_address]
+
+    # ================================================
+    #  Offers
+    # ================================================
+
+    def _offer(self, _token_id: int, _bidder: Address) -> VarDB:
+        # Offers of a token form a list sorted by amount (highest first), every offer is stored as
+        # '{amount}:{expires_at}:{previous bidder}:{next bidder}' with empty bidder at the ends of the list
+        return VarDB(f'OFFER_{str(_token_id)}_{str(_bidder)}', self._db, value_type=str)
+
+    def _offer_head(self, _token_id: int) -> VarDB:
+        return VarDB(f'OFFER_{str(_token_id)}_HEAD', self._db, value_type=Address)
+
+    def _offer_tail(self, _token_id: int) -> VarDB:
+        return VarDB(f'OFFER_{str(_token_id)}_TAIL', self._db, value_type=Address)
+
+    def _offer_count(self, _token_id: int) -> VarDB:
+        return VarDB(f'OFFER_{str(_token_id)}_COUNT', self._db, value_type=int)
+
+    def _get_offer(self, _token_id: int, _bidder: Address) -> tuple:
+        """ Returns (amount, expires_at, previous bidder, next bidder) of an offer, None if it does not exist. """
+        offer = self._offer(_token_id, _bidder).get()
+        if not offer:
+            return None
+        amount, expires_at, previous_bidder, next_bidder = offer.split(':')
+        return (int(amount), int(expires_at), Address.from_string(previous_bidder) if previous_bidder else None,
+                Address.from_string(next_bidder) if next_bidder else None)
+
+    def _set_offer(self, _token_id: int, _bidder: Address, _amount: int, _expires_at: int, _previous_bidder: Address,
+                   _next_bidder: Address):
+        previous_bidder = str(_previous_bidder) if _previous_bidder else ''
+        next_bidder = str(_next_bidder) if _next_bidder else ''
+        self._offer(_token_id, _bidder).set(f'{_amount}:{_expires_at}:{previous_bidder}:{next_bidder}')
+
+    def _set_next_offer(self, _token_id: int, _bidder: Address, _next_bidder: Address):
+        """ Points offer of _bidder, or head of the list when _bidder is None, to offer of _next_bidder. """
+        if _bidder:
+            amount, expires_at, previous_bidder, _ = self._get_offer(_token_id, _bidder)
+            self._set_offer(_token_id, _bidder, amount, expires_at, previous_bidder, _next_bidder)
+        elif _next_bidder:
+            self._offer_head(_token_id).set(_next_bidder)
+        else:
+            self._offer_head(_token_id).remove()
+
+    def _set_previous_offer(self, _token_id: int, _bidder: Address, _previous_bidder: Address):
+        """ Points offer of _bidder, or tail of the list when _bidder is None, to offer of _previous_bidder. """
+        if _bidder:
+            amount, expires_at, _, next_bidder = self._get_offer(_token_id, _bidder)
+            self._set_offer(_token_id, _bidder, amount, expires_at, _previous_bidder, next_bidder)
+        elif _previous_bidder:
+            self._offer_tail(_token_id).set(_previous_bidder)
+        else:
+            self._offer_tail(_token_id).remove()
+
+    def _remove_offer(self, _token_id: int, _bidder: Address, _offer: tuple):
+        _, _, previous_bidder, next_bidder = _offer
+        self._set_next_offer(_token_id, previous_bidder, next_bidder)
+        self._set_previous_offer(_token_id, next_bidder, previous_bidder)
+        self._offer(_token_id, _bidder).remove()
+        self._offer_count(_token_id).set(self._offer_count(_token_id).get() - 1)
+
+    def _return_offer(self, _token_id: int, _bidder: Address, _offer: tuple):
+        """ Removes an offer and credits its deposit to refund balance of bidder. """
+        self._remove_offer(_token_id, _bidder, _offer)
+        self._credit_refund(_bidder, _offer[0])
+        self.OfferCancelled(_bidder, _token_id)
+
+    @external
+    @payable
+    def make_offer(self, _token_id: int, _duration_in_hours: int = 168):
+        """
+        Makes an offer for any token, sent ICX is held in escrow until the offer is accepted, cancelled or returned.
+        Offer expires after _duration_in_hours (default one week, maximum two weeks), expired offers are returned
+        when they are reached by a later offer or acceptance. A token keeps up to 100 offers, when full, the lowest
+        offer is returned to make place for a higher one. Returned offers are credited to refund balance of their
+        bidders (see withdraw_refund). Throws if sender owns the token or already has an offer.
+        """
+        self._check_that_contract_is_unpaused()
+        owner = self.ownerOf(_token_id)
+        bidder = self.msg.sender
+        amount = self.msg.value
+        if bidder == owner:
+            revert('You can not make an offer for your own token')
+        if amount <= 0:
+            revert('Sent ICX amount needs to be greater than 0')
+        if _duration_in_hours < 1 or _duration_in_hours > 336:
+            revert('Offer duration needs to be between 1 and 336 hours')
+        if self._offer(_token_id, bidder).get():
+            revert('You already have an offer for this token')
+
+        # Find position of the offer after all offers with at least the same amount, returning expired ones on the way
+        now = self.now()
+        previous_bidder = None
+        next_bidder = self._offer_head(_token_id).get()
+        while next_bidder:
+            offer = self._get_offer(_token_id, next_bidder)
+            if offer[1] <= now:
+                self._return_offer(_token_id, next_bidder, offer)
+            elif offer[0] < amount:
+                break
+            else:
+                previous_bidder = next_bidder
+            next_bidder = offer[3]
+
+        if self._offer_count(_token_id).get() >= self._MAX_TOKEN_OFFERS:
+            lowest_bidder = self._offer_tail(_token_id).get()
+            lowest_offer = self._get_offer(_token_id, lowest_bidder)
+            if not next_bidder:
+                revert(f'Offer needs to be higher than the lowest offer ({lowest_offer[0]})')
+            if lowest_bidder == next_bidder:
+                next_bidder = None
+            self._return_offer(_token_id, lowest_bidder, lowest_offer)
+
+        expires_at = now + _duration_in_hours * 3600 * 1000 * 1000
+        self._set_offer(_token_id, bidder, amount, expires_at, previous_bidder, next_bidder)
+        self._set_next_offer(_token_id, previous_bidder, bidder)
+        self._set_previous_offer(_token_id, next_bidder, bidder)
+        self._offer_count(_token_id).set(self._offer_count(_token_id).get() + 1)
+
+        self.OfferMade(bidder, _token_id, amount, expires_at)
+
+    @external
+    def cancel_offer(self, _token_id: int):
+        """ Cancels sender's offer for _token_id and returns its deposit. Throws if sender has no offer. """
+        offer = self._get_offer(_token_id, self.msg.sender)
+        if not offer:
+            revert('You do not have an offer for this token')
+        self._remove_offer(_token_id, self.msg.sender, offer)
+        self.icx.transfer(self.msg.sender, offer[0])
+        self.OfferCancelled(self.msg.sender, _token_id)
+
+    @external
+    def accept_offer(self, _token_id: int, _bidder: Address = None):
+        """
+        Accepts an offer of _bidder, or the highest offer when _bidder is not given. The NFT is sent to bidder and
+        the offered amount (minus fee, if applicable) to seller. An offer sender made before receiving the token
+        is skipped when looking for the highest offer. Throws if sender does not own the token, if token is on
+        auction, if the offer does not exist or has expired, or if it is sender's own offer.
+        """
+        owner = self.ownerOf(_token_id)
+        self._check_that_sale_is_not_restricted()
+        self._check_that_contract_is_unpaused()
+        self._check_that_sender_is_nft_owner(owner)
+        self._check_that_token_is_not_auctioned(_token_id)
+
+        bidder = _bidder if _bidder is not None else self._offer_head(_token_id).get()
+        offer = self._get_offer(_token_id, bidder) if bidder else None
+        if _bidder is None:
+            # Expired offers at the top of the list are returned to reach the highest valid offer, offer that owner
+            # made before receiving the token stays in the list, as it is valid again once the token is sold
+            while offer and (offer[1] <= self.now() or bidder == owner):
+                if offer[1] <= self.now():
+                    self._return_offer(_token_id, bidder, offer)
+                bidder = offer[3]
+                offer = self._get_offer(_token_id, bidder) if bidder else None
+        if not offer:
+            revert('Offer does not exist')
+        if bidder == owner:
+            revert('You can not accept your own offer')
+        amount, expires_at = offer[0], offer[1]
+        if expires_at <= self.now():
+            revert('Offer has expired')
+
+        self._remove_offer(_token_id, bidder, offer)
+        self._transfer(owner, bidder, _token_id)
+
+        fee = self._calculate_seller_fee(amount)
+
+        self.icx.transfer(owner, int(amount - fee))
+        self.icx.transfer(self.address, int(fee))
+
+        self._create_sale_record(_token_id=_token_id,
+                                 _type='offer_accepted',
+                                 _seller=owner,
+                                 _buyer=bidder,
+                                 _starting_price=amount,
+                                 _final_price=amount,
+                                 _end_time=self.now())
+
+        self.OfferAccepted(owner, bidder, _token_id, amount)
+
+    @external(readonly=True)
+    def offers_for_token(self, _token_id: int, _offset: int = 0, _limit: int = 100) -> list:
+        """
+        Returns offers (bidder, amount and expires_at) for _token_id that have not expired, highest first. Offer of
+        the current owner, made before receiving the token, is left out. Skips _offset best offers and returns
+        maximum _limit (up to 100) offers. First offer is the best one.
+        """
+        if _offset < 0:
+            revert('Offset can not be negative')
+        if _limit < 1 or _limit > self._MAX_ITERATION_LOOP:
+            revert(f'Limit needs to be between 1 and {self._MAX_ITERATION_LOOP}')
+
+        now = self.now()
+        owner = self._token_owner[_token_id]
+        offers = []
+        position = 0
+        bidder = self._offer_head(_token_id).get()
+        while bidder and len(offers) < _limit:
+            amount, expires_at, _, next_bidder = self._get_offer(_token_id, bidder)
+            if expires_at > now and bidder != owner:
+                if position >= _offset:
+                    offers.append({"bidder": bidder, "amount": amount, "expires_at": expires_at})
+                position += 1
+            bidder = next_bidder
+        return offers
+
+    @external(readonly=True)
+    def token_offer_count(self, _token_id: int) -> int:
+        """ Returns number of stored offers for _token_id, including expired offers that were not returned yet. """
+        return self._offer_count(_token_id).get()
+
+    # ================================================
+    #  Collection offers
+    # ================================================
+
+    def _collection_offer(self, _offer_id: int) -> VarDB:
+        # Escrowed collection offer, stored as '{bidder}:{amount}'
+        return VarDB(f'COLLECTION_OFFER_{str(_offer_id)}', self._db, value_type=str)
+
+    def _collection_offer_heap_offer(self, _position: int) -> VarDB:
+        return VarDB(f'COLLECTION_OFFER_HEAP_{str(_position)}', self._db, value_type=int)
+
+    def _collection_offer_heap_position(self, _offer_id: int) -> VarDB:
+        return VarDB(f'COLLECTION_OFFER_HEAP_POSITION_{str(_offer_id)}', self._db, value_type=int)
+
+    def _get_collection_offer(self, _offer_id: int) -> tuple:
+        """ Returns (bidder, amount) of an open collection offer, None if it does not exist. """
+        offer = self._collection_offer(_offer_id).get()
+        if not offer:
+            return None
+        bidder, amount = offer.split(':')
+        return Address.from_string(bidder), int(amount)
+
+    def _collection_offer_amount(self, _offer_id: int) -> int:
+        return self._get_collection_offer(_offer_id)[1]
+
+    @external
+    @payable
+    def make_collection_offer(self):
+        """
+        Makes an offer to buy any one token of the collection for sent ICX amount, which is held in escrow until the
+        offer is accepted or cancelled. Every call makes a separate offer, so buying several tokens needs several
+        offers. Offer ID is emitted in CollectionOfferMade eventlog.
+        """
+        self._check_that_contract_is_unpaused()
+        amount = self.msg.value
+        if amount <= 0:
+            revert('Sent ICX amount needs to be greater than 0')
+
+        offer_id = self._collection_offer_count.get() + 1
+        self._collection_offer_count.set(offer_id)
+        self._collection_offer(offer_id).set(f'{str(self.msg.sender)}:{amount}')
+        self._add_to_collection_offer_heap(offer_id, amount)
+
+        self.CollectionOfferMade(offer_id, self.msg.sender, amount)
+
+    @external
+    def cancel_collection_offer(self, _offer_id: int):
+        """ Cancels collection offer and returns its deposit. Throws if sender did not make the offer. """
+        offer = self._get_collection_offer(_offer_id)
+        if not offer:
+            revert('Collection offer does not exist')
+        bidder, amount = offer
+        if bidder != self.msg.sender:
+            revert('You did not make this collection offer')
+
+        self._remove_from_collection_offer_heap(_offer_id)
+        self._collection_offer(_offer_id).remove()
+        self.icx.transfer(bidder, amount)
+
+        self.CollectionOfferCancelled(_offer_id, bidder)
+
+    @external
+    def accept_collection_offer(self, _token_id: int, _min_amount: int = 0):
+        """
+        Sells _token_id to the highest collection offer, collection offers of token owner are skipped. The NFT is
+        sent to bidder and the offered amount (minus fee, if applicable) to seller. Throws if highest offer is lower
+        than _min_amount, which protects seller when the offer gets cancelled before transaction is executed.
+        Throws if sender does not own the token or if token is on auction.
+        """
+        owner = self.ownerOf(_token_id)
+        self._check_that_sale_is_not_restricted()
+        self._check_that_contract_is_unpaused()
+        self._check_that_sender_is_nft_owner(owner)
+        self._check_that_token_is_not_auctioned(_token_id)
+
+        if not self._collection_offer_heap_size.get():
+            revert('There are no collection offers')
+        offer_id = self._find_best_collection_offer_not_made_by(owner)
+        if not offer_id:
+            revert('There are no collection offers from other accounts')
+        bidder, amount = self._get_collection_offer(offer_id)
+        if amount < _min_amount:
+            revert(f'Highest collection offer ({amount}) is lower than minimum amount ({_min_amount})')
+
+        self._remove_from_collection_offer_heap(offer_id)
+        self._collection_offer(offer_id).remove()
+        self._transfer(owner, bidder, _token_id)
+
+        fee = self._calculate_seller_fee(amount)
+
+        self.icx.transfer(owner, int(amount - fee))
+        self.icx.transfer(self.address, int(fee))
+
+        self._create_sale_record(_token_id=_token_id,
+                                 _type='collection_offer_accepted',
+                                 _seller=owner,
+                                 _buyer=bidder,
+                                 _starting_price=amount,
+                                 _final_price=amount,
+                                 _end_time=self.now())
+
+        self.CollectionOfferAccepted(offer_id, owner, bidder, _token_id, amount)
+
+    def _find_best_collection_offer_not_made_by(self, _address: Address) -> int:
+        """
+        Returns ID of the highest collection offer that was not made by _address, 0 when there is none. Heap is
+        walked from the top in order of offer amounts, so only offers of _address that are higher than the returned
+        one are read. Throws if more than 100 offers of _address have to be skipped.
+        """
+        size = self._collection_offer_heap_size.get()
+        # Children of skipped offers are the next candidates, taken in the same order as the heap keeps them
+        candidates = [self._collection_offer_candidate(1)] if size else []
+        for _ in range(self._MAX_ITERATION_LOOP + 1):
+            if not candidates:
+                return 0
+            candidate = max(candidates)
+            candidates.remove(candidate)
+            _, position, offer_id, bidder = candidate
+            if bidder != _address:
+                return offer_id
+            for child in (position * 2, position * 2 + 1):
+                if child <= size:
+                    candidates.append(self._collection_offer_candidate(child))
+        revert(f'Can not skip more than {self._MAX_ITERATION_LOOP} of your own collection offers')
+
+    def _collection_offer_candidate(self, _position: int) -> tuple:
+        offer_id = self._collection_offer_heap_offer(_position).get()
+        bidder, amount = self._get_collection_offer(offer_id)
+        return self._collection_offer_priority(offer_id, amount), _position, offer_id, bidder
+
+    def _collection_offer_priority(self, _offer_id: int, _amount: int) -> tuple:
+        # Collection offers are ordered by amount, the earlier offer (lower ID) comes first when amounts are equal
+        return _amount, -_offer_id
+
+    @external(readonly=True)
+    def best_collection_offer(self) -> dict:
+        """ Returns offer_id, bidder and amount of the highest collection offer, empty dict when there are none. """
+        if not self._collection_offer_heap_size.get():
+            return {}
+        offer_id = self._collection_offer_heap_offer(1).get()
+        bidder, amount = self._get_collection_offer(offer_id)
+        return {"offer_id": offer_id, "bidder": bidder, "amount": amount}
+
+    @external(readonly=True)
+    def get_collection_offer(self, _offer_id: int) -> dict:
+        """ Returns bidder and amount of an open collection offer. Throws if offer does not exist. """
+        offer = self._get_collection_offer(_offer_id)
+        if not offer:
+            revert('Collection offer does not exist')
+        return {"offer_id": _offer_id, "bidder": offer[0], "amount": offer[1]}
+
+    @external(readonly=True)
+    def open_collection_offer_count(self) -> int:
+        """ Returns number of collection offers that can be accepted. """
+        return self._collection_offer_heap_size.get()
+
+    def _add_to_collection_offer_heap(self, _offer_id: int, _amount: int):
+        """
+        Adds collection offer to a binary max-heap ordered by amount and then by offer ID (earlier offer first),
+        stored like the floor price heap, so the highest offer is found in O(1) and offers are added or removed in
+        O(log n) storage operations.
+        """
+        size = self._collection_offer_heap_size.get() + 1
+        self._collection_offer_heap_size.set(size)
+        self._sift_collection_offer_heap_up(size, _offer_id, _amount)
+
+    def _remove_from_collection_offer_heap(self, _offer_id: int):
+        position = self._collection_offer_heap_position(_offer_id).get()
+        size = self._collection_offer_heap_size.get()
+        last_offer = self._collection_offer_heap_offer(size).get()
+        self._collection_offer_heap_offer(size).remove()
+        self._collection_offer_heap_position(_offer_id).remove()
+        self._collection_offer_heap_size.set(size - 1)
+        if position == size:
+            return
+
+        # Last offer takes the freed position and is moved up or down to restore heap order
+        last_amount = self._collection_offer_amount(last_offer)
+        new_position = self._sift_collection_offer_heap_up(position, last_offer, last_amount)
+        if new_position == position:
+            self._sift_collection_offer_heap_down(position, last_offer, last_amount, size - 1)
+
+    def _sift_collection_offer_heap_up(self, _position: int, _offer_id: int, _amount: int) -> int:
+        priority = self._collection_offer_priority(_offer_id, _amount)
+        while _position > 1:
+            parent = _position // 2
+            parent_offer = self._collection_offer_heap_offer(parent).get()
+            if self._collection_offer_priority(parent_offer, self._collection_offer_amount(parent_offer)) > priority:
+                break
+            self._set_collection_offer_heap_offer(_position, parent_offer)
+            _position = parent
+        self._set_collection_offer_heap_offer(_position, _offer_id)
+        return _position
+
+    def _sift_collection_offer_heap_down(self, _position: int, _offer_id: int, _amount: int, _size: int):
+        priority = self._collection_offer_priority(_offer_id, _amount)
+        while _position * 2 <= _size:
+            child = _position * 2
+            child_offer = self._collection_offer_heap_offer(child).get()
+            child_priority = self._collection_offer_priority(child_offer, self._collection_offer_amount(child_offer))
+            if child < _size:
+                right_offer = self._collection_offer_heap_offer(child + 1).get()
+                right_priority = self._collection_offer_priority(right_offer,
+                                                                 self._collection_offer_amount(right_offer))
+                if right_priority > child_priority:
+                    child, child_offer, child_priority = child + 1, right_offer, right_priority
+            if child_priority < priority:
+                break
+            self._set_collection_offer_heap_offer(_position, child_offer)
+            _position = child
+        self._set_collection_offer_heap_offer(_position, _offer_id)
+
+    def _set_collection_offer_heap_offer(self, _position: int, _offer_id: int):
+        self._collection_offer_heap_offer(_position).set(_offer_id)
+        self._collection_offer_heap_position(_offer_id).set(_position)
+
     # ================================================
     #  Sale records
     # ================================================
 
-    def _record_token_id(self, _record_id: int) -> VarDB:
-        return VarDB(f'RECORD_{str(_record_id)}_TOKEN_ID', self._db, value_type=int)
+    def _record_token_id(self, _slot: int) -> VarDB:
+        return VarDB(f'RECORD_{str(_slot)}_TOKEN_ID', self._db, value_type=int)
 
-    def _record_type(self, _record_id: int) -> VarDB:
-        return VarDB(f'RECORD_{str(_record_id)}_TYPE', self._db, value_type=str)
+    def _record_type(self, _slot: int) -> VarDB:
+        return VarDB(f'RECORD_{str(_slot)}_TYPE', self._db, value_type=str)
 
-    def _record_seller(self, _record_id: int) -> VarDB:
-        return VarDB(f'RECORD_{str(_record_id)}_SELLER', self._db, value_type=Address)
+    def _record_seller(self, _slot: int) -> VarDB:
+        return VarDB(f'RECORD_{str(_slot)}_SELLER', self._db, value_type=Address)
 
-    def _record_buyer(self, _record_id: int) -> VarDB:
-        return VarDB(f'RECORD_{str(_record_id)}_BUYER', self._db, value_type=Address)
+    def _record_buyer(self, _slot: int) -> VarDB:
+        return VarDB(f'RECORD_{str(_slot)}_BUYER', self._db, value_type=Address)
 
-    def _record_starting_price(self, _record_id: int) -> VarDB:
-        return VarDB(f'RECORD_{str(_record_id)}_STARTING_PRICE', self._db, value_type=int)
+    def _record_starting_price(self, _slot: int) -> VarDB:
+        return VarDB(f'RECORD_{str(_slot)}_STARTING_PRICE', self._db, value_type=int)
 
-    def _record_final_price(self, _record_id: int) -> VarDB:
-        return VarDB(f'RECORD_{str(_record_id)}_FINAL_PRICE', self._db, value_type=int)
+    def _record_final_price(self, _slot: int) -> VarDB:
+        return VarDB(f'RECORD_{str(_slot)}_FINAL_PRICE', self._db, value_type=int)
 
-    def _record_start_time(self, _record_id: int) -> VarDB:
-        return VarDB(f'RECORD_{str(_record_id)}_START_TIME', self._db, value_type=int)
+    def _record_start_time(self, _slot: int) -> VarDB:
+        return VarDB(f'RECORD_{str(_slot)}_START_TIME', self._db, value_type=int)
 
-    def _record_end_time(self, _record_id: int) -> VarDB:
-        return VarDB(f'RECORD_{str(_record_id)}_END_TIME', self._db, value_type=int)
+    def _record_end_time(self, _slot: int) -> VarDB:
+        return VarDB(f'RECORD_{str(_slot)}_END_TIME', self._db, value_type=int)
 
     def _records_count(self) -> int:
         return self._sale_record_count.get()
 
+    def _sale_record_slot(self, _record_id: int, _capacity: int) -> int:
+        """ Returns storage slot of a sale record. Without capacity every record has its own slot. """
+        return (_record_id - 1) % _capacity + 1 if _capacity else _record_id
+
+    def _first_stored_record_id(self, _record_count: int, _capacity: int) -> int:
+        """ Returns ID of the oldest sale record that has not been archived. """
+        return max(_record_count - _capacity, 0) + 1 if _capacity else 1
+
     def _create_sale_record(self,
                             _token_id: int,
                             _type: str,
@@ -1045,38 +2287,122 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
         record_id = self._records_count() + 1
         self._sale_record_count.set(record_id)
 
-        self._record_token_id(record_id).set(_token_id)
-        self._record_type(record_id).set(_type)
-        self._record_seller(record_id).set(_seller)
+        capacity = self._sale_record_capacity.get()
+        slot = self._sale_record_slot(record_id, capacity)
+        is_slot_reused = capacity and record_id > capacity
+        if is_slot_reused:
+            self._archive_sale_record(record_id - capacity, slot)
+
+        self._record_token_id(slot).set(_token_id)
+        self._record_type(slot).set(_type)
+        self._record_seller(slot).set(_seller)
+        # Optional values of an archived record have to be removed when its slot gets reused
+        for value, value_db in ((_buyer, self._record_buyer(slot)),
+                                (_starting_price, self._record_starting_price(slot)),
+                                (_final_price, self._record_final_price(slot)),
+                                (_start_time, self._record_start_time(slot)),
+                                (_end_time, self._record_end_time(slot))):
+            if value:
+                value_db.set(value)
+            elif is_slot_reused:
+                value_db.remove()
+
+        self._index_sale_record(record_id, _token_id, _type, _seller, _buyer, _final_price, _end_time)
+
+    def _index_sale_record(self, _record_id: int, _token_id: int, _type: str, _seller: Address, _buyer: Address,
+                           _final_price: int, _end_time: int):
+        """ Appends sale record to token, seller and buyer indexes and adds it to sale aggregates. """
+        self._append_to_sale_record_index(self._token_sale_record, self._token_sale_record_count,
+                                          self._token_sale_record_start, _token_id, _record_id)
+        self._append_to_sale_record_index(self._seller_sale_record, self._seller_sale_record_count,
+                                          self._seller_sale_record_start, _seller, _record_id)
         if _buyer:
-            self._record_buyer(record_id).set(_buyer)
-        if _starting_price:
-            self._record_starting_price(record_id).set(_starting_price)
+            self._append_to_sale_record_index(self._buyer_sale_record, self._buyer_sale_record_count,
+                                              self._buyer_sale_record_start, _buyer, _record_id)
+
+        self._sale_count[_type] += 1
         if _final_price:
-            self._record_final_price(record_id).set(_final_price)
-        if _start_time:
-            self._record_start_time(record_id).set(_start_time)
-        if _end_time:
-            self._record_end_time(record_id).set(_end_time)
+            self._sale_volume[_type] += _final_price
+        if _type in self._SUCCESSFUL_SALE_TYPES:
+            self._update_sale_stats(_final_price, _end_time)
+
+    def _append_to_sale_record_index(self, _record_id_db, _count_db: DictDB, _start_db: DictDB, _key,
+                                     _record_id: int):
+        _count_db[_key] += 1
+        _record_id_db(_key, _start_db[_key] + _count_db[_key]).set(_record_id)
+
+    def _remove_from_sale_record_index(self, _record_id_db, _count_db: DictDB, _start_db: DictDB, _key,
+                                       _record_id: int):
+        """
+        Removes archived sale record from the start of an index. Records are archived in order of their IDs, so
+        the record is the first one in the index, unless it was added later by migration.
+        """
+        first_index = _start_db[_key] + 1
+        if not _count_db[_key] or _record_id_db(_key, first_index).get() != _record_id:
+            return
+        _record_id_db(_key, first_index).remove()
+        if _count_db[_key] > 1:
+            _count_db[_key] -= 1
+            _start_db[_key] = first_index
+        else:
+            _count_db.remove(_key)
+            _start_db.remove(_key)
+
+    def _is_sale_record_indexed(self, _record_id: int) -> bool:
+        """ Returns whether sale record has been added to indexes, which happens on creation or by migration. """
+        version = self._storage_version.get()
+        if version >= self._SALE_RECORD_MIGRATION_STEP:
+            return True
+        if version == self._SALE_RECORD_MIGRATION_STEP - 1 and _record_id <= self._migration_cursor.get():
+            return True
+        return _record_id > self._migration_item_count[self._SALE_RECORD_MIGRATION_STEP]
+
+    def _archive_sale_record(self, _record_id: int, _slot: int):
+        """
+        Emits full content of a sale record whose slot is about to be overwritten and removes the record from
+        sale histories. Daily buckets and totals per record type keep including archived records.
+        """
+        record = self._get_sale_record(_record_id, _slot)
+        self.SaleRecordArchived(_record_id, record['token_id'], record['type'], record['seller'],
+                                record['buyer'] or self._ZERO_ADDRESS, record['starting_price'],
+                                record['final_price'], record['start_time'], record['end_time'])
+        if not self._is_sale_record_indexed(_record_id):
+            return
+
+        self._remove_from_sale_record_index(self._token_sale_record, self._token_sale_record_count,
+                                            self._token_sale_record_start, record['token_id'], _record_id)
+        self._remove_from_sale_record_index(self._seller_sale_record, self._seller_sale_record_count,
+                                            self._seller_sale_record_start, record['seller'], _record_id)
+        if record['buyer']:
+            self._remove_from_sale_record_index(self._buyer_sale_record, self._buyer_sale_record_count,
+                                                self._buyer_sale_record_start, record['buyer'], _record_id)
 
     @external(readonly=True)
     def get_sale_record(self, _record_id: int) -> dict:
         """
         Method is used for getting historic records of sales and auctions.
         Includes successful fixed price sales and auctions (successful, cancelled, unsold)
+        Throws if the record has been archived, archived records are available in SaleRecordArchived eventlogs.
         """
-        if _record_id > self._sale_record_count.get():
+        record_count = self._sale_record_count.get()
+        if _record_id > record_count:
             revert('Sale record does not exist')
+        capacity = self._sale_record_capacity.get()
+        if _record_id < self._first_stored_record_id(record_count, capacity):
+            revert(f'Sale record {_record_id} has been archived')
+        return self._get_sale_record(_record_id, self._sale_record_slot(_record_id, capacity))
+
+    def _get_sale_record(self, _record_id: int, _slot: int) -> dict:
         record = {
             "record_id": _record_id,
-            "token_id": self._record_token_id(_record_id).get(),
-            "type": self._record_type(_record_id).get(),
-            "seller": self._record_seller(_record_id).get(),
-            "buyer": self._record_buyer(_record_id).get(),
-            "starting_price": self._record_starting_price(_record_id).get(),
-            "final_price": self._record_final_price(_record_id).get(),
-            "start_time": self._record_start_time(_record_id).get(),
-            "end_time": self._record_end_time(_record_id).get(),
+            "token_id": self._record_token_id(_slot).get(),
+            "type": self._record_type(_slot).get(),
+            "seller": self._record_seller(_slot).get(),
+            "buyer": self._record_buyer(_slot).get(),
+            "starting_price": self._record_starting_price(_slot).get(),
+            "final_price": self._record_final_price(_slot).get(),
+            "start_time": self._record_start_time(_slot).get(),
+            "end_time": self._record_end_time(_slot).get(),
         }
         return record
 
@@ -1084,6 +2410,426 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
     def sale_record_count(self) -> int:
         return self._sale_record_count.get()
 
+    @external
+    def set_sale_record_capacity(self, _capacity: int):
+        """
+        Sets number of sale records kept in contract storage, zero keeps all of them. Once the limit is reached,
+        every new record overwrites the oldest one, which is emitted in SaleRecordArchived eventlog and removed
+        from sale histories. Daily volume and sale stats keep including archived records.
+        Capacity can not be changed after first record has been archived.
+        """
+        if self._director.get() != self.msg.sender:
+            revert('You do not have permission set sale record capacity')
+        if _capacity < 0:
+            revert('Sale record capacity can not be negative')
+        record_count = self._sale_record_count.get()
+        current_capacity = self._sale_record_capacity.get()
+        if current_capacity and record_count > current_capacity:
+            revert('Sale record capacity can not be changed after records have been archived')
+        if _capacity and record_count > _capacity:
+            revert('Sale record capacity can not be lower than number of sale records')
+        self._sale_record_capacity.set(_capacity)
+
+    @external(readonly=True)
+    def sale_record_capacity(self) -> int:
+        return self._sale_record_capacity.get()
+
+    def _token_sale_record(self, _token_id: int, _index: int) -> VarDB:
+        return VarDB(f'SALE_HISTORY_{str(_token_id)}_{str(_index)}', self._db, value_type=int)
+
+    @external(readonly=True)
+    def token_sale_record_count(self, _token_id: int) -> int:
+        return self._token_sale_record_count[_token_id]
+
+    @external(readonly=True)
+    def seller_sale_record_count(self, _address: Address) -> int:
+        return self._seller_sale_record_count[_address]
+
+    @external(readonly=True)
+    def buyer_sale_record_count(self, _address: Address) -> int:
+        return self._buyer_sale_record_count[_address]
+
+    @external(readonly=True)
+    def token_sale_history(self, _token_id: int, _offset: int = 0, _limit: int = 100) -> list:
+        """
+        Returns stored sale records of given token in chronological order. Skips _offset oldest records and
+        returns maximum _limit records. Maximum 100 records can be requested at once.
+        """
+        start = self._token_sale_record_start[_token_id]
+        return self._get_sale_record_page(lambda index: self._token_sale_record(_token_id, start + index),
+                                          self._token_sale_record_count[_token_id], _offset, _limit)
+
+    def _seller_sale_record(self, _seller: Address, _index: int) -> VarDB:
+        return VarDB(f'SELLER_{str(_seller)}_SALE_{str(_index)}', self._db, value_type=int)
+
+    def _buyer_sale_record(self, _buyer: Address, _index: int) -> VarDB:
+        return VarDB(f'BUYER_{str(_buyer)}_PURCHASE_{str(_index)}', self._db, value_type=int)
+
+    @external(readonly=True)
+    def sales_by_seller(self, _address: Address, _offset: int = 0, _limit: int = 100) -> list:
+        """
+        Returns sale records where given address is the seller (including cancelled and unsold auctions)
+        in chronological order. Skips _offset oldest records and returns maximum _limit (up to 100) records.
+        """
+        start = self._seller_sale_record_start[_address]
+        return self._get_sale_record_page(lambda index: self._seller_sale_record(_address, start + index),
+                                          self._seller_sale_record_count[_address], _offset, _limit)
+
+    @external(readonly=True)
+    def purchases_by_buyer(self, _address: Address, _offset: int = 0, _limit: int = 100) -> list:
+        """
+        Returns sale records where given address is the buyer in chronological order.
+        Skips _offset oldest records and returns maximum _limit (up to 100) records.
+        """
+        start = self._buyer_sale_record_start[_address]
+        return self._get_sale_record_page(lambda index: self._buyer_sale_record(_address, start + index),
+                                          self._buyer_sale_record_count[_address], _offset, _limit)
+
+    def _get_sale_record_page(self, _record_id_db, _record_count: int, _offset: int, _limit: int) -> list:
+        """
+        Returns sale records of a record ID list, where _record_id_db returns VarDB of given list index.
+        Archived records that are still listed (records added by migration after newer ones) are returned as
+        {"record_id": ID, "archived": True}.
+        """
+        if _offset < 0:
+            revert('Offset can not be negative')
+        if _limit < 1 or _limit > self._MAX_ITERATION_LOOP:
+            revert(f'Limit needs to be between 1 and {self._MAX_ITERATION_LOOP}')
+
+        capacity = self._sale_record_capacity.get()
+        first_stored_record_id = self._first_stored_record_id(self._sale_record_count.get(), capacity)
+        records = []
+        for index in range(_offset + 1, min(_offset + _limit, _record_count) + 1):
+            record_id = _record_id_db(index).get()
+            if record_id < first_stored_record_id:
+                records.append({"record_id": record_id, "archived": True})
+            else:
+                records.append(self._get_sale_record(record_id, self._sale_record_slot(record_id, capacity)))
+        return records
+
+    def _update_sale_stats(self, _price: int, _time: int):
+        """ Updates price statistics and daily buckets of successful sales. Totals are kept per record type. """
+        if _price > self._max_sale_price.get():
+            self._max_sale_price.set(_price)
+        day = _time // self._DAY_IN_MICROSECONDS
+        self._daily_sale_volume[day] += _price
+        self._daily_sale_count[day] += 1
+
+    @external(readonly=True)
+    def sale_stats(self) -> dict:
+        """ Returns total volume, number of sales, average and highest price of successful sales and auctions. """
+        total_volume = sum(self._sale_volume[sale_type] for sale_type in self._SUCCESSFUL_SALE_TYPES)
+        sale_count = sum(self._sale_count[sale_type] for sale_type in self._SUCCESSFUL_SALE_TYPES)
+        return {
+            "total_volume": total_volume,
+            "sale_count": sale_count,
+            "average_price": total_volume // sale_count if sale_count else 0,
+            "max_price": self._max_sale_price.get()
+        }
+
+    @external(readonly=True)
+    def daily_volume(self, _day_from: int, _day_to: int) -> list:
+        """
+        Returns volume and number of successful sales for every day from _day_from to _day_to (inclusive).
+        Archived sale records are included, so daily figures add up to sale_stats.
+        Day number is block timestamp divided by one day in microseconds, i.e. days since Unix epoch (UTC).
+        Maximum 100 days can be requested at once.
+        """
+        if _day_from < 0 or _day_to < _day_from:
+            revert('Invalid day range')
+        if _day_to - _day_from >= self._MAX_ITERATION_LOOP:
+            revert(f'Can not request more than {self._MAX_ITERATION_LOOP} days at once')
+
+        days = []
+        for day in range(_day_from, _day_to + 1):
+            days.append({
+                "day": day,
+                "volume": self._daily_sale_volume[day],
+                "sale_count": self._daily_sale_count[day]
+            })
+        return days
+
+    @external(readonly=True)
+    def marketplace_overview(self, _recent_sales: int = 10) -> dict:
+        """
+        Returns marketplace summary in one call: token supply, listing count, seller fee, floor price of fixed price
+        listings, market cap (floor price * supply), sale record counts and volumes per record type, and
+        _recent_sales most recent sale records, newest first. Maximum 100 recent sale records can be requested.
+        """
+        if _recent_sales < 0 or _recent_sales > self._MAX_ITERATION_LOOP:
+            revert(f'Number of recent sales needs to be between 0 and {self._MAX_ITERATION_LOOP}')
+
+        total_supply = self._total_supply.get()
+        floor_price = self._floor_price()
+        record_count = self._sale_record_count.get()
+        capacity = self._sale_record_capacity.get()
+        first_record_id = max(record_count - _recent_sales + 1, self._first_stored_record_id(record_count, capacity))
+        recent_sales = []
+        for record_id in range(record_count, first_record_id - 1, -1):
+            recent_sales.append(self._get_sale_record(record_id, self._sale_record_slot(record_id, capacity)))
+
+        return {
+            "total_supply": total_supply,
+            "listed_token_count": self._total_listed_token_count.get(),
+            "seller_fee": self._seller_fee.get(),
+            "floor_price": floor_price,
+            "market_cap": floor_price * total_supply,
+            "sale_record_count": record_count,
+            "sale_counts": {record_type: self._sale_count[record_type] for record_type in self._SALE_RECORD_TYPES},
+            "sale_volumes": {record_type: self._sale_volume[record_type] for record_type in self._SALE_RECORD_TYPES},
+            "recent_sales": recent_sales
+        }
+
+    # ================================================
+    #  Storage migration
+    # ================================================
+
+    def _migration_steps(self) -> list:
+        """
+        Returns registered migration steps in the order they are applied. Every step is a pair of item count
+        getter and a method that migrates item on given position (starting at 1). Item count is read when
+        contract is updated, items created later already use the new layout. Steps stop at the current item count,
+        as items can still be burned or delisted while migration is pending. Storage version is the
+        number of applied steps, so new steps can only be appended.
+        """
+        return [
+            # 1: Minted bitmap for tokens minted before it was introduced
+            (self._total_supply.get, self._migrate_minted_token),
+            # 2: Floor heap entries for fixed price listings created before it was introduced
+            (self._total_listed_token_count.get, self._migrate_listing),
+            # 3: Token, seller and buyer indexes and sale aggregates for records created before they were introduced
+            (self._sale_record_count.get, self._migrate_sale_record),
+            # 4: Sequence numbers for listings created before cursor based pagination was introduced
+            (self._total_listed_token_count.get, self._migrate_listing_sequence),
+        ]
+
+    def _migrate_minted_token(self, _index: int):
+        token_id = self._token_index(_index).get()
+        if token_id in self._token_owner:
+            self._set_bitmap_bit(self._minted_tokens, token_id)
+
+    def _migrate_listing(self, _index: int):
+        token_id = self._listed_token_index(_index).get()
+        price = self._listed_token_prices[str(token_id)]
+        if price > 0 and not self._floor_heap_position(token_id).get():
+            self._add_to_floor_heap(token_id, price)
+
+    def _migrate_listing_sequence(self, _index: int):
+        token_id = self._listed_token_index(_index).get()
+        if self._listed_token_prices[str(token_id)] > 0 and not self._token_listing_sequence(token_id).get():
+            self._set_listing_sequence(token_id)
+
+    def _migrate_listed_token(self, _token_id: int):
+        """ Applies listing migration steps to a single listing, already migrated listings are left unchanged. """
+        price = self._listed_token_prices[str(_token_id)]
+        if price > 0 and not self._floor_heap_position(_token_id).get():
+            self._add_to_floor_heap(_token_id, price)
+        if not self._token_listing_sequence(_token_id).get():
+            self._set_listing_sequence(_token_id)
+
+    def _migrate_sale_record(self, _record_id: int):
+        capacity = self._sale_record_capacity.get()
+        if _record_id < self._first_stored_record_id(self._sale_record_count.get(), capacity):
+            # Slot of an archived record already holds a newer record, which has been indexed when it was created
+            return
+        slot = self._sale_record_slot(_record_id, capacity)
+        self._index_sale_record(_record_id,
+                                self._record_token_id(slot).get(),
+                                self._record_type(slot).get(),
+                                self._record_seller(slot).get(),
+                                self._record_buyer(slot).get(),
+                                self._record_final_price(slot).get(),
+                                self._record_end_time(slot).get())
+
+    @external
+    def run_migration(self, _max_items: int):
+        """
+        Applies pending migration steps to storage that existed when contract was updated, processing at most
+        _max_items (up to 100) items per call. Progress is stored, so migration continues where previous call stopped. Callable by Director
+        on a paused contract, StorageMigrated eventlog is emitted after every finished step.
+        Lookups fall back to the old layout for items that are not migrated yet (e.g. tokens without minted bit
+        are recognized by their owner entry), while floor price, sale histories and sale aggregates only
+        include migrated items until migration finishes.
+        """
+        if self._director.get() != self.msg.sender:
+            revert('You are not allowed to run migration')
+        if not self._is_paused.get():
+            revert('Contract needs to be paused during migration')
+        if _max_items < 1 or _max_items > self._MAX_ITERATION_LOOP:
+            revert(f'Max items needs to be between 1 and {self._MAX_ITERATION_LOOP}')
+
+        steps = self._migration_steps()
+        version = self._storage_version.get()
+        if version >= len(steps):
+            revert('Storage is already migrated')
+
+        cursor = self._migration_cursor.get()
+        processed_count = 0
+        while version < len(steps) and processed_count < _max_items:
+            get_item_count, migrate_item = steps[version]
+            item_count = min(self._migration_item_count[version + 1], get_item_count())
+            last_item = min(item_count, cursor + _max_items - processed_count)
+            for position in range(cursor + 1, last_item + 1):
+                migrate_item(position)
+            processed_count += max(last_item - cursor, 0)
+            cursor = last_item
+            if cursor >= item_count:
+                version += 1
+                cursor = 0
+                self._migration_item_count.remove(version)
+                self.StorageMigrated(version)
+
+        self._storage_version.set(version)
+        self._migration_cursor.set(cursor)
+
+    @external(readonly=True)
+    def migration_status(self) -> dict:
+        """ Returns applied and latest storage version and number of processed items of the running step. """
+        return {
+            "storage_version": self._storage_version.get(),
+            "latest_version": len(self._migration_steps()),
+            "processed_items": self._migration_cursor.get()
+        }
+
+    # ================================================
+    #  Snapshot import
+    # ================================================
+
+    def _check_that_snapshot_import_is_allowed(self):
+        if self._director.get() != self.msg.sender:
+            revert('You are not allowed to import snapshots')
+        if self._snapshot_import_closed.get():
+            revert('Snapshot import is closed')
+        if not self._is_paused.get():
+            revert('Contract needs to be paused during snapshot import')
+
+    def _check_import_batch(self, _values: list, *_other_values: list):
+        if not _values:
+            revert('No records to import')
+        if len(_values) > self._MAX_ITERATION_LOOP:
+            revert(f'Can not import more than {self._MAX_ITERATION_LOOP} records at once')
+        for values in _other_values:
+            if len(values) != len(_values):
+                revert('Imported lists need to have equal length')
+
+    @external
+    def import_tokens(self, _owner: Address, _token_ids: List[int], _token_URIs: List[str]):
+        """
+        Imports tokens of _owner from a state snapshot. Tokens are appended to owner's token index and to
+        the global token index in given order. Throws if any of the tokens already exists.
+        Snapshot import methods are callable by Director on a paused contract until import gets closed.
+        """
+        self._check_that_snapshot_import_is_allowed()
+        self._check_import_batch(_token_ids, _token_URIs)
+        if _owner is None or self._is_zero_address(_owner):
+            revert("Invalid owner")
+
+        for token_id, token_URI in zip(_token_ids, _token_URIs):
+            self._ensure_positive(token_id)
+            if self._is_token_minted(token_id):
+                revert("Token already exists")
+            self._add_tokens_to(_owner, token_id)
+            self._set_bitmap_bit(self._minted_tokens, token_id)
+            self._set_token_URI(token_id, token_URI)
+            self._create_new_token_index(token_id)
+            self.Transfer(self._ZERO_ADDRESS, _owner, token_id)
+
+    @external
+    def import_listings(self, _owner: Address, _token_ids: List[int], _prices: List[int]):
+        """
+        Imports listings of _owner from a state snapshot. Price -1 marks a token on auction and -2 a token on Dutch
+        auction, their details are imported with import_auction and import_dutch_auction. Tokens are appended to
+        owner's listing index and to the global listing index in given order. Throws if _owner does not own the
+        token or if token is already listed.
+        """
+        self._check_that_snapshot_import_is_allowed()
+        self._check_import_batch(_token_ids, _prices)
+
+        for token_id, price in zip(_token_ids, _prices):
+            if self.ownerOf(token_id) != _owner:
+                revert(f'Token {token_id} is not owned by {_owner}')
+            is_auction = price in (-1, self._DUTCH_AUCTION_PRICE)
+            if not is_auction:
+                self._check_that_price_is_positive(price)
+            self._check_that_token_is_not_listed(token_id)
+
+            self._add_token_listing(token_id)
+            self._listed_token_prices[str(token_id)] = price
+            self._owner_listed_token_count[_owner] += 1
+            self._set_owner_listed_token_index(_owner, self._owner_listed_token_count[_owner], token_id, price)
+            if not is_auction:
+                self._add_to_floor_heap(token_id, price)
+                self.ListToken(_owner, token_id, price)
+
+    @external
+    def import_auction(self, _token_id: int, _starting_price: int, _start_time: int, _end_time: int,
+                       _current_bid: int = 0, _highest_bidder: Address = None):
+        """
+        Imports an auction from a state snapshot. Token has to be imported with listing price -1 first.
+        ICX of the current bid is not transferred, contract balance needs to cover it when auction ends.
+        """
+        self._check_that_snapshot_import_is_allowed()
+        self._check_that_token_is_on_auction(_token_id)
+        self._check_that_price_is_positive(_starting_price)
+
+        seller = self.ownerOf(_token_id)
+        self._auction_item_start_time(_token_id).set(_start_time)
+        self._auction_item_end_time(_token_id).set(_end_time)
+        self._auction_item_starting_price(_token_id).set(_starting_price)
+        self._auction_item_seller(_token_id).set(seller)
+        if _current_bid and _highest_bidder:
+            self._auction_item_current_bid(_token_id).set(_current_bid)
+            self._auction_item_highest_bidder(_token_id).set(_highest_bidder)
+
+        self.AuctionCreated(seller, _token_id, _starting_price, _start_time, _end_time)
+
+    @external
+    def import_dutch_auction(self, _token_id: int, _start_price: int, _end_price: int, _start_time: int,
+                             _end_time: int):
+        """ Imports a Dutch auction from a state snapshot. Token has to be imported with listing price -2 first. """
+        self._check_that_snapshot_import_is_allowed()
+        self._check_that_token_is_on_dutch_auction(_token_id)
+        self._check_that_price_is_positive(_start_price)
+        self._check_that_price_is_positive(_end_price)
+        if _end_time <= _start_time:
+            revert('End time needs to be after start time')
+
+        self._dutch_auction_start_price(_token_id).set(_start_price)
+        self._dutch_auction_end_price(_token_id).set(_end_price)
+        self._dutch_auction_start_time(_token_id).set(_start_time)
+        self._dutch_auction_end_time(_token_id).set(_end_time)
+
+        self.DutchAuctionCreated(self.ownerOf(_token_id), _token_id, _start_price, _end_price, _start_time, _end_time)
+
+    @external
+    def import_sale_records(self, _token_ids: List[int], _types: List[str], _sellers: List[Address],
+                            _buyers: List[Address], _starting_prices: List[int], _final_prices: List[int],
+                            _start_times: List[int], _end_times: List[int]):
+        """ Appends sale records from a state snapshot. Zero address is used for records without a buyer. """
+        self._check_that_snapshot_import_is_allowed()
+        self._check_import_batch(_token_ids, _types, _sellers, _buyers, _starting_prices, _final_prices,
+                                 _start_times, _end_times)
+
+        for index in range(len(_token_ids)):
+            buyer = _buyers[index]
+            self._create_sale_record(_token_id=_token_ids[index],
+                                     _type=_types[index],
+                                     _seller=_sellers[index],
+                                     _buyer=None if self._is_zero_address(buyer) else buyer,
+                                     _starting_price=_starting_prices[index],
+                                     _final_price=_final_prices[index],
+                                     _start_time=_start_times[index],
+                                     _end_time=_end_times[index])
+
+    @external
+    def close_snapshot_import(self):
+        """ Permanently disables snapshot import methods. Import is always closed after contract update. """
+        if self._director.get() != self.msg.sender:
+            revert('You are not allowed to close snapshot import')
+        if self._snapshot_import_closed.get():
+            revert('Snapshot import is already closed')
+        self._snapshot_import_closed.set(True)
+
     @eventlog(indexed=3)
     def Approval(self, _owner: Address, _approved: Address, _tokenId: int):
         pass
@@ -1096,6 +2842,10 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
     def PurchaseToken(self, _seller: Address, _buyer: Address, _tokenId: int):
         pass
 
+    @eventlog(indexed=3)
+    def PurchaseTokenWithPrice(self, _seller: Address, _buyer: Address, _tokenId: int, _price: int):
+        pass
+
     @eventlog(indexed=3)
     def ListToken(self, _owner: Address, _tokenId: int, price: int):
         pass
@@ -1104,6 +2854,81 @@ class NebulaPlanetToken(IconScoreBase, IRC3, IRC3Metadata, IRC3Enumerable):
     def DelistToken(self, _owner: Address, _tokenId: int):
         pass
 
+    @eventlog(indexed=2)
+    def AuctionCreated(self, _seller: Address, _tokenId: int, _startingPrice: int, _startTime: int, _endTime: int):
+        pass
+
+    @eventlog(indexed=2)
+    def DutchAuctionCreated(self, _seller: Address, _tokenId: int, _startPrice: int, _endPrice: int, _startTime: int,
+                            _endTime: int):
+        pass
+
+    @eventlog(indexed=2)
+    def BatchedAuctionCreated(self, _seller: Address, _tokenId: int, _startingPrice: int, _startTime: int,
+                              _endTime: int):
+        pass
+
+    @eventlog(indexed=2)
+    def BidCollected(self, _bidder: Address, _tokenId: int, _amount: int):
+        pass
+
+    @eventlog(indexed=2)
+    def BidPlaced(self, _bidder: Address, _tokenId: int, _amount: int, _endTime: int):
+        pass
+
+    @eventlog(indexed=3)
+    def AuctionFinalized(self, _seller: Address, _buyer: Address, _tokenId: int, _price: int):
+        pass
+
+    @eventlog(indexed=2)
+    def AuctionCancelled(self, _seller: Address, _tokenId: int):
+        pass
+
+    @eventlog(indexed=2)
+    def AuctionUnsold(self, _seller: Address, _tokenId: int):
+        pass
+
+    @eventlog(indexed=2)
+    def OfferMade(self, _bidder: Address, _tokenId: int, _amount: int, _expiresAt: int):
+        pass
+
+    @eventlog(indexed=2)
+    def OfferCancelled(self, _bidder: Address, _tokenId: int):
+        pass
+
+    @eventlog(indexed=3)
+    def OfferAccepted(self, _seller: Address, _bidder: Address, _tokenId: int, _amount: int):
+        pass
+
+    @eventlog(indexed=2)
+    def CollectionOfferMade(self, _offerId: int, _bidder: Address, _amount: int):
+        pass
+
+    @eventlog(indexed=2)
+    def CollectionOfferCancelled(self, _offerId: int, _bidder: Address):
+        pass
+
+    @eventlog(indexed=3)
+    def CollectionOfferAccepted(self, _offerId: int, _seller: Address, _bidder: Address, _tokenId: int, _amount: int):
+        pass
+
+    @eventlog(indexed=1)
+    def RefundCredited(self, _address: Address, _amount: int):
+        pass
+
+    @eventlog(indexed=1)
+    def RefundWithdrawn(self, _address: Address, _amount: int):
+        pass
+
+    @eventlog(indexed=2)
+    def SaleRecordArchived(self, _recordId: int, _tokenId: int, _type: str, _seller: Address, _buyer: Address,
+                           _startingPrice: int, _finalPrice: int, _startTime: int, _endTime: int):
+        pass
+
+    @eventlog(indexed=1)
+    def StorageMigrated(self, _version: int):
+        pass
+
     @eventlog(indexed=2)
     def AssignRole(self, _role: str, _owner: Address):
         pass
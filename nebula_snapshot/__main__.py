@@ -0,0 +1,59 @@
+"""
+Exports state of a Nebula token SCORE into a snapshot file, imports it into a fresh deployment and checks
+storage dumps for broken indexes. Storage dumps are written by storage.dump_score_storage from SCOREs created
+by ScoreTestCase, storage of deployed contracts can not be read over JSON-RPC.
+
+    python -m nebula_snapshot export --rpc http://127.0.0.1:9000/api/v3 --contract cx... --file planets.jsonl.gz
+    python -m nebula_snapshot import --rpc http://127.0.0.1:9000/api/v3 --contract cx... --file planets.jsonl.gz \\
+        --keystore director.json --password ... --nid 3
+    python -m nebula_snapshot check --file storage.jsonl.gz --name NebulaPlanetToken
+"""
+import argparse
+import json
+import sys
+
+from .clients import JsonRpcClient
+from .invariants import LAYOUTS, check_storage_dump
+from .snapshot import export_snapshot, import_snapshot
+
+
+def main(_args: list = None):
+    parser = argparse.ArgumentParser(prog='nebula_snapshot', description='Export, import and check Nebula SCORE state')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    export_parser = commands.add_parser('export', help='Export SCORE state into a snapshot file')
+    import_parser = commands.add_parser('import', help='Import snapshot file into a fresh deployment')
+    for command_parser in (export_parser, import_parser):
+        command_parser.add_argument('--rpc', required=True, help='ICON JSON-RPC v3 endpoint')
+        command_parser.add_argument('--contract', required=True, help='SCORE address')
+        command_parser.add_argument('--file', required=True, help="Snapshot file, compressed when it ends with '.gz'")
+    import_parser.add_argument('--keystore', required=True, help='Keystore of Director and Minter')
+    import_parser.add_argument('--password', help='Keystore password')
+    import_parser.add_argument('--nid', type=int, default=1, help='Network ID')
+    import_parser.add_argument('--close-import', action='store_true',
+                               help='Permanently disable snapshot import afterwards')
+
+    check_parser = commands.add_parser('check', help='Check index invariants of a storage dump')
+    check_parser.add_argument('--file', required=True,
+                              help='Storage dump of a ScoreTestCase SCORE written by write_storage_dump')
+    check_parser.add_argument('--name', required=True, choices=sorted(LAYOUTS), help='Contract name')
+    args = parser.parse_args(_args)
+
+    if args.command == 'export':
+        count = export_snapshot(JsonRpcClient(args.rpc, args.contract), args.file)
+        print(f'Exported {count} records')
+    elif args.command == 'import':
+        from iconsdk.wallet.wallet import KeyWallet
+
+        wallet = KeyWallet.load(args.keystore, args.password)
+        client = JsonRpcClient(args.rpc, args.contract, wallet, args.nid)
+        print(f'Imported {import_snapshot(client, args.file, args.close_import)}')
+    else:
+        report = check_storage_dump(args.file, args.name)
+        print(json.dumps(report, indent=2))
+        return 0 if report['valid'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
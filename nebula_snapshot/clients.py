@@ -0,0 +1,131 @@
+import json
+import time
+import typing
+import urllib.request
+
+from iconservice import Address
+
+
+def to_int(_value) -> int:
+    """ Converts SCORE call result to int. JSON-RPC returns integers as hex strings ('0x1f'). """
+    if isinstance(_value, str):
+        return int(_value, 16) if _value.startswith(('0x', '-0x')) else int(_value)
+    return int(_value)
+
+
+def to_address(_value):
+    """ Converts SCORE call result to address string, None stays None. """
+    return str(_value) if _value else None
+
+
+class ScoreClient:
+    """
+    Calls methods of a SCORE instance created by ScoreTestCase. Parameters are given in their JSON form
+    (addresses as strings) and converted using type hints of called method.
+    """
+
+    def __init__(self, _score, _sender: Address = None):
+        self._score = _score
+        self._sender = _sender
+
+    def call(self, _method: str, _params: dict = None):
+        method = getattr(self._score, _method)
+        hints = typing.get_type_hints(getattr(type(self._score), _method))
+        params = {name: self._convert(value, hints.get(name)) for name, value in (_params or {}).items()}
+        return method(**params)
+
+    def send(self, _method: str, _params: dict = None):
+        from tbears.libs.scoretest.score_test_case import ScoreTestCase
+
+        ScoreTestCase.set_msg(self._sender)
+        return self.call(_method, _params)
+
+    @classmethod
+    def _convert(cls, _value, _hint):
+        if _hint is Address and isinstance(_value, str):
+            return Address.from_string(_value)
+        if getattr(_hint, '__origin__', None) is list and isinstance(_value, list):
+            return [cls._convert(item, _hint.__args__[0]) for item in _value]
+        return _value
+
+
+class JsonRpcClient:
+    """
+    Calls methods of a deployed SCORE through ICON JSON-RPC v3. Sending transactions requires iconsdk
+    and a wallet (iconsdk.wallet.wallet.KeyWallet) holding roles needed by called methods.
+    """
+
+    def __init__(self, _url: str, _contract: str, _wallet=None, _nid: int = 1, _step_limit: int = 100000000,
+                 _timeout: int = 60):
+        self._url = _url
+        self._contract = _contract
+        self._wallet = _wallet
+        self._nid = _nid
+        self._step_limit = _step_limit
+        self._timeout = _timeout
+        self._request_id = 0
+
+    def call(self, _method: str, _params: dict = None):
+        data = {"method": _method}
+        if _params:
+            data["params"] = self._to_rpc_params(_params)
+        return self._request('icx_call', {
+            "to": self._contract,
+            "dataType": "call",
+            "data": data
+        })
+
+    def send(self, _method: str, _params: dict = None):
+        from iconsdk.builder.transaction_builder import CallTransactionBuilder
+        from iconsdk.signed_transaction import SignedTransaction
+
+        transaction = CallTransactionBuilder() \
+            .from_(self._wallet.get_address()) \
+            .to(self._contract) \
+            .step_limit(self._step_limit) \
+            .nid(self._nid) \
+            .nonce(int(time.time())) \
+            .method(_method) \
+            .params(self._to_rpc_params(_params or {})) \
+            .build()
+        signed_transaction = SignedTransaction(transaction, self._wallet)
+        tx_hash = self._request('icx_sendTransaction', signed_transaction.signed_transaction_dict)
+        return self._wait_for_result(tx_hash)
+
+    def _wait_for_result(self, _tx_hash: str) -> dict:
+        deadline = time.time() + self._timeout
+        while True:
+            try:
+                result = self._request('icx_getTransactionResult', {"txHash": _tx_hash})
+            except RuntimeError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(1)
+                continue
+            if to_int(result['status']) != 1:
+                raise RuntimeError(f'Transaction {_tx_hash} failed: {result.get("failure")}')
+            return result
+
+    def _request(self, _method: str, _params: dict):
+        self._request_id += 1
+        payload = json.dumps({"jsonrpc": "2.0", "method": _method, "id": self._request_id, "params": _params})
+        request = urllib.request.Request(self._url, payload.encode(), {'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request) as response:
+            result = json.loads(response.read())
+        if 'error' in result:
+            raise RuntimeError(f'{_method} failed: {result["error"]}')
+        return result['result']
+
+    @classmethod
+    def _to_rpc_params(cls, _params: dict) -> dict:
+        return {name: cls._to_rpc_value(value) for name, value in _params.items() if value is not None}
+
+    @classmethod
+    def _to_rpc_value(cls, _value):
+        if isinstance(_value, bool):
+            return hex(int(_value))
+        if isinstance(_value, int):
+            return hex(_value)
+        if isinstance(_value, list):
+            return [cls._to_rpc_value(item) for item in _value]
+        return _value
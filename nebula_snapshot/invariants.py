@@ -0,0 +1,337 @@
+import hashlib
+import re
+from collections import Counter, namedtuple
+
+from .storage import decode_address, decode_int, decode_key, read_storage_dump
+
+StorageLayout = namedtuple('StorageLayout', ['listed_token_prices', 'owner_listed_token_count',
+                                             'total_listed_token_count', 'listed_token_prefix'])
+
+LAYOUTS = {
+    'NebulaPlanetToken': StorageLayout('listed_planet_prices', 'owner_listed_planet_count',
+                                       'total_listed_planet_count', 'LISTED_PLANET_'),
+    'NebulaSpaceshipToken': StorageLayout('listed_token_prices', 'owner_listed_token_count',
+                                          'total_listed_token_count', 'LISTED_TOKEN_'),
+}
+
+# Every invariant states that two storage structures hold the same multiset of items
+INVARIANTS = {
+    'owner_tokens': ('token_owner', 'owner token index {owner}_{index}'),
+    'owner_token_index_range': ('owned_token_count', 'owner token index {owner}_{index}'),
+    'token_index': ('token_owner', 'TOKEN_{id}'),
+    'token_index_pairs': ('TOKEN_{id}', 'INDEX_{index}'),
+    'token_index_range': ('total_supply', 'INDEX_{index}'),
+    'listed_tokens': ('listed token prices', 'LISTED_{id}'),
+    'listing_index_pairs': ('LISTED_{id}', 'LISTED_INDEX_{index}'),
+    'listing_index_range': ('total listed token count', 'LISTED_INDEX_{index}'),
+    'owner_listed_tokens': ('listed token prices', 'owner listing index LISTED_{owner}_INDEX_{index}'),
+    'owner_listing_index_range': ('owner listed token count', 'owner listing index LISTED_{owner}_INDEX_{index}'),
+    'auctions': ('listed token prices of -1', 'AUCTION_{id}_START_TIME'),
+    'dutch_auctions': ('listed token prices of -2', 'DUTCH_AUCTION_{id}_START_TIME'),
+    'batched_auctions': ('listed token prices of -3', 'BATCHED_AUCTION_{id}_START_TIME'),
+    'floor_heap': ('listed token prices above 0', 'FLOOR_HEAP_POSITION_{id}'),
+    'floor_heap_pairs': ('FLOOR_HEAP_POSITION_{id}', 'FLOOR_HEAP_{position}'),
+    'floor_heap_range': ('floor_heap_size', 'FLOOR_HEAP_{position}'),
+    'listing_sequences': ('listed token prices', 'LISTING_{id}_SEQUENCE'),
+    'listing_sequence_pairs': ('LISTING_{id}_SEQUENCE', 'LISTING_SEQUENCE_{sequence}'),
+    'offer_links': ('next offer of OFFER_{id}_{bidder} and OFFER_{id}_HEAD',
+                    'previous offer of OFFER_{id}_{bidder} and OFFER_{id}_TAIL'),
+    'offer_count': ('OFFER_{id}_COUNT', 'OFFER_{id}_{bidder}'),
+    'collection_offers': ('COLLECTION_OFFER_{id}', 'COLLECTION_OFFER_HEAP_POSITION_{id}'),
+    'collection_offer_heap_pairs': ('COLLECTION_OFFER_HEAP_POSITION_{id}', 'COLLECTION_OFFER_HEAP_{position}'),
+    'collection_offer_heap_range': ('collection_offer_heap_size', 'COLLECTION_OFFER_HEAP_{position}'),
+}
+
+_LEFT = 1
+_RIGHT = -1
+_ADDRESS = '((?:hx|cx)[0-9a-f]{40})'
+_SKETCH_MODULUS = 2 ** 64
+_ZERO_ADDRESS = 'hx0000000000000000000000000000000000000000'
+
+
+class StorageChecker:
+    """
+    Verifies cross-index invariants of a token SCORE storage dump with bounded memory.
+
+    Entries have to use the key layout of SCOREs created by ScoreTestCase, as written by
+    storage.dump_score_storage. Storage of deployed contracts is not available over JSON-RPC,
+    so it can only be checked in a test environment. Storage has to be migrated to the latest version,
+    listings created before floor heap or listing sequences were introduced are reported otherwise.
+
+    Every storage entry is turned into facts, items that have to appear on both sides of an invariant
+    (e.g. token_owner[5] = hx1 and owner index hx1_3 = 5 both yield item (5, hx1) of 'owner_tokens').
+    First pass adds item hashes of left side and subtracts hashes of right side in a fixed number of
+    buckets, so entries can come in any order. Buckets that don't sum up to zero are inspected in a
+    second pass, which only keeps items of these buckets to report orphans and mismatches.
+    """
+
+    def __init__(self, _layout: StorageLayout, _bucket_count: int = 4096):
+        self._layout = _layout
+        self._bucket_count = _bucket_count
+        prefix = re.escape(_layout.listed_token_prefix)
+        self._var_patterns = [
+            (re.compile(r'TOKEN_(\d+)'), self._on_token_position),
+            (re.compile(r'INDEX_(\d+)'), self._on_token_index),
+            (re.compile(prefix + r'INDEX_(\d+)'), self._on_listing_index),
+            (re.compile(prefix + _ADDRESS + r'_INDEX_(\d+)'), self._on_owner_listing_index),
+            (re.compile(prefix + r'(\d+)'), self._on_listing_position),
+            (re.compile(_ADDRESS + r'_(\d+)'), self._on_owner_token_index),
+            (re.compile(r'AUCTION_(\d+)_START_TIME'), self._on_auction),
+            (re.compile(r'DUTCH_AUCTION_(\d+)_START_TIME'), self._on_dutch_auction),
+            (re.compile(r'BATCHED_AUCTION_(\d+)_START_TIME'), self._on_batched_auction),
+            (re.compile(r'FLOOR_HEAP_(\d+)'), self._on_floor_heap_token),
+            (re.compile(r'FLOOR_HEAP_POSITION_(\d+)'), self._on_floor_heap_position),
+            (re.compile(r'LISTING_(\d+)_SEQUENCE'), self._on_token_listing_sequence),
+            (re.compile(r'LISTING_SEQUENCE_(\d+)'), self._on_listing_sequence_token),
+            (re.compile(r'OFFER_(\d+)_' + _ADDRESS), self._on_offer),
+            (re.compile(r'OFFER_(\d+)_HEAD'), self._on_offer_head),
+            (re.compile(r'OFFER_(\d+)_TAIL'), self._on_offer_tail),
+            (re.compile(r'OFFER_(\d+)_COUNT'), self._on_offer_count),
+            (re.compile(r'COLLECTION_OFFER_(\d+)'), self._on_collection_offer),
+            (re.compile(r'COLLECTION_OFFER_HEAP_(\d+)'), self._on_collection_offer_heap_offer),
+            (re.compile(r'COLLECTION_OFFER_HEAP_POSITION_(\d+)'), self._on_collection_offer_heap_position),
+        ]
+
+    def check(self, _open_entries) -> dict:
+        """
+        Checks storage entries returned by _open_entries, a callable returning a fresh iterator of
+        (key body, value) pairs, e.g. lambda: read_storage_dump(path). Entries are read twice only when
+        an invariant is violated.
+        """
+        sums = {name: [0] * self._bucket_count for name in INVARIANTS}
+        counts = {name: [0] * self._bucket_count for name in INVARIANTS}
+        entry_count = 0
+        unknown_count = 0
+        for key, value in _open_entries():
+            entry_count += 1
+            known = False
+            for name, side, item in self._facts(key, value):
+                known = True
+                item_hash, bucket = self._hash(item)
+                sums[name][bucket] = (sums[name][bucket] + side * item_hash) % _SKETCH_MODULUS
+                counts[name][bucket] += side
+            if not known:
+                unknown_count += 1
+
+        mismatched_buckets = {}
+        for name in INVARIANTS:
+            buckets = {bucket for bucket in range(self._bucket_count) if sums[name][bucket] or counts[name][bucket]}
+            if buckets:
+                mismatched_buckets[name] = buckets
+
+        violations = self._find_violations(_open_entries(), mismatched_buckets) if mismatched_buckets else []
+        return {
+            "entries": entry_count,
+            "unchecked_entries": unknown_count,
+            "valid": not violations,
+            "violations": violations
+        }
+
+    def _find_violations(self, _entries, _mismatched_buckets: dict) -> list:
+        balances = {name: Counter() for name in _mismatched_buckets}
+        for key, value in _entries:
+            for name, side, item in self._facts(key, value):
+                if name in _mismatched_buckets and self._hash(item)[1] in _mismatched_buckets[name]:
+                    balances[name][item] += side
+
+        violations = []
+        for name, balance in balances.items():
+            left, right = INVARIANTS[name]
+            for item, count in sorted(balance.items(), key=lambda pair: str(pair[0])):
+                if count == 0:
+                    continue
+                violations.append({
+                    "invariant": name,
+                    "item": list(item),
+                    "found_in": left if count > 0 else right,
+                    "missing_in": right if count > 0 else left,
+                    "count": abs(count)
+                })
+        return violations
+
+    def _hash(self, _item: tuple) -> tuple:
+        digest = hashlib.blake2b(repr(_item).encode(), digest_size=16).digest()
+        return int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') % self._bucket_count
+
+    # ================================================
+    #  Facts
+    # ================================================
+
+    def _facts(self, _key: bytes, _value: bytes):
+        """ Yields (invariant name, side, item) facts of a storage entry. """
+        decoded_key = decode_key(_key)
+        if decoded_key is None:
+            return
+        container, name, dict_key = decoded_key
+        if container == 'var':
+            yield from self._var_facts(name, _value)
+        else:
+            yield from self._dict_facts(name, dict_key, _value)
+
+    def _var_facts(self, _name: str, _value: bytes):
+        if _name == 'total_supply':
+            yield from self._range('token_index_range', _LEFT, (), decode_int(_value))
+        elif _name == self._layout.total_listed_token_count:
+            yield from self._range('listing_index_range', _LEFT, (), decode_int(_value))
+        elif _name == 'floor_heap_size':
+            yield from self._range('floor_heap_range', _LEFT, (), decode_int(_value))
+        elif _name == 'collection_offer_heap_size':
+            yield from self._range('collection_offer_heap_range', _LEFT, (), decode_int(_value))
+        else:
+            for pattern, handler in self._var_patterns:
+                match = pattern.fullmatch(_name)
+                if match:
+                    yield from handler(match.groups(), _value)
+                    return
+
+    def _dict_facts(self, _name: str, _key: bytes, _value: bytes):
+        if _name == 'token_owner':
+            owner = decode_address(_value)
+            if owner == _ZERO_ADDRESS:
+                return  # Tokens burned before burned token bitmap was introduced
+            token_id = decode_int(_key)
+            yield 'owner_tokens', _LEFT, (token_id, owner)
+            yield 'token_index', _LEFT, (token_id,)
+        elif _name == 'owned_token_count':
+            yield from self._range('owner_token_index_range', _LEFT, (decode_address(_key),), decode_int(_value))
+        elif _name == self._layout.owner_listed_token_count:
+            yield from self._range('owner_listing_index_range', _LEFT, (decode_address(_key),), decode_int(_value))
+        elif _name == self._layout.listed_token_prices:
+            price = decode_int(_value)
+            if not price:
+                return
+            token_id = int(_key.decode())
+            yield 'listed_tokens', _LEFT, (token_id,)
+            yield 'owner_listed_tokens', _LEFT, (token_id,)
+            yield 'listing_sequences', _LEFT, (token_id,)
+            if price > 0:
+                yield 'floor_heap', _LEFT, (token_id,)
+            elif price == -1:
+                yield 'auctions', _LEFT, (token_id,)
+            elif price == -2:
+                yield 'dutch_auctions', _LEFT, (token_id,)
+            elif price == -3:
+                yield 'batched_auctions', _LEFT, (token_id,)
+
+    @staticmethod
+    def _range(_name: str, _side: int, _prefix: tuple, _count: int):
+        for index in range(1, _count + 1):
+            yield _name, _side, _prefix + (index,)
+
+    @staticmethod
+    def _on_token_position(_groups: tuple, _value: bytes):
+        token_id, index = int(_groups[0]), decode_int(_value)
+        yield 'token_index', _RIGHT, (token_id,)
+        yield 'token_index_pairs', _LEFT, (index, token_id)
+
+    @staticmethod
+    def _on_token_index(_groups: tuple, _value: bytes):
+        index, token_id = int(_groups[0]), decode_int(_value)
+        yield 'token_index_pairs', _RIGHT, (index, token_id)
+        yield 'token_index_range', _RIGHT, (index,)
+
+    @staticmethod
+    def _on_owner_token_index(_groups: tuple, _value: bytes):
+        owner, index, token_id = _groups[0], int(_groups[1]), int(_value.decode())
+        yield 'owner_tokens', _RIGHT, (token_id, owner)
+        yield 'owner_token_index_range', _RIGHT, (owner, index)
+
+    @staticmethod
+    def _on_listing_position(_groups: tuple, _value: bytes):
+        token_id, index = int(_groups[0]), decode_int(_value)
+        yield 'listed_tokens', _RIGHT, (token_id,)
+        yield 'listing_index_pairs', _LEFT, (index, token_id)
+
+    @staticmethod
+    def _on_listing_index(_groups: tuple, _value: bytes):
+        index, token_id = int(_groups[0]), decode_int(_value)
+        yield 'listing_index_pairs', _RIGHT, (index, token_id)
+        yield 'listing_index_range', _RIGHT, (index,)
+
+    @staticmethod
+    def _on_owner_listing_index(_groups: tuple, _value: bytes):
+        # Value is token ID and listing price ('12:1000'), listings created before prices were stored only hold token ID
+        owner, index, token_id = _groups[0], int(_groups[1]), int(_value.decode().partition(':')[0])
+        yield 'owner_listed_tokens', _RIGHT, (token_id,)
+        yield 'owner_listing_index_range', _RIGHT, (owner, index)
+
+    @staticmethod
+    def _on_auction(_groups: tuple, _value: bytes):
+        yield 'auctions', _RIGHT, (int(_groups[0]),)
+
+    @staticmethod
+    def _on_dutch_auction(_groups: tuple, _value: bytes):
+        yield 'dutch_auctions', _RIGHT, (int(_groups[0]),)
+
+    @staticmethod
+    def _on_batched_auction(_groups: tuple, _value: bytes):
+        yield 'batched_auctions', _RIGHT, (int(_groups[0]),)
+
+    @staticmethod
+    def _on_floor_heap_token(_groups: tuple, _value: bytes):
+        position, token_id = int(_groups[0]), decode_int(_value)
+        yield 'floor_heap_pairs', _RIGHT, (position, token_id)
+        yield 'floor_heap_range', _RIGHT, (position,)
+
+    @staticmethod
+    def _on_floor_heap_position(_groups: tuple, _value: bytes):
+        token_id, position = int(_groups[0]), decode_int(_value)
+        yield 'floor_heap', _RIGHT, (token_id,)
+        yield 'floor_heap_pairs', _LEFT, (position, token_id)
+
+    @staticmethod
+    def _on_token_listing_sequence(_groups: tuple, _value: bytes):
+        token_id, sequence = int(_groups[0]), decode_int(_value)
+        yield 'listing_sequences', _RIGHT, (token_id,)
+        yield 'listing_sequence_pairs', _LEFT, (sequence, token_id)
+
+    @staticmethod
+    def _on_listing_sequence_token(_groups: tuple, _value: bytes):
+        yield 'listing_sequence_pairs', _RIGHT, (int(_groups[0]), decode_int(_value))
+
+    @staticmethod
+    def _on_offer(_groups: tuple, _value: bytes):
+        # Offers of a token form a doubly linked list, every link has to be stored in both directions.
+        # Value is '{amount}:{expires_at}:{previous bidder}:{next bidder}' with empty bidder at the ends of the list.
+        token_id, bidder = int(_groups[0]), _groups[1]
+        _, _, previous_bidder, next_bidder = _value.decode().split(':')
+        yield 'offer_links', _LEFT, (token_id, bidder, next_bidder)
+        yield 'offer_links', _RIGHT, (token_id, previous_bidder, bidder)
+        yield 'offer_count', _RIGHT, (token_id,)
+
+    @staticmethod
+    def _on_offer_head(_groups: tuple, _value: bytes):
+        yield 'offer_links', _LEFT, (int(_groups[0]), '', decode_address(_value))
+
+    @staticmethod
+    def _on_offer_tail(_groups: tuple, _value: bytes):
+        yield 'offer_links', _RIGHT, (int(_groups[0]), decode_address(_value), '')
+
+    @staticmethod
+    def _on_offer_count(_groups: tuple, _value: bytes):
+        for _ in range(decode_int(_value)):
+            yield 'offer_count', _LEFT, (int(_groups[0]),)
+
+    @staticmethod
+    def _on_collection_offer(_groups: tuple, _value: bytes):
+        yield 'collection_offers', _LEFT, (int(_groups[0]),)
+
+    @staticmethod
+    def _on_collection_offer_heap_offer(_groups: tuple, _value: bytes):
+        position, offer_id = int(_groups[0]), decode_int(_value)
+        yield 'collection_offer_heap_pairs', _RIGHT, (position, offer_id)
+        yield 'collection_offer_heap_range', _RIGHT, (position,)
+
+    @staticmethod
+    def _on_collection_offer_heap_position(_groups: tuple, _value: bytes):
+        offer_id, position = int(_groups[0]), decode_int(_value)
+        yield 'collection_offers', _RIGHT, (offer_id,)
+        yield 'collection_offer_heap_pairs', _LEFT, (position, offer_id)
+
+
+def check_storage_dump(_path: str, _contract_name: str) -> dict:
+    """
+    Checks storage dump file written by write_storage_dump from dump_score_storage entries of a token SCORE
+    created by ScoreTestCase, _contract_name selects its storage layout.
+    """
+    return StorageChecker(LAYOUTS[_contract_name]).check(lambda: read_storage_dump(_path))
@@ -0,0 +1,274 @@
+import gzip
+import json
+
+from .clients import to_address, to_int
+
+SNAPSHOT_VERSION = 1
+_BATCH_SIZE = 100
+_ZERO_ADDRESS = 'hx0000000000000000000000000000000000000000'
+
+
+def open_snapshot(_path: str, _mode: str = 'r'):
+    """ Opens snapshot file for reading ('r') or writing ('w'). Files ending with '.gz' are gzip compressed. """
+    if _path.endswith('.gz'):
+        return gzip.open(_path, _mode + 't', encoding='utf-8')
+    return open(_path, _mode, encoding='utf-8')
+
+
+def write_snapshot(_path: str, _records) -> int:
+    """ Writes snapshot records as JSON lines and returns the number of written records. """
+    count = 0
+    with open_snapshot(_path, 'w') as snapshot_file:
+        for record in _records:
+            snapshot_file.write(json.dumps(record, separators=(',', ':')) + '\n')
+            count += 1
+    return count
+
+
+def read_snapshot(_path: str):
+    """ Yields snapshot records one by one, so snapshots of any size can be streamed. """
+    with open_snapshot(_path) as snapshot_file:
+        for line in snapshot_file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _batches(_values: list) -> list:
+    return [_values[index:index + _BATCH_SIZE] for index in range(0, len(_values), _BATCH_SIZE)]
+
+
+# ================================================
+#  Export
+# ================================================
+
+def export_records(_client):
+    """
+    Yields snapshot records of a token SCORE read through its readonly methods:
+    header, settings, tokens (per owner, in owner index order), listings (per owner, in owner listing
+    index order), auctions, Dutch auctions and sale records. Records are yielded in the order they have to be
+    imported. Offers and collection offers are not exported, their deposits stay in the exported contract where
+    bidders can cancel them.
+    """
+    yield {"kind": "header", "version": SNAPSHOT_VERSION, "name": _client.call('name')}
+
+    base_URL = _client.call('metadata_base_URL')
+    yield {
+        "kind": "settings",
+        "metadata_base_URL": base_URL,
+        "token_URI_template": _client.call('token_URI_template'),
+        "seller_fee": to_int(_client.call('seller_fee')),
+        "sale_record_capacity": to_int(_client.call('sale_record_capacity'))
+    }
+
+    token_count = to_int(_client.call('totalSupply'))
+    token_ids = [to_int(_client.call('tokenByIndex', {"_index": index})) for index in range(1, token_count + 1)]
+    for owner in _owners_of(_client, token_ids):
+        owned_token_ids = [to_int(token_id) for token_id in _client.call('owned_tokens', {"_owner": owner})]
+        for batch in _batches(owned_token_ids):
+            token_URIs = _client.call('token_URIs', {"_token_ids": batch})
+            yield {
+                "kind": "tokens",
+                "owner": owner,
+                "token_ids": batch,
+                "token_URIs": [_strip_base_URL(token_URIs[str(token_id)], base_URL) for token_id in batch]
+            }
+
+    listing_count = to_int(_client.call('total_listed_token_count'))
+    listed_token_ids = [to_int(_client.call('get_listed_token_by_index', {"_index": index}))
+                        for index in range(1, listing_count + 1)]
+    auctioned_token_ids = []
+    dutch_auctioned_token_ids = []
+    for owner in _owners_of(_client, listed_token_ids):
+        owner_listing_count = to_int(_client.call('listed_token_count_by_owner', {"_owner": owner}))
+        owner_token_ids = [
+            to_int(_client.call('get_listed_token_of_owner_by_index', {"_owner": owner, "_index": index}))
+            for index in range(1, owner_listing_count + 1)
+        ]
+        prices = [to_int(_client.call('get_token_price', {"_tokenId": token_id})) for token_id in owner_token_ids]
+        # Bids of batched auctions are held in escrow by the contract and can not be moved to another one
+        for token_id, price in zip(owner_token_ids, prices):
+            if price == -3:
+                raise ValueError(f'Token {token_id} is on batched auction, it has to be settled before export')
+        auctioned_token_ids += [token_id for token_id, price in zip(owner_token_ids, prices) if price == -1]
+        dutch_auctioned_token_ids += [token_id for token_id, price in zip(owner_token_ids, prices) if price == -2]
+        for token_id_batch, price_batch in zip(_batches(owner_token_ids), _batches(prices)):
+            yield {"kind": "listings", "owner": owner, "token_ids": token_id_batch, "prices": price_batch}
+
+    for token_id in auctioned_token_ids:
+        auction = _client.call('get_auction_info', {"_token_id": token_id})
+        yield {
+            "kind": "auction",
+            "token_id": token_id,
+            "starting_price": to_int(auction['starting_price']),
+            "start_time": to_int(auction['start_time']),
+            "end_time": to_int(auction['end_time']),
+            "current_bid": to_int(auction['current_bid']),
+            "highest_bidder": to_address(auction['highest_bidder'])
+        }
+
+    for token_id in dutch_auctioned_token_ids:
+        auction = _client.call('get_dutch_auction_info', {"_token_id": token_id})
+        yield {
+            "kind": "dutch_auction",
+            "token_id": token_id,
+            "start_price": to_int(auction['start_price']),
+            "end_price": to_int(auction['end_price']),
+            "start_time": to_int(auction['start_time']),
+            "end_time": to_int(auction['end_time'])
+        }
+
+    # Archived sale records are no longer stored, they are only available in SaleRecordArchived eventlogs
+    record_count = to_int(_client.call('sale_record_count'))
+    capacity = to_int(_client.call('sale_record_capacity'))
+    first_record_id = max(record_count - capacity, 0) + 1 if capacity else 1
+    record_ids = list(range(first_record_id, record_count + 1))
+    for batch in _batches(record_ids):
+        records = [_client.call('get_sale_record', {"_record_id": record_id}) for record_id in batch]
+        yield {
+            "kind": "sale_records",
+            "records": [{
+                "token_id": to_int(record['token_id']),
+                "type": record['type'],
+                "seller": to_address(record['seller']),
+                "buyer": to_address(record['buyer']),
+                "starting_price": to_int(record['starting_price']),
+                "final_price": to_int(record['final_price']),
+                "start_time": to_int(record['start_time']),
+                "end_time": to_int(record['end_time'])
+            } for record in records]
+        }
+
+
+def export_snapshot(_client, _path: str) -> int:
+    """ Exports SCORE state into snapshot file. Returns the number of written records. """
+    return write_snapshot(_path, export_records(_client))
+
+
+def _owners_of(_client, _token_ids: list) -> list:
+    """ Returns distinct owners of given tokens in order of their first appearance. """
+    owners = {}
+    for batch in _batches(_token_ids):
+        for owner in _client.call('owners_of', {"_token_ids": batch}).values():
+            if owner:
+                owners[to_address(owner)] = True
+    return list(owners)
+
+
+def _strip_base_URL(_token_URI, _base_URL: str) -> str:
+    if not _token_URI:
+        return ''
+    return _token_URI[len(_base_URL):] if _token_URI.startswith(_base_URL) else _token_URI
+
+
+# ================================================
+#  Import
+# ================================================
+
+def import_records(_client, _records, _close_import: bool = False) -> dict:
+    """
+    Imports snapshot records into a freshly deployed token SCORE. Client has to send transactions as an
+    address that holds both Director and Minter roles. Contract is paused during the import and unpaused
+    afterwards. Returns number of imported items by record kind.
+    """
+    counts = {}
+    _client.send('pause_contract')
+    for record in _records:
+        kind = record['kind']
+        _IMPORTERS[kind](_client, record)
+        counts[kind] = counts.get(kind, 0) + _item_count(record)
+    if _close_import:
+        _client.send('close_snapshot_import')
+    _client.send('unpause_contract')
+    return counts
+
+
+def import_snapshot(_client, _path: str, _close_import: bool = False) -> dict:
+    """ Imports snapshot file into a freshly deployed token SCORE. See import_records. """
+    return import_records(_client, read_snapshot(_path), _close_import)
+
+
+def _item_count(_record: dict) -> int:
+    if 'token_ids' in _record:
+        return len(_record['token_ids'])
+    if 'records' in _record:
+        return len(_record['records'])
+    return 1
+
+
+def _import_header(_client, _record: dict):
+    if _record['version'] != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {_record['version']}")
+    name = _client.call('name')
+    if _record['name'] != name:
+        raise ValueError(f"Snapshot of {_record['name']} can not be imported into {name}")
+
+
+def _import_settings(_client, _record: dict):
+    _client.send('set_metadata_base_URL', {"_base_URL": _record['metadata_base_URL']})
+    # Template has to be set before tokens, so URIs that follow it don't get stored
+    _client.send('set_token_URI_template', {"_template": _record['token_URI_template']})
+    _client.send('set_seller_fee', {"_new_fee": _record['seller_fee']})
+    if _record.get('sale_record_capacity'):
+        _client.send('set_sale_record_capacity', {"_capacity": _record['sale_record_capacity']})
+
+
+def _import_tokens(_client, _record: dict):
+    _client.send('import_tokens', {
+        "_owner": _record['owner'],
+        "_token_ids": _record['token_ids'],
+        "_token_URIs": _record['token_URIs']
+    })
+
+
+def _import_listings(_client, _record: dict):
+    _client.send('import_listings', {
+        "_owner": _record['owner'],
+        "_token_ids": _record['token_ids'],
+        "_prices": _record['prices']
+    })
+
+
+def _import_auction(_client, _record: dict):
+    _client.send('import_auction', {
+        "_token_id": _record['token_id'],
+        "_starting_price": _record['starting_price'],
+        "_start_time": _record['start_time'],
+        "_end_time": _record['end_time'],
+        "_current_bid": _record['current_bid'],
+        "_highest_bidder": _record['highest_bidder']
+    })
+
+
+def _import_dutch_auction(_client, _record: dict):
+    _client.send('import_dutch_auction', {
+        "_token_id": _record['token_id'],
+        "_start_price": _record['start_price'],
+        "_end_price": _record['end_price'],
+        "_start_time": _record['start_time'],
+        "_end_time": _record['end_time']
+    })
+
+
+def _import_sale_records(_client, _record: dict):
+    records = _record['records']
+    _client.send('import_sale_records', {
+        "_token_ids": [record['token_id'] for record in records],
+        "_types": [record['type'] for record in records],
+        "_sellers": [record['seller'] for record in records],
+        "_buyers": [record['buyer'] or _ZERO_ADDRESS for record in records],
+        "_starting_prices": [record['starting_price'] for record in records],
+        "_final_prices": [record['final_price'] for record in records],
+        "_start_times": [record['start_time'] for record in records],
+        "_end_times": [record['end_time'] for record in records]
+    })
+
+
+_IMPORTERS = {
+    "header": _import_header,
+    "settings": _import_settings,
+    "tokens": _import_tokens,
+    "listings": _import_listings,
+    "auction": _import_auction,
+    "dutch_auction": _import_dutch_auction,
+    "sale_records": _import_sale_records,
+}
@@ -0,0 +1,56 @@
+from iconservice import Address
+from iconservice.iconscore.db import to_key_body
+
+from .snapshot import read_snapshot, write_snapshot
+
+VAR_DB_TAG = b'\x02'
+DICT_DB_TAG = b'\x01'
+
+
+def dump_score_storage(_score):
+    """
+    Yields (key body, value) pairs of all storage entries of a SCORE created by ScoreTestCase.
+    Key body is the key without SCORE address prefix, e.g. b'\\x02|total_supply' for a VarDB
+    or b'\\x01|token_owner|\\x0b' for a DictDB entry.
+    """
+    score_db = _score._db
+    prefix = score_db.address.to_bytes() + b'|'
+    context_db = score_db._context_db
+    for final_key in list(context_db.iterator()):
+        if final_key.startswith(prefix):
+            value = context_db.get(None, final_key)
+            if value is not None:
+                yield to_key_body(score_db.address, final_key, False), value
+
+
+def write_storage_dump(_path: str, _entries) -> int:
+    """ Writes (key body, value) pairs as JSON lines with hex encoded bytes. Returns number of entries. """
+    return write_snapshot(_path, ({"k": key.hex(), "v": value.hex()} for key, value in _entries))
+
+
+def read_storage_dump(_path: str):
+    """ Yields (key body, value) pairs of a storage dump one by one. """
+    for entry in read_snapshot(_path):
+        yield bytes.fromhex(entry['k']), bytes.fromhex(entry['v'])
+
+
+def decode_key(_key: bytes) -> tuple:
+    """
+    Splits key body into (container type, name, DictDB key). Container type is 'var' or 'dict',
+    DictDB key is None for VarDB entries. Returns None for keys of other containers.
+    """
+    parts = _key.split(b'|', 2)
+    if parts[0] == VAR_DB_TAG and len(parts) >= 2:
+        return 'var', _key[len(VAR_DB_TAG) + 1:].decode(), None
+    if parts[0] == DICT_DB_TAG and len(parts) == 3:
+        return 'dict', parts[1].decode(), parts[2]
+    return None
+
+
+def decode_int(_value: bytes) -> int:
+    return int.from_bytes(_value, 'big', signed=True)
+
+
+def decode_address(_value: bytes) -> str:
+    return str(Address.from_bytes(_value))
+
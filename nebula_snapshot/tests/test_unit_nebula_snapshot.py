@@ -0,0 +1,146 @@
+import os
+import tempfile
+
+from tbears.libs.scoretest.score_test_case import ScoreTestCase
+from iconservice import *
+
+from nebula_planet_token.nebula_planet_token import NebulaPlanetToken
+from nebula_spaceship_token.nebula_spaceship_token import NebulaSpaceshipToken
+from ..clients import JsonRpcClient, ScoreClient
+from ..snapshot import export_records, export_snapshot, import_snapshot, read_snapshot
+
+
+class TestSnapshot(ScoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.score = self.get_score_instance(NebulaPlanetToken, self.test_account1)
+        self.target_score = self.get_score_instance(NebulaPlanetToken, self.test_account1,
+                                                    score_address=Address.from_string(f"cx{'5678' * 10}"))
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+        super().tearDown()
+
+    def _create_state(self):
+        self.set_msg(self.test_account1)
+        self.score.set_metadata_base_URL('https://nebula.test/')
+        self.score.set_token_URI_template('{id}.json')
+        self.score.set_seller_fee(2500)
+        for token_id in range(1, 6):
+            self.score.mint(self.test_account1, token_id, f'{token_id}.json')
+        self.score.mint(self.test_account2, 6, 'custom.json')
+        self.score.list_token(1, 1000)
+        self.score.create_auction(2, 5000, 24)
+        self.score.list_token(3, 3000)
+        self.score.delist_token(3)
+
+        self.set_msg(self.test_account2, 1000)
+        self.score.purchase_token(1)
+        self.set_msg(self.test_account2, 5000)
+        self.score.place_bid(2)
+
+    def _export_and_import(self, _file_name: str) -> dict:
+        path = os.path.join(self.directory.name, _file_name)
+        export_snapshot(ScoreClient(self.score), path)
+        return import_snapshot(ScoreClient(self.target_score, self.test_account1), path)
+
+    def test_exported_state_matches_after_import(self):
+        self._create_state()
+
+        counts = self._export_and_import('planets.jsonl.gz')
+
+        self.assertEqual(counts, {"header": 1, "settings": 1, "tokens": 6, "listings": 1, "auction": 1,
+                                  "sale_records": 1})
+        for method, params in [('totalSupply', {}),
+                               ('seller_fee', {}),
+                               ('metadata_base_URL', {}),
+                               ('owned_tokens', {"_owner": self.test_account1}),
+                               ('owned_tokens', {"_owner": self.test_account2}),
+                               ('token_details', {"_token_ids": [1, 2, 3, 4, 5, 6, 7]}),
+                               ('listed_tokens', {}),
+                               ('listed_tokens_by_owner', {"_owner": self.test_account1}),
+                               ('get_auction_info', {"_token_id": 2}),
+                               ('sale_record_count', {}),
+                               ('get_sale_record', {"_record_id": 1})]:
+            self.assertEqual(getattr(self.target_score, method)(**params), getattr(self.score, method)(**params),
+                             method)
+        self.assertEqual(self.target_score._token_URIs[4], '')
+        self.assertEqual(self.target_score._token_URIs[6], 'custom.json')
+        self.assertEqual(self.target_score._is_paused.get(), False)
+
+    def test_imported_auction_can_be_finalized(self):
+        self._create_state()
+        self._export_and_import('planets.jsonl')
+        self.set_block(1, self.target_score._auction_item_end_time(2).get() + 1)
+
+        self.set_msg(self.test_account1)
+        self.target_score.finalize_auction(2)
+
+        self.assertEqual(self.target_score.ownerOf(2), self.test_account2)
+
+    def test_imports_dutch_auction(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 1, '1.json')
+        self.score.create_dutch_auction(1, 3000, 1000, 24)
+
+        counts = self._export_and_import('planets.jsonl')
+
+        self.assertEqual(counts['dutch_auction'], 1)
+        self.assertEqual(self.target_score.get_dutch_auction_info(1), self.score.get_dutch_auction_info(1))
+        self.assertEqual(self.target_score.listed_tokens(), {"1": -2})
+
+    def test_throws_when_exporting_open_batched_auction(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 1, '1.json')
+        self.score.create_batched_auction(1, 1000, 24)
+
+        with self.assertRaises(ValueError):
+            list(export_records(ScoreClient(self.score)))
+
+    def test_streams_records_in_import_order(self):
+        self._create_state()
+        path = os.path.join(self.directory.name, 'planets.jsonl')
+        export_snapshot(ScoreClient(self.score), path)
+
+        kinds = [record['kind'] for record in read_snapshot(path)]
+
+        self.assertEqual(kinds, ['header', 'settings', 'tokens', 'tokens', 'listings', 'auction', 'sale_records'])
+
+    def test_splits_tokens_into_batches(self):
+        self.set_msg(self.test_account1)
+        for token_id in range(1, 151):
+            self.score.mint(self.test_account1, token_id, f'{token_id}.json')
+
+        records = [record for record in export_records(ScoreClient(self.score)) if record['kind'] == 'tokens']
+
+        self.assertEqual([len(record['token_ids']) for record in records], [100, 50])
+
+    def test_exports_only_stored_sale_records(self):
+        self.set_msg(self.test_account1)
+        self.score.set_sale_record_capacity(2)
+        for token_id in range(1, 4):
+            self.score.mint(self.test_account1, token_id, f'{token_id}.json')
+            self.score.create_auction(token_id, 1000, 24)
+            self.score.cancel_auction(token_id)
+
+        self._export_and_import('planets.jsonl')
+
+        self.assertEqual(self.target_score.sale_record_capacity(), 2)
+        self.assertEqual([record['token_id'] for record in self.target_score.token_sale_history(2)], [2])
+        self.assertEqual(self.target_score.get_sale_record(2)['token_id'], 3)
+
+    def test_throws_when_importing_into_different_contract(self):
+        self._create_state()
+        self.target_score = self.get_score_instance(NebulaSpaceshipToken, self.test_account1,
+                                                    score_address=Address.from_string(f"cx{'9' * 40}"))
+
+        with self.assertRaises(ValueError):
+            self._export_and_import('planets.jsonl')
+
+    def test_converts_rpc_params(self):
+        params = JsonRpcClient._to_rpc_params({"_token_ids": [1, 16], "_owner": "hx1", "_bidder": None, "_flag": True})
+
+        self.assertEqual(params, {"_token_ids": ['0x1', '0x10'], "_owner": "hx1", "_flag": '0x1'})
@@ -0,0 +1,185 @@
+import os
+import tempfile
+
+from tbears.libs.scoretest.score_test_case import ScoreTestCase
+from iconservice import *
+
+from nebula_planet_token.nebula_planet_token import NebulaPlanetToken
+from nebula_spaceship_token.nebula_spaceship_token import NebulaSpaceshipToken
+from ..invariants import LAYOUTS, StorageChecker, check_storage_dump
+from ..storage import dump_score_storage, read_storage_dump, write_storage_dump
+
+
+class TestStorageInvariants(ScoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.score = self.get_score_instance(NebulaPlanetToken, self.test_account1)
+        self.checker = StorageChecker(LAYOUTS['NebulaPlanetToken'], 16)
+
+    def _create_state(self, _score):
+        self.set_msg(self.test_account1)
+        for token_id in range(1, 8):
+            _score.mint(self.test_account1 if token_id % 2 else self.test_account2, token_id, f'{token_id}.json')
+        _score.burn(3)
+        _score.list_token(1, 1000)
+        _score.create_auction(5, 1000, 24)
+        _score.transfer(self.test_account2, 7)
+        self.set_msg(self.test_account2)
+        _score.list_token(2, 2000)
+        _score.list_token(4, 1500)
+        for token_id, amount in ((1, 300), (6, 100), (7, 200)):
+            self.set_msg(self.test_account2 if token_id == 1 else self.test_account1, amount)
+            _score.make_offer(token_id)
+        bidder = Address.from_string(f"hx{'3' * 40}")
+        self.initialize_accounts({bidder: 10 ** 21})
+        self.set_msg(bidder, 400)
+        _score.make_offer(6)
+        for amount in (500, 700, 600):
+            self.set_msg(self.test_account2, amount)
+            _score.make_collection_offer()
+
+    def _check(self) -> dict:
+        entries = list(dump_score_storage(self.score))
+        return self.checker.check(lambda: iter(entries))
+
+    def _var_key(self, _name: str) -> bytes:
+        return b'\x02|' + _name.encode()
+
+    def test_valid_storage(self):
+        self._create_state(self.score)
+
+        report = self._check()
+
+        self.assertTrue(report['valid'])
+        self.assertEqual(report['violations'], [])
+        self.assertGreater(report['entries'], report['unchecked_entries'])
+
+    def test_valid_spaceship_storage(self):
+        self.score = self.get_score_instance(NebulaSpaceshipToken, self.test_account1)
+        self.checker = StorageChecker(LAYOUTS['NebulaSpaceshipToken'], 16)
+        self._create_state(self.score)
+
+        self.assertTrue(self._check()['valid'])
+
+    def test_reports_orphaned_token_index(self):
+        self._create_state(self.score)
+        self.score._token(4).remove()
+
+        report = self._check()
+
+        self.assertFalse(report['valid'])
+        self.assertEqual(sorted((violation['invariant'], violation['item'], violation['missing_in'])
+                                for violation in report['violations']),
+                         [('token_index', [4], 'TOKEN_{id}'),
+                          ('token_index_pairs', [4, 4], 'TOKEN_{id}')])
+
+    def test_reports_owner_index_mismatch(self):
+        self._create_state(self.score)
+        self.score._set_owner_token_index(self.test_account1, 1, 6)
+
+        violations = self._check()['violations']
+
+        self.assertIn({"invariant": "owner_tokens", "item": [6, str(self.test_account1)],
+                       "found_in": "owner token index {owner}_{index}", "missing_in": "token_owner", "count": 1},
+                      violations)
+        self.assertIn({"invariant": "owner_tokens", "item": [1, str(self.test_account1)],
+                       "found_in": "token_owner", "missing_in": "owner token index {owner}_{index}", "count": 1},
+                      violations)
+
+    def test_reports_listing_without_indexes(self):
+        self._create_state(self.score)
+        self.score._listed_token_prices['6'] = 500
+
+        violations = self._check()['violations']
+
+        self.assertEqual(sorted(violation['invariant'] for violation in violations),
+                         ['floor_heap', 'listed_tokens', 'listing_sequences', 'owner_listed_tokens'])
+
+    def test_reports_count_out_of_index_range(self):
+        self._create_state(self.score)
+        self.score._total_supply.set(self.score._total_supply.get() + 1)
+
+        violations = self._check()['violations']
+
+        self.assertEqual(violations, [{"invariant": "token_index_range", "item": [7], "found_in": "total_supply",
+                                       "missing_in": "INDEX_{index}", "count": 1}])
+
+    def test_reports_auction_without_details(self):
+        self._create_state(self.score)
+        self.score._auction_item_start_time(5).remove()
+
+        violations = self._check()['violations']
+
+        self.assertEqual([(violation['invariant'], violation['item']) for violation in violations],
+                         [('auctions', [5])])
+
+    def test_reports_dutch_auction_without_details(self):
+        self._create_state(self.score)
+        self.set_msg(self.test_account2)
+        self.score.create_dutch_auction(6, 3000, 1000, 24)
+        self.score._dutch_auction_start_time(6).remove()
+
+        violations = self._check()['violations']
+
+        self.assertEqual([(violation['invariant'], violation['item']) for violation in violations],
+                         [('dutch_auctions', [6])])
+
+    def test_reports_floor_heap_mismatch(self):
+        self._create_state(self.score)
+        position = self.score._floor_heap_position(4).get()
+        self.score._floor_heap_position(4).remove()
+
+        violations = self._check()['violations']
+
+        self.assertEqual(sorted((violation['invariant'], violation['item']) for violation in violations),
+                         [('floor_heap', [4]), ('floor_heap_pairs', [position, 4])])
+
+    def test_reports_listing_without_sequence(self):
+        self._create_state(self.score)
+        self.score._token_listing_sequence(2).remove()
+
+        violations = self._check()['violations']
+
+        self.assertEqual(sorted((violation['invariant'], violation['item']) for violation in violations),
+                         [('listing_sequence_pairs', [3, 2]), ('listing_sequences', [2])])
+
+    def test_reports_broken_offer_link(self):
+        self._create_state(self.score)
+        self.score._offer_head(6).remove()
+
+        violations = self._check()['violations']
+
+        self.assertEqual(violations, [{"invariant": "offer_links", "item": [6, "", f"hx{'3' * 40}"],
+                                       "found_in": "previous offer of OFFER_{id}_{bidder} and OFFER_{id}_TAIL",
+                                       "missing_in": "next offer of OFFER_{id}_{bidder} and OFFER_{id}_HEAD",
+                                       "count": 1}])
+
+    def test_reports_offer_count_mismatch(self):
+        self._create_state(self.score)
+        self.score._offer_count(1).set(2)
+
+        violations = self._check()['violations']
+
+        self.assertEqual([(violation['invariant'], violation['item'], violation['count']) for violation in violations],
+                         [('offer_count', [1], 1)])
+
+    def test_reports_collection_offer_outside_heap(self):
+        self._create_state(self.score)
+        self.score._collection_offer_heap_size.set(2)
+        self.score._collection_offer_heap_offer(3).remove()
+
+        violations = self._check()['violations']
+
+        self.assertEqual(sorted((violation['invariant'], violation['item']) for violation in violations),
+                         [('collection_offer_heap_pairs', [3, 3])])
+
+    def test_checks_storage_dump_file(self):
+        self._create_state(self.score)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'storage.jsonl.gz')
+            count = write_storage_dump(path, dump_score_storage(self.score))
+
+            self.assertEqual(len(list(read_storage_dump(path))), count)
+            self.assertTrue(check_storage_dump(path, 'NebulaPlanetToken')['valid'])
@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 from ..nebula_spaceship_token import NebulaSpaceshipToken
 from tbears.libs.scoretest.score_test_case import ScoreTestCase
 from iconservice import *
@@ -943,4 +945,1365 @@ class TestNebulaSpaceshipToken(ScoreTestCase):
 
         self.assertEqual(result, address)
 
+    def test_gets_owners_of_tokens(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.mint(self.test_account2, 12, "12.json")
+        self.score.mint(self.test_account1, 13, "13.json")
+        self.score.burn(13)
+
+        result = self.score.owners_of([11, 12, 13, 14])
+
+        self.assertEqual(result, {
+            "11": self.test_account1,
+            "12": self.test_account2,
+            "13": None,
+            "14": None
+        })
+
+    def test_gets_token_URIs(self):
+        self.set_msg(self.test_account1)
+        self.score.set_metadata_base_URL("https://example.com/")
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.mint(self.test_account2, 12, "12.json")
+
+        result = self.score.token_URIs([11, 12, 13])
+
+        self.assertEqual(result, {
+            "11": "https://example.com/11.json",
+            "12": "https://example.com/12.json",
+            "13": None
+        })
+
+    def test_gets_token_details(self):
+        self.set_msg(self.test_account1)
+        self.score.set_metadata_base_URL("https://example.com/")
+        self.score.mint(self.test_account2, 11, "11.json")
+
+        result = self.score.token_details([11, 12])
+
+        self.assertEqual(result, {
+            "11": {"owner": self.test_account2, "token_URI": "https://example.com/11.json"},
+            "12": {"owner": None, "token_URI": None}
+        })
+
+    def test_throws_when_querying_too_many_tokens(self):
+        with self.assertRaises(IconScoreException) as e:
+            self.score.owners_of(list(range(1, 102)))
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Can not query more than 100 tokens at once")
+
+    def test_mint_skips_token_URI_that_matches_template(self):
+        self.set_msg(self.test_account1)
+        self.score.set_metadata_base_URL("https://example.com/")
+        self.score.set_token_URI_template("{id}.json")
+        self.score.mint(self.test_account1, 11, "11.json")
+
+        self.assertEqual(self.score._token_URIs[11], "")
+        self.assertEqual(self.score.tokenURI(11), "https://example.com/11.json")
+
+    def test_mint_stores_token_URI_that_differs_from_template(self):
+        self.set_msg(self.test_account1)
+        self.score.set_metadata_base_URL("https://example.com/")
+        self.score.set_token_URI_template("{id}.json")
+        self.score.mint(self.test_account1, 11, "special.json")
+        self.score.mint(self.test_account1, 12, "")
+
+        self.assertEqual(self.score.tokenURI(11), "https://example.com/special.json")
+        self.assertEqual(self.score.tokenURI(12), "https://example.com/12.json")
+        self.assertEqual(self.score.token_URIs([11, 12]), {
+            "11": "https://example.com/special.json",
+            "12": "https://example.com/12.json"
+        })
+
+    def test_set_token_URI_to_template_value_removes_override(self):
+        self.set_msg(self.test_account1)
+        self.score.set_token_URI_template("{id}.json")
+        self.score.mint(self.test_account1, 11, "special.json")
+        self.score.set_token_URI(11, "11.json")
+
+        self.assertEqual(self.score._token_URIs[11], "")
+        self.assertEqual(self.score.tokenURI(11), "11.json")
+
+    def test_token_URI_throws_for_burned_token_with_template(self):
+        self.set_msg(self.test_account1)
+        self.score.set_token_URI_template("{id}.json")
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.burn(11)
+
+        with self.assertRaises(IconScoreException) as e:
+            self.score.tokenURI(11)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "NFT with given _tokenId does not have metadata")
+
+    def test_throws_when_setting_token_URI_template_without_correct_role(self):
+        self.set_msg(self.test_account2)
+        with self.assertRaises(IconScoreException) as e:
+            self.score.set_token_URI_template("{id}.json")
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "You do not have permission set token URI template")
+
+    def test_burn_removes_token_owner_entry(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.burn(11)
+
+        self.assertFalse(11 in self.score._token_owner)
+        self.assertTrue(self.score._is_token_burned(11))
+
+    def test_throws_when_minting_burned_token(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.burn(11)
+
+        with self.assertRaises(IconScoreException) as e:
+            self.score.mint(self.test_account1, 11, "11.json")
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Token already exists")
+
+    def test_throws_when_minting_burned_token_minted_before_bitmap(self):
+        self.set_msg(self.test_account1)
+        self.score._add_tokens_to(self.test_account1, 11)
+        self.score._create_new_token_index(11)
+        self.score.burn(11)
+
+        with self.assertRaises(IconScoreException) as e:
+            self.score.mint(self.test_account1, 11, "11.json")
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Token already exists")
+
+    def test_owner_of_throws_when_token_is_not_minted(self):
+        with self.assertRaises(IconScoreException) as e:
+            self.score.ownerOf(11)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Invalid _tokenId. NFT is not minted")
+
+    def test_exists_batch(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.mint(self.test_account1, 300, "300.json")
+        self.score.mint(self.test_account1, 12, "12.json")
+        self.score.burn(12)
+
+        result = self.score.exists_batch([11, 12, 13, 300])
+
+        self.assertEqual(result, {"11": True, "12": False, "13": False, "300": True})
+
+    def test_exists_batch_recognizes_tokens_without_minted_bit(self):
+        self.score._token_owner[11] = self.test_account1
+        self.score._token_owner[12] = self.score._ZERO_ADDRESS
+
+        result = self.score.exists_batch([11, 12])
+
+        self.assertEqual(result, {"11": True, "12": False})
+
+    def test_purchase_token_emits_price(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "1.json")
+        token_price = 5000000000000000000
+        self.score.list_token(11, token_price)
+
+        with patch.object(self.score, 'PurchaseTokenWithPrice') as purchase_event:
+            self.set_msg(self.test_account2, token_price)
+            self.score.purchase_token(11)
+
+        purchase_event.assert_called_once_with(self.test_account1, self.test_account2, 11, token_price)
+
+    def test_auction_emits_created_and_bid_events(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "1.json")
+        start_time = self.score.now()
+        end_time = start_time + 24 * 3600 * 1000 * 1000
+        with patch.object(self.score, 'AuctionCreated') as created_event:
+            self.score.create_auction(11, 300000000000000000, 24)
+
+        with patch.object(self.score, 'BidPlaced') as bid_event:
+            self.set_msg(self.test_account2, 300000000000000000)
+            self.score.place_bid(11)
+
+        created_event.assert_called_once_with(self.test_account1, 11, 300000000000000000, start_time, end_time)
+        bid_event.assert_called_once_with(self.test_account2, 11, 300000000000000000, end_time)
+
+    def test_last_minute_bid_emits_extended_end_time(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "1.json")
+        self.score.create_auction(11, 300000000000000000, 1)
+        end_time = self.score._auction_item_end_time(11).get()
+
+        self.set_block(1, end_time - 1000 * 1000 * 30)
+        with patch.object(self.score, 'BidPlaced') as bid_event:
+            self.set_msg(self.test_account2, 300000000000000000)
+            self.score.place_bid(11)
+
+        bid_event.assert_called_once_with(self.test_account2, 11, 300000000000000000, end_time + 1000 * 1000 * 120)
+
+    def test_finalize_auction_emits_event(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "1.json")
+        self.score.create_auction(11, 300000000000000000, 1)
+        self.set_msg(self.test_account2, 500000000000000000)
+        self.score.place_bid(11)
+
+        self.set_block(1, self.score._auction_item_end_time(11).get() + 1)
+        with patch.object(self.score, 'AuctionFinalized') as finalized_event:
+            self.score.finalize_auction(11)
+
+        finalized_event.assert_called_once_with(self.test_account1, self.test_account2, 11, 500000000000000000)
+        self.assertEqual(self.score.ownerOf(11), self.test_account2)
+
+    def test_cancel_auction_emits_event(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "1.json")
+        self.score.create_auction(11, 300000000000000000, 24)
+
+        with patch.object(self.score, 'AuctionCancelled') as cancelled_event:
+            self.score.cancel_auction(11)
+
+        cancelled_event.assert_called_once_with(self.test_account1, 11)
+
+    def test_return_unsold_item_emits_event(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "1.json")
+        self.score.create_auction(11, 300000000000000000, 1)
+
+        self.set_block(1, self.score._auction_item_end_time(11).get() + 1)
+        with patch.object(self.score, 'AuctionUnsold') as unsold_event:
+            self.score.return_unsold_item(11)
+
+        unsold_event.assert_called_once_with(self.test_account1, 11)
+
+    def test_import_tokens(self):
+        self.set_msg(self.test_account1)
+        self.score.pause_contract()
+
+        self.score.import_tokens(self.test_account2, [12, 11], ["12.json", "11.json"])
+
+        self.assertEqual(self.score.owned_tokens(self.test_account2), [12, 11])
+        self.assertEqual(self.score.tokenByIndex(1), 12)
+        self.assertEqual(self.score.totalSupply(), 2)
+        self.assertEqual(self.score.tokenURI(11), "11.json")
+
+    def test_import_listings_and_auction(self):
+        self.set_msg(self.test_account1)
+        self.score.pause_contract()
+        self.score.import_tokens(self.test_account2, [11, 12], ["11.json", "12.json"])
+
+        self.score.import_listings(self.test_account2, [12, 11], [-1, 1000])
+        self.score.import_auction(12, 500, 10, 20, 600, self.test_account1)
+
+        self.assertEqual(self.score.listed_tokens_by_owner(self.test_account2), {"12": -1, "11": 1000})
+        self.assertEqual(self.score.get_listed_token_of_owner_by_index(self.test_account2, 1), 12)
+        auction = self.score.get_auction_info(12)
+        self.assertEqual(auction['seller'], self.test_account2)
+        self.assertEqual(auction['current_bid'], 600)
+        self.assertEqual(auction['highest_bidder'], self.test_account1)
+
+    def test_import_sale_records(self):
+        self.set_msg(self.test_account1)
+        self.score.pause_contract()
+
+        self.score.import_sale_records([11, 12], ["sale_success", "auction_unsold"],
+                                       [self.test_account1, self.test_account2],
+                                       [self.test_account2, self.score._ZERO_ADDRESS],
+                                       [100, 200], [100, 0], [0, 5], [10, 15])
+
+        self.assertEqual(self.score.sale_record_count(), 2)
+        self.assertEqual(self.score.get_sale_record(1)['buyer'], self.test_account2)
+        self.assertEqual(self.score.get_sale_record(2)['buyer'], None)
+        self.assertEqual(self.score.get_sale_record(2)['start_time'], 5)
+
+    def test_import_throws_when_contract_is_not_paused(self):
+        with self.assertRaises(IconScoreException) as e:
+            self.set_msg(self.test_account1)
+            self.score.import_tokens(self.test_account2, [11], ["11.json"])
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Contract needs to be paused during snapshot import")
+
+    def test_import_throws_when_sender_is_not_director(self):
+        self.set_msg(self.test_account1)
+        self.score.pause_contract()
+
+        with self.assertRaises(IconScoreException) as e:
+            self.set_msg(self.test_account2)
+            self.score.import_tokens(self.test_account2, [11], ["11.json"])
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "You are not allowed to import snapshots")
+
+    def test_import_throws_when_token_exists(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.pause_contract()
+
+        with self.assertRaises(IconScoreException) as e:
+            self.score.import_tokens(self.test_account2, [11], ["11.json"])
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Token already exists")
+
+    def test_import_throws_when_lists_have_different_length(self):
+        self.set_msg(self.test_account1)
+        self.score.pause_contract()
+
+        with self.assertRaises(IconScoreException) as e:
+            self.score.import_tokens(self.test_account2, [11, 12], ["11.json"])
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Imported lists need to have equal length")
+
+    def test_import_throws_after_import_is_closed(self):
+        self.set_msg(self.test_account1)
+        self.score.pause_contract()
+        self.score.close_snapshot_import()
+
+        with self.assertRaises(IconScoreException) as e:
+            self.score.import_tokens(self.test_account2, [11], ["11.json"])
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Snapshot import is closed")
+
+    def test_import_throws_after_contract_update(self):
+        self.score = self.update_score(self.score.address, NebulaSpaceshipToken)
+        self.set_msg(self.test_account1)
+        self.score.pause_contract()
+
+        with self.assertRaises(IconScoreException) as e:
+            self.score.import_tokens(self.test_account2, [11], ["11.json"])
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Snapshot import is closed")
+
+    def test_marketplace_overview(self):
+        self.set_msg(self.test_account1)
+        self.score.set_seller_fee(2500)
+        for token_id in range(11, 16):
+            self.score.mint(self.test_account1, token_id, f"{token_id}.json")
+        self.score.list_token(11, 3000)
+        self.score.list_token(12, 1000)
+        self.score.list_token(13, 2000)
+        self.score.create_auction(14, 500, 24)
+        self.score.cancel_auction(14)
+
+        self.set_msg(self.test_account2, 1000)
+        self.score.purchase_token(12)
+
+        result = self.score.marketplace_overview(5)
+
+        self.assertEqual(result['total_supply'], 5)
+        self.assertEqual(result['listed_token_count'], 2)
+        self.assertEqual(result['seller_fee'], 2500)
+        self.assertEqual(result['floor_price'], 2000)
+        self.assertEqual(result['market_cap'], 10000)
+        self.assertEqual(result['sale_record_count'], 2)
+        self.assertEqual(result['sale_counts']['sale_success'], 1)
+        self.assertEqual(result['sale_counts']['auction_cancelled'], 1)
+        self.assertEqual(result['sale_counts']['auction_success'], 0)
+        self.assertEqual(result['sale_volumes']['sale_success'], 1000)
+        self.assertEqual(result['sale_volumes']['auction_cancelled'], 0)
+        self.assertEqual([record['record_id'] for record in result['recent_sales']], [2, 1])
+        self.assertEqual(result['recent_sales'][0]['type'], 'sale_success')
+
+    def test_marketplace_overview_returns_requested_number_of_recent_sales(self):
+        self.set_msg(self.test_account1)
+        for token_id in range(11, 14):
+            self.score.mint(self.test_account1, token_id, f"{token_id}.json")
+            self.score.create_auction(token_id, 500, 24)
+            self.score.cancel_auction(token_id)
+
+        self.assertEqual([record['token_id'] for record in self.score.marketplace_overview(2)['recent_sales']],
+                         [13, 12])
+        self.assertEqual(self.score.marketplace_overview(0)['recent_sales'], [])
+
+    def test_marketplace_overview_throws_when_too_many_recent_sales_are_requested(self):
+        with self.assertRaises(IconScoreException) as e:
+            self.score.marketplace_overview(101)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Number of recent sales needs to be between 0 and 100")
+
+    def test_floor_price_follows_listings(self):
+        self.set_msg(self.test_account1)
+        prices = [70, 20, 50, 10, 90, 30, 60, 40, 80]
+        for token_id, price in enumerate(prices, 1):
+            self.score.mint(self.test_account1, token_id, f"{token_id}.json")
+            self.score.list_token(token_id, price)
+        self.assertEqual(self.score.marketplace_overview(0)['floor_price'], 10)
+
+        listed = dict(enumerate(prices, 1))
+        for token_id in [4, 1, 2, 6, 9, 3]:
+            self.score.delist_token(token_id)
+            del listed[token_id]
+            self.assertEqual(self.score.marketplace_overview(0)['floor_price'], min(listed.values()))
+
+        for token_id in listed:
+            self.score.delist_token(token_id)
+        self.assertEqual(self.score.marketplace_overview(0)['floor_price'], 0)
+        self.assertEqual(self.score._floor_heap_size.get(), 0)
+
+    def test_sale_stats(self):
+        self.set_msg(self.test_account1)
+        for token_id in range(11, 14):
+            self.score.mint(self.test_account1, token_id, f"{token_id}.json")
+        self.score.list_token(11, 1000)
+        self.score.list_token(12, 4000)
+        self.score.create_auction(13, 500, 24)
+        self.score.cancel_auction(13)
+
+        self.set_msg(self.test_account2, 1000)
+        self.score.purchase_token(11)
+        self.set_msg(self.test_account2, 4000)
+        self.score.purchase_token(12)
+
+        result = self.score.sale_stats()
+
+        self.assertEqual(result['total_volume'], 5000)
+        self.assertEqual(result['sale_count'], 2)
+        self.assertEqual(result['average_price'], 2500)
+        self.assertEqual(result['max_price'], 4000)
+
+    def test_sale_stats_without_sales(self):
+        result = self.score.sale_stats()
+
+        self.assertEqual(result['total_volume'], 0)
+        self.assertEqual(result['sale_count'], 0)
+        self.assertEqual(result['average_price'], 0)
+        self.assertEqual(result['max_price'], 0)
+
+    def test_daily_volume(self):
+        day = 24 * 3600 * 1000 * 1000
+        self.set_msg(self.test_account1)
+        for token_id in range(11, 14):
+            self.score.mint(self.test_account1, token_id, f"{token_id}.json")
+            self.score.list_token(token_id, token_id * 100)
+
+        self.set_block(1, 18000 * day + 10)
+        self.set_msg(self.test_account2, 1100)
+        self.score.purchase_token(11)
+        self.set_msg(self.test_account2, 1200)
+        self.score.purchase_token(12)
+        self.set_block(2, 18002 * day + 10)
+        self.set_msg(self.test_account2, 1300)
+        self.score.purchase_token(13)
+
+        result = self.score.daily_volume(17999, 18002)
+
+        self.assertEqual(result, [
+            {"day": 17999, "volume": 0, "sale_count": 0},
+            {"day": 18000, "volume": 2300, "sale_count": 2},
+            {"day": 18001, "volume": 0, "sale_count": 0},
+            {"day": 18002, "volume": 1300, "sale_count": 1},
+        ])
+
+    def test_daily_volume_throws_when_range_is_invalid(self):
+        with self.assertRaises(IconScoreException) as e:
+            self.score.daily_volume(10, 9)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Invalid day range")
+
+        with self.assertRaises(IconScoreException) as e:
+            self.score.daily_volume(10, 110)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Can not request more than 100 days at once")
+
+    def test_token_sale_history(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.mint(self.test_account1, 12, "12.json")
+        self.score.create_auction(11, 500, 24)
+        self.score.cancel_auction(11)
+        self.score.list_token(12, 1000)
+        self.score.list_token(11, 2000)
+
+        self.set_msg(self.test_account2, 1000)
+        self.score.purchase_token(12)
+        self.set_msg(self.test_account2, 2000)
+        self.score.purchase_token(11)
+
+        history = self.score.token_sale_history(11)
+
+        self.assertEqual(self.score.token_sale_record_count(11), 2)
+        self.assertEqual([record['record_id'] for record in history], [1, 3])
+        self.assertEqual([record['type'] for record in history], ['auction_cancelled', 'sale_success'])
+        self.assertEqual(history[1]['buyer'], self.test_account2)
+        self.assertEqual(self.score.token_sale_history(11, 1, 1)[0]['record_id'], 3)
+        self.assertEqual(self.score.token_sale_history(11, 2, 10), [])
+        self.assertEqual(self.score.token_sale_history(13), [])
+
+    def test_token_sale_history_throws_when_limit_is_invalid(self):
+        with self.assertRaises(IconScoreException) as e:
+            self.score.token_sale_history(11, 0, 101)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Limit needs to be between 1 and 100")
+
+        with self.assertRaises(IconScoreException) as e:
+            self.score.token_sale_history(11, -1, 10)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Offset can not be negative")
+
+    def test_sales_by_seller_and_purchases_by_buyer(self):
+        self.set_msg(self.test_account1)
+        for token_id in range(11, 14):
+            self.score.mint(self.test_account1, token_id, f"{token_id}.json")
+        self.score.create_auction(11, 500, 24)
+        self.score.cancel_auction(11)
+        self.score.list_token(12, 1000)
+        self.score.list_token(13, 2000)
+
+        self.set_msg(self.test_account2, 1000)
+        self.score.purchase_token(12)
+        self.set_msg(self.test_account2, 2000)
+        self.score.purchase_token(13)
+        self.set_msg(self.test_account2)
+        self.score.list_token(12, 3000)
+        self.set_msg(self.test_account1, 3000)
+        self.score.purchase_token(12)
+
+        sales = self.score.sales_by_seller(self.test_account1)
+        purchases = self.score.purchases_by_buyer(self.test_account2)
+
+        self.assertEqual(self.score.seller_sale_record_count(self.test_account1), 3)
+        self.assertEqual([record['record_id'] for record in sales], [1, 2, 3])
+        self.assertEqual(self.score.buyer_sale_record_count(self.test_account2), 2)
+        self.assertEqual([record['token_id'] for record in purchases], [12, 13])
+        self.assertEqual([record['record_id'] for record in self.score.sales_by_seller(self.test_account2)], [4])
+        self.assertEqual([record['record_id'] for record in self.score.purchases_by_buyer(self.test_account1)], [4])
+        self.assertEqual([record['record_id'] for record in self.score.sales_by_seller(self.test_account1, 1, 1)],
+                         [2])
+
+    def test_sales_by_seller_throws_when_limit_is_invalid(self):
+        with self.assertRaises(IconScoreException) as e:
+            self.score.sales_by_seller(self.test_account1, 0, 0)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Limit needs to be between 1 and 100")
+
+    def test_sale_records_are_archived_when_capacity_is_reached(self):
+        self.set_msg(self.test_account1)
+        self.score.set_sale_record_capacity(2)
+        for token_id in range(11, 14):
+            self.score.mint(self.test_account1, token_id, f"{token_id}.json")
+        self.score.list_token(11, 1000)
+        self.score.create_auction(12, 500, 24)
+        self.score.cancel_auction(12)
+        self.score.create_auction(13, 700, 24)
+
+        self.set_msg(self.test_account2, 1000)
+        self.score.purchase_token(11)
+        self.set_msg(self.test_account1)
+        with patch.object(self.score, 'SaleRecordArchived') as archived_event:
+            self.score.cancel_auction(13)
+
+        archived_event.assert_called_once_with(1, 12, 'auction_cancelled', self.test_account1,
+                                               self.score._ZERO_ADDRESS, 500, 0, self.score.now(), self.score.now())
+        self.assertEqual(self.score.sale_record_count(), 3)
+        self.assertEqual(self.score._record_token_id(1).get(), 13)
+        self.assertEqual(self.score.get_sale_record(3)['token_id'], 13)
+        self.assertEqual(self.score.get_sale_record(3)['buyer'], None)
+        self.assertEqual(self.score.get_sale_record(2)['buyer'], self.test_account2)
+        self.assertEqual(self.score.token_sale_history(12), [])
+        self.assertEqual([record['record_id'] for record in self.score.marketplace_overview()['recent_sales']],
+                         [3, 2])
+
+    def test_archived_sale_records_are_removed_from_indexes(self):
+        self.set_msg(self.test_account1)
+        self.score.set_sale_record_capacity(2)
+        self.score.mint(self.test_account1, 11, "11.json")
+        day = self.score.now() // self.score._DAY_IN_MICROSECONDS
+        for seller, buyer, price in ((self.test_account1, self.test_account2, 1000),
+                                     (self.test_account2, self.test_account1, 2000),
+                                     (self.test_account1, self.test_account2, 3000),
+                                     (self.test_account2, self.test_account1, 4000)):
+            self.set_msg(seller)
+            self.score.list_token(11, price)
+            self.set_msg(buyer, price)
+            self.score.purchase_token(11)
+
+        self.assertEqual([record['record_id'] for record in self.score.token_sale_history(11)], [3, 4])
+        self.assertEqual(self.score.token_sale_record_count(11), 2)
+        self.assertEqual([record['record_id'] for record in self.score.sales_by_seller(self.test_account1)], [3])
+        self.assertEqual([record['final_price'] for record in self.score.purchases_by_buyer(self.test_account1)],
+                         [4000])
+        self.assertEqual(self.score.seller_sale_record_count(self.test_account2), 1)
+        self.assertEqual(self.score.buyer_sale_record_count(self.test_account2), 1)
+        self.assertEqual(self.score.daily_volume(day, day), [{"day": day, "volume": 10000, "sale_count": 4}])
+        self.assertEqual(self.score.sale_stats()['sale_count'], 4)
+        self.assertEqual(self.score.sale_stats()['total_volume'], 10000)
+        for index in range(1, 3):
+            self.assertEqual(self.score._token_sale_record(11, index).get(), 0)
+
+    def test_slot_reuse_clears_values_of_archived_record(self):
+        self.set_msg(self.test_account1)
+        self.score.set_sale_record_capacity(1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.list_token(11, 1000)
+        self.set_msg(self.test_account2, 1000)
+        self.score.purchase_token(11)
+
+        self.set_msg(self.test_account2)
+        self.score.create_auction(11, 500, 24)
+        self.score.cancel_auction(11)
+
+        record = self.score.get_sale_record(2)
+        self.assertEqual(record['type'], 'auction_cancelled')
+        self.assertEqual(record['buyer'], None)
+        self.assertEqual(record['final_price'], 0)
+
+    def test_get_sale_record_throws_when_record_is_archived(self):
+        self.set_msg(self.test_account1)
+        self.score.set_sale_record_capacity(1)
+        for token_id in range(11, 13):
+            self.score.mint(self.test_account1, token_id, f"{token_id}.json")
+            self.score.create_auction(token_id, 500, 24)
+            self.score.cancel_auction(token_id)
+
+        with self.assertRaises(IconScoreException) as e:
+            self.score.get_sale_record(1)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Sale record 1 has been archived")
+
+    def test_throws_when_changing_sale_record_capacity_after_archiving(self):
+        self.set_msg(self.test_account1)
+        self.score.set_sale_record_capacity(1)
+        for token_id in range(11, 13):
+            self.score.mint(self.test_account1, token_id, f"{token_id}.json")
+            self.score.create_auction(token_id, 500, 24)
+            self.score.cancel_auction(token_id)
+
+        with self.assertRaises(IconScoreException) as e:
+            self.score.set_sale_record_capacity(10)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Sale record capacity can not be changed after records have been archived")
+
+    def test_throws_when_sale_record_capacity_is_lower_than_record_count(self):
+        self.set_msg(self.test_account1)
+        for token_id in range(11, 13):
+            self.score.mint(self.test_account1, token_id, f"{token_id}.json")
+            self.score.create_auction(token_id, 500, 24)
+            self.score.cancel_auction(token_id)
+
+        with self.assertRaises(IconScoreException) as e:
+            self.score.set_sale_record_capacity(1)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Sale record capacity can not be lower than number of sale records")
+
+    def test_throws_when_setting_sale_record_capacity_without_permission(self):
+        self.set_msg(self.test_account2)
+        with self.assertRaises(IconScoreException) as e:
+            self.score.set_sale_record_capacity(10)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "You do not have permission set sale record capacity")
+
+    def _create_legacy_state(self):
+        # Writes tokens, listings and a sale record the way contracts deployed before storage versioning did
+        self.score._storage_version.remove()
+        for token_id in range(11, 14):
+            self.score._add_tokens_to(self.test_account1, token_id)
+            self.score._create_new_token_index(token_id)
+        for token_id, price in ((12, 2000), (13, 1000)):
+            self.score._increment_listed_token_count()
+            self.score._set_listed_token_index(self.score._total_listed_token_count.get(), token_id)
+            self.score._listed_token_prices[str(token_id)] = price
+            self.score._owner_listed_token_count[self.test_account1] += 1
+            owner_index = self.score._owner_listed_token_count[self.test_account1]
+            self.score._owner_listed_token_index(self.test_account1, owner_index).set(str(token_id))
+        self.score._sale_record_count.set(1)
+        self.score._record_token_id(1).set(11)
+        self.score._record_type(1).set('sale_success')
+        self.score._record_seller(1).set(self.test_account2)
+        self.score._record_buyer(1).set(self.test_account1)
+        self.score._record_final_price(1).set(500)
+        self.score._record_end_time(1).set(self.score.now())
+        self.score = self.update_score(self.score.address, NebulaSpaceshipToken)
+
+    def test_new_contract_storage_is_migrated(self):
+        status = self.score.migration_status()
+
+        self.assertEqual(status['storage_version'], status['latest_version'])
+
+    def test_migrates_legacy_storage_in_chunks(self):
+        self._create_legacy_state()
+        self.set_msg(self.test_account1)
+        self.score.pause_contract()
+
+        with patch.object(self.score, 'StorageMigrated') as migrated_event:
+            self.score.run_migration(2)
+        self.assertEqual(self.score.migration_status(), {"storage_version": 0, "latest_version": 4,
+                                                         "processed_items": 2})
+        migrated_event.assert_not_called()
+        self.assertEqual(self.score.exists_batch([11, 12, 13]), {"11": True, "12": True, "13": True})
+        self.assertEqual(self.score._is_bitmap_bit_set(self.score._minted_tokens, 13), False)
+
+        with patch.object(self.score, 'StorageMigrated') as migrated_event:
+            self.score.run_migration(100)
+        self.assertEqual(self.score.migration_status(), {"storage_version": 4, "latest_version": 4,
+                                                         "processed_items": 0})
+        self.assertEqual([call[0][0] for call in migrated_event.call_args_list], [1, 2, 3, 4])
+        self.assertEqual(self.score._is_bitmap_bit_set(self.score._minted_tokens, 13), True)
+        self.assertEqual(self.score.marketplace_overview(0)['floor_price'], 1000)
+        self.assertEqual([record['record_id'] for record in self.score.token_sale_history(11)], [1])
+        self.assertEqual([record['record_id'] for record in self.score.purchases_by_buyer(self.test_account1)], [1])
+        self.assertEqual(self.score.sale_stats()['total_volume'], 500)
+        self.assertEqual(self.score.listed_tokens_by_cursor()['tokens'], {"12": 2000, "13": 1000})
+
+    def test_migration_skips_sale_records_created_after_update(self):
+        self._create_legacy_state()
+        self.set_msg(self.test_account1)
+        self.score.set_sale_record_capacity(1)
+        self.score.list_token(11, 700)
+        self.set_msg(self.test_account2, 700)
+        self.score.purchase_token(11)
+
+        self.set_msg(self.test_account1)
+        self.score.pause_contract()
+        self.score.run_migration(100)
+
+        self.assertEqual(self.score.token_sale_history(11)[0]['record_id'], 2)
+        self.assertEqual(self.score.token_sale_record_count(11), 1)
+        self.assertEqual(self.score.purchases_by_buyer(self.test_account1), [])
+        self.assertEqual(self.score.sale_stats()['sale_count'], 1)
+        self.assertEqual(self.score.sale_stats()['total_volume'], 700)
+
+    def test_migration_covers_listing_moved_by_delisting(self):
+        self._create_legacy_state()
+        self.set_msg(self.test_account1)
+        self.score.pause_contract()
+        self.score.run_migration(4)
+        self.score.delist_token(12)
+        self.score.run_migration(100)
+
+        self.assertEqual(self.score.marketplace_overview(0)['floor_price'], 1000)
+        self.assertEqual(self.score.listed_tokens_by_cursor()['tokens'], {"13": 1000})
+
+    def test_migration_skips_tokens_burned_after_update(self):
+        self._create_legacy_state()
+        self.set_msg(self.test_account1)
+        self.score.pause_contract()
+        self.score.burn(11)
+        self.score.run_migration(100)
+
+        self.assertEqual(self.score.exists_batch([0, 11, 12, 13]), {"0": False, "11": False, "12": True, "13": True})
+        self.assertEqual(self.score._is_bitmap_bit_set(self.score._minted_tokens, 0), False)
+        self.assertEqual(self.score._is_bitmap_bit_set(self.score._minted_tokens, 13), True)
+        self.assertEqual(self.score.totalSupply(), 2)
+        self.assertEqual(self.score._token_index(3).get(), 0)
+
+        self.score.unpause_contract()
+        self.score.mint(self.test_account1, 0, "0.json")
+        self.assertEqual(self.score.ownerOf(0), self.test_account1)
+
+    def test_migration_skips_last_listing_delisted_after_update(self):
+        self._create_legacy_state()
+        self.set_msg(self.test_account1)
+        self.score.pause_contract()
+        self.score.delist_token(13)
+        self.score.run_migration(100)
+
+        self.assertEqual(self.score.marketplace_overview(0)['floor_price'], 2000)
+        self.assertEqual(self.score.listed_tokens_by_cursor()['tokens'], {"12": 2000})
+        self.assertEqual(self.score._token_listing_sequence(13).get(), 0)
+        self.assertEqual(self.score._listed_token_index(2).get(), 0)
+
+    def test_throws_when_storage_is_already_migrated(self):
+        self.set_msg(self.test_account1)
+        self.score.pause_contract()
+        with self.assertRaises(IconScoreException) as e:
+            self.score.run_migration(10)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Storage is already migrated")
+
+    def test_throws_when_running_migration_on_unpaused_contract(self):
+        self._create_legacy_state()
+        self.set_msg(self.test_account1)
+        with self.assertRaises(IconScoreException) as e:
+            self.score.run_migration(10)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Contract needs to be paused during migration")
+
+    def test_throws_when_running_migration_without_permission(self):
+        self.set_msg(self.test_account2)
+        with self.assertRaises(IconScoreException) as e:
+            self.score.run_migration(10)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "You are not allowed to run migration")
+
+    def test_listed_tokens_by_cursor_returns_every_listing_once_under_churn(self):
+        self.set_msg(self.test_account1)
+        for token_id in range(11, 16):
+            self.score.mint(self.test_account1, token_id, f"{token_id}.json")
+            self.score.list_token(token_id, token_id * 100)
+
+        first_page = self.score.listed_tokens_by_cursor(0, 2)
+        self.score.delist_token(11)
+        self.score.delist_token(13)
+        self.score.mint(self.test_account1, 16, "16.json")
+        self.score.create_auction(16, 500, 24)
+        second_page = self.score.listed_tokens_by_cursor(first_page['next_cursor'], 100)
+
+        self.assertEqual(first_page, {"tokens": {"11": 1100, "12": 1200}, "next_cursor": 2, "has_more": True})
+        self.assertEqual(second_page, {"tokens": {"14": 1400, "15": 1500, "16": -1}, "next_cursor": 6,
+                                       "has_more": False})
+        self.assertEqual(self.score.listed_tokens_by_cursor(6)["tokens"], {})
+
+    def test_listed_tokens_by_cursor_throws_when_limit_is_invalid(self):
+        with self.assertRaises(IconScoreException) as e:
+            self.score.listed_tokens_by_cursor(0, 101)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Limit needs to be between 1 and 100")
+
+    def test_listings_of_owner_returns_price_and_type(self):
+        self.set_msg(self.test_account1)
+        for token_id in range(11, 15):
+            self.score.mint(self.test_account1, token_id, f"{token_id}.json")
+        self.score.list_token(11, 1000)
+        self.score.create_auction(12, 500, 24)
+        self.score.list_token(13, 3000)
+        self.score.list_token(14, 4000)
+        self.score.delist_token(11)
+
+        first_page = self.score.listings_of_owner(self.test_account1, 0, 2)
+        second_page = self.score.listings_of_owner(self.test_account1, first_page['next_cursor'], 2)
+
+        self.assertEqual(first_page, {"listings": [{"token_id": 14, "price": 4000, "type": 'fixed'},
+                                                   {"token_id": 12, "price": -1, "type": 'auction'}],
+                                      "next_cursor": 2, "has_more": True})
+        self.assertEqual(second_page, {"listings": [{"token_id": 13, "price": 3000, "type": 'fixed'}],
+                                       "next_cursor": 3, "has_more": False})
+        self.assertEqual(self.score.listed_tokens_by_owner(self.test_account1, 1), {"12": -1, "13": 3000})
+
+    def test_listings_of_owner_reads_listings_without_stored_price(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.list_token(11, 1000)
+        self.score._owner_listed_token_index(self.test_account1, 1).set('11')
+
+        self.assertEqual(self.score.listings_of_owner(self.test_account1)['listings'],
+                         [{"token_id": 11, "price": 1000, "type": 'fixed'}])
+        self.assertEqual(self.score.get_listed_token_of_owner_by_index(self.test_account1, 1), 11)
+
+    def test_listings_of_owner_throws_when_cursor_is_negative(self):
+        with self.assertRaises(IconScoreException) as e:
+            self.score.listings_of_owner(self.test_account1, -1)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Cursor can not be negative")
+
+    def test_get_bid_history(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.create_auction(11, 1000, 1)
+        first_bid_time = self.score.now()
+        self.set_msg(self.test_account2, 1000)
+        self.score.place_bid(11)
+        self.set_block(2, first_bid_time + 1000)
+        self.set_msg(self.test_account1, 2000)
+        self.score.place_bid(11)
+
+        self.assertEqual(self.score.get_bid_history(11), [
+            {"bidder": self.test_account2, "amount": 1000, "timestamp": first_bid_time},
+            {"bidder": self.test_account1, "amount": 2000, "timestamp": first_bid_time + 1000}
+        ])
+        self.assertEqual(self.score.get_bid_history(11, 1, 1)[0]['amount'], 2000)
+
+    def test_bid_history_keeps_most_recent_bids(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.create_auction(11, 1000, 1)
+        with patch.object(self.score, '_BID_HISTORY_SIZE', 2):
+            for amount in (1000, 2000, 3000):
+                self.set_msg(self.test_account2, amount)
+                self.score.place_bid(11)
+
+            self.assertEqual([bid['amount'] for bid in self.score.get_bid_history(11)], [2000, 3000])
+
+    def test_finalize_auction_clears_bid_history(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.create_auction(11, 1000, 1)
+        self.set_msg(self.test_account2, 1000)
+        self.score.place_bid(11)
+
+        self.set_block(1, self.score._auction_item_end_time(11).get() + 1)
+        self.score.finalize_auction(11)
+
+        self.assertEqual(self.score.get_bid_history(11), [])
+        self.assertEqual(self.score._auction_item_bid(11, 1).get(), '')
+        self.assertEqual(self.score._auction_item_bid_count(11).get(), 0)
+
+    def test_dutch_auction_price_falls_until_end_price(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        with patch.object(self.score, 'DutchAuctionCreated') as created_event:
+            self.score.create_dutch_auction(11, 3000, 1000, 1)
+        start_time = self.score.now()
+        end_time = start_time + 3600 * 1000 * 1000
+
+        created_event.assert_called_once_with(self.test_account1, 11, 3000, 1000, start_time, end_time)
+        self.assertEqual(self.score.get_token_price(11), -2)
+        self.assertEqual(self.score.listings_of_owner(self.test_account1)['listings'],
+                         [{"token_id": 11, "price": -2, "type": 'dutch_auction'}])
+        self.assertEqual(self.score.get_dutch_auction_info(11)['current_price'], 3000)
+        self.set_block(2, start_time + 1800 * 1000 * 1000)
+        self.assertEqual(self.score.get_dutch_auction_info(11)['current_price'], 2000)
+        self.set_block(3, end_time + 1)
+        self.assertEqual(self.score.get_dutch_auction_info(11)['current_price'], 1000)
+        self.assertEqual(self.score._floor_heap_size.get(), 0)
+
+    def test_purchase_dutch_auction_refunds_amount_above_current_price(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.create_dutch_auction(11, 3000, 1000, 1)
+        start_time = self.score.now()
+        self.set_block(2, start_time + 1800 * 1000 * 1000)
+
+        self.set_msg(self.test_account2, 3000)
+        with patch.object(self.score.icx, 'transfer') as icx_transfer:
+            with patch.object(self.score, 'PurchaseTokenWithPrice') as purchase_event:
+                self.score.purchase_dutch_auction(11)
+
+        icx_transfer.assert_any_call(self.test_account1, 2000)
+        icx_transfer.assert_any_call(self.test_account2, 1000)
+        purchase_event.assert_called_once_with(self.test_account1, self.test_account2, 11, 2000)
+        self.assertEqual(self.score.ownerOf(11), self.test_account2)
+        self.assertEqual(self.score.get_token_price(11), 0)
+        self.assertEqual(self.score.total_listed_token_count(), 0)
+        self.assertEqual(self.score._dutch_auction_start_price(11).get(), 0)
+        record = self.score.get_sale_record(1)
+        self.assertEqual((record['type'], record['starting_price'], record['final_price'], record['start_time']),
+                         ('dutch_auction_success', 3000, 2000, start_time))
+        self.assertEqual(self.score.sale_stats()['sale_count'], 1)
+
+    def test_purchase_dutch_auction_throws_when_amount_is_lower_than_current_price(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.create_dutch_auction(11, 3000, 1000, 1)
+
+        self.set_msg(self.test_account2, 2000)
+        with self.assertRaises(IconScoreException) as e:
+            self.score.purchase_dutch_auction(11)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Sent ICX amount (2000) is lower than current auction price (3000)")
+
+    def test_create_dutch_auction_throws_when_end_price_is_higher_than_start_price(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        with self.assertRaises(IconScoreException) as e:
+            self.score.create_dutch_auction(11, 1000, 3000, 1)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "End price can not be higher than start price")
+
+    def test_delisting_dutch_auction_removes_its_details(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.create_dutch_auction(11, 3000, 1000, 1)
+        self.score.delist_token(11)
+
+        self.assertEqual(self.score.get_token_price(11), 0)
+        self.assertEqual(self.score._dutch_auction_end_time(11).get(), 0)
+        with self.assertRaises(IconScoreException) as e:
+            self.score.get_dutch_auction_info(11)
+        self.assertEqual(e.exception.message, "Token is not on Dutch auction")
+
+    def test_throws_when_burning_token_on_batched_auction(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        with patch.object(self.score, 'BatchedAuctionCreated') as created_event:
+            self.score.create_batched_auction(11, 1000, 1)
+        created_event.assert_called_once()
+        self.set_msg(self.test_account2, 1000)
+        self.score.place_batched_bid(11)
+
+        self.set_msg(self.test_account1)
+        with self.assertRaises(IconScoreException) as e:
+            self.score.burn(11)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Token is currently on auction")
+        self.assertEqual(self.score.ownerOf(11), self.test_account1)
+        self.assertEqual(self.score.get_batched_auction_info(11)['bid_count'], 1)
+
+    def test_settle_auction_sends_token_to_highest_bid_and_returns_other_bids(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.create_batched_auction(11, 1000, 1)
+        bidder = Address.from_string(f"hx{'3' * 40}")
+        self.initialize_accounts({bidder: 10 ** 21})
+        for sender, amount in ((self.test_account2, 1000), (bidder, 3000), (self.test_account2, 3000)):
+            self.set_msg(sender, amount)
+            with patch.object(self.score, 'BidCollected') as collected_event:
+                self.score.place_batched_bid(11)
+            collected_event.assert_called_once_with(sender, 11, amount)
+
+        self.assertEqual(self.score.get_batched_auction_info(11)['bid_count'], 3)
+        self.set_msg(self.test_account1)
+        with self.assertRaises(IconScoreException) as e:
+            self.score.transfer(self.test_account2, 11)
+        self.assertEqual(e.exception.message, "Token is currently on auction")
+
+        self.set_block(1, self.score._batched_auction_end_time(11).get() + 1)
+        self.set_msg(self.test_account2)
+        with patch.object(self.score.icx, 'transfer') as icx_transfer:
+            self.score.settle_auction(11)
+
+        self.assertEqual(icx_transfer.call_args_list, [((self.test_account1, 3000),)])
+        self.assertEqual(self.score.refund_balance(self.test_account2), 4000)
+        self.assertEqual(self.score.ownerOf(11), bidder)
+        self.assertEqual(self.score.get_token_price(11), 0)
+        self.assertEqual(self.score._batched_auction_bid(11, 2).get(), '')
+        self.assertEqual(self.score._batched_auction_bid_count(11).get(), 0)
+        record = self.score.get_sale_record(1)
+        self.assertEqual((record['type'], record['buyer'], record['final_price']), ('auction_success', bidder, 3000))
+
+    def test_settle_auction_processes_bids_in_batches(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.create_batched_auction(11, 1000, 1)
+        for amount in (1000, 3000, 2000):
+            self.set_msg(self.test_account2, amount)
+            self.score.place_batched_bid(11)
+
+        self.set_block(1, self.score._batched_auction_end_time(11).get() + 1)
+        with patch.object(self.score, '_MAX_ITERATION_LOOP', 2):
+            self.score.settle_auction(11)
+            self.assertEqual(self.score.get_batched_auction_info(11)['settled_bids'], 2)
+            self.assertEqual(self.score._batched_auction_best_bid(11).get(), 2)
+            self.score.settle_auction(11)
+
+        self.assertEqual(self.score.ownerOf(11), self.test_account2)
+        self.assertEqual(self.score.get_sale_record(1)['final_price'], 3000)
+
+    def test_settle_auction_without_bids_keeps_token_with_seller(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.create_batched_auction(11, 1000, 1)
+
+        self.set_block(1, self.score._batched_auction_end_time(11).get() + 1)
+        with patch.object(self.score, 'AuctionUnsold') as unsold_event:
+            self.score.settle_auction(11)
+
+        unsold_event.assert_called_once_with(self.test_account1, 11)
+        self.assertEqual(self.score.ownerOf(11), self.test_account1)
+        self.assertEqual(self.score.total_listed_token_count(), 0)
+        self.assertEqual(self.score.get_sale_record(1)['type'], 'auction_unsold')
 
+    def test_settle_auction_throws_when_auction_is_active(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.create_batched_auction(11, 1000, 1)
+
+        with self.assertRaises(IconScoreException) as e:
+            self.score.settle_auction(11)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Auction has not ended yet")
+
+    def test_place_batched_bid_throws_when_auction_has_ended(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.create_batched_auction(11, 1000, 1)
+
+        self.set_block(1, self.score._batched_auction_end_time(11).get() + 1)
+        self.set_msg(self.test_account2, 1000)
+        with self.assertRaises(IconScoreException) as e:
+            self.score.place_batched_bid(11)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Can not place a bid. The auction has already ended.")
+
+    def _make_offers(self, _token_id: int, _amounts: list, _duration_in_hours: int = 168) -> list:
+        bidders = [Address.from_string(f"hx{str(index + 3) * 40}") for index in range(len(_amounts))]
+        self.initialize_accounts({bidder: 10 ** 21 for bidder in bidders})
+        for bidder, amount in zip(bidders, _amounts):
+            self.set_msg(bidder, amount)
+            self.score.make_offer(_token_id, _duration_in_hours)
+        return bidders
+
+    def test_offers_for_token_are_sorted_by_amount(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        bidders = self._make_offers(11, [1000, 3000, 2000, 3000])
+
+        offers = self.score.offers_for_token(11)
+
+        self.assertEqual([(offer['bidder'], offer['amount']) for offer in offers],
+                         [(bidders[1], 3000), (bidders[3], 3000), (bidders[2], 2000), (bidders[0], 1000)])
+        self.assertEqual([offer['amount'] for offer in self.score.offers_for_token(11, 2, 1)], [2000])
+        self.assertEqual(self.score.token_offer_count(11), 4)
+        self.assertEqual(self.score._offer_tail(11).get(), bidders[0])
+
+    def test_accept_offer_sells_token_for_highest_offer(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.list_token(11, 5000)
+        bidders = self._make_offers(11, [1000, 3000, 2000])
+
+        self.set_msg(self.test_account1)
+        with patch.object(self.score.icx, 'transfer') as icx_transfer:
+            with patch.object(self.score, 'OfferAccepted') as accepted_event:
+                self.score.accept_offer(11)
+
+        icx_transfer.assert_any_call(self.test_account1, 3000)
+        accepted_event.assert_called_once_with(self.test_account1, bidders[1], 11, 3000)
+        self.assertEqual(self.score.ownerOf(11), bidders[1])
+        self.assertEqual(self.score.get_token_price(11), 0)
+        self.assertEqual([offer['amount'] for offer in self.score.offers_for_token(11)], [2000, 1000])
+        record = self.score.get_sale_record(1)
+        self.assertEqual((record['type'], record['buyer'], record['final_price']), ('offer_accepted', bidders[1], 3000))
+
+    def test_accept_offer_of_given_bidder(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        bidders = self._make_offers(11, [1000, 3000])
+
+        self.set_msg(self.test_account1)
+        self.score.accept_offer(11, bidders[0])
+
+        self.assertEqual(self.score.ownerOf(11), bidders[0])
+        self.assertEqual(self.score._offer_head(11).get(), bidders[1])
+        self.assertEqual(self.score._offer_tail(11).get(), bidders[1])
+
+    def test_cancel_offer_returns_deposit(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        bidders = self._make_offers(11, [1000, 3000, 2000])
+
+        self.set_msg(bidders[2])
+        with patch.object(self.score.icx, 'transfer') as icx_transfer:
+            self.score.cancel_offer(11)
+
+        icx_transfer.assert_called_once_with(bidders[2], 2000)
+        self.assertEqual([offer['amount'] for offer in self.score.offers_for_token(11)], [3000, 1000])
+        self.assertEqual(self.score._offer(11, bidders[2]).get(), '')
+        self.assertEqual(self.score.token_offer_count(11), 2)
+
+    def test_expired_offers_are_returned_by_later_offer(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        bidders = self._make_offers(11, [1000, 3000], 1)
+        self.set_block(1, self.score.now() + 2 * 3600 * 1000 * 1000)
+        self.assertEqual(self.score.offers_for_token(11), [])
+
+        self.set_msg(self.test_account2, 2000)
+        with patch.object(self.score.icx, 'transfer') as icx_transfer:
+            self.score.make_offer(11)
+
+        icx_transfer.assert_not_called()
+        self.assertEqual(self.score.refund_balance(bidders[0]), 1000)
+        self.assertEqual(self.score.refund_balance(bidders[1]), 3000)
+        self.assertEqual(self.score.token_offer_count(11), 1)
+        self.assertEqual(self.score.offers_for_token(11)[0]['bidder'], self.test_account2)
+
+    def test_accept_offer_skips_expired_offers(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self._make_offers(11, [3000], 1)
+        self.set_msg(self.test_account2, 1000)
+        self.score.make_offer(11, 24)
+        self.set_block(1, self.score.now() + 2 * 3600 * 1000 * 1000)
+
+        self.set_msg(self.test_account1)
+        self.score.accept_offer(11)
+
+        self.assertEqual(self.score.ownerOf(11), self.test_account2)
+        self.assertEqual(self.score.get_sale_record(1)['final_price'], 1000)
+        self.assertEqual(self.score.token_offer_count(11), 0)
+
+    def test_accept_offer_skips_offer_of_owner(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        bidders = self._make_offers(11, [1000, 3000])
+        self.set_msg(self.test_account1)
+        self.score.transfer(bidders[1], 11)
+
+        self.assertEqual([offer['bidder'] for offer in self.score.offers_for_token(11)], [bidders[0]])
+        self.set_msg(bidders[1])
+        with self.assertRaises(IconScoreException) as e:
+            self.score.accept_offer(11, bidders[1])
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "You can not accept your own offer")
+
+        self.score.accept_offer(11)
+
+        self.assertEqual(self.score.ownerOf(11), bidders[0])
+        record = self.score.get_sale_record(1)
+        self.assertEqual((record['seller'], record['buyer'], record['final_price']), (bidders[1], bidders[0], 1000))
+        self.assertEqual([offer['bidder'] for offer in self.score.offers_for_token(11)], [bidders[1]])
+        self.assertEqual(self.score.refund_balance(bidders[1]), 0)
+
+    def test_accept_offer_throws_when_only_offer_is_owners(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        bidders = self._make_offers(11, [1000])
+        self.set_msg(self.test_account1)
+        self.score.transfer(bidders[0], 11)
+
+        self.set_msg(bidders[0])
+        with self.assertRaises(IconScoreException) as e:
+            self.score.accept_offer(11)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Offer does not exist")
+        self.assertEqual(self.score.token_offer_count(11), 1)
+
+    def test_make_offer_returns_lowest_offer_when_token_has_maximum_offers(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        with patch.object(self.score, '_MAX_TOKEN_OFFERS', 2):
+            bidders = self._make_offers(11, [2000, 1000])
+            self.set_msg(self.test_account2, 1500)
+            self.score.make_offer(11)
+
+        self.assertEqual([offer['bidder'] for offer in self.score.offers_for_token(11)],
+                         [bidders[0], self.test_account2])
+        self.assertEqual(self.score.refund_balance(bidders[1]), 1000)
+
+    def test_withdraw_refund_sends_returned_offers(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.mint(self.test_account1, 12, "12.json")
+        for token_id in (11, 12):
+            self.set_msg(self.test_account2, token_id * 100)
+            self.score.make_offer(token_id, 1)
+        self.set_block(1, self.score.now() + 2 * 3600 * 1000 * 1000)
+        for token_id in (11, 12):
+            bidder = self._make_offers(token_id, [2000])[0]
+        self.assertEqual(self.score.refund_balance(self.test_account2), 2300)
+
+        self.set_msg(self.test_account2)
+        with patch.object(self.score.icx, 'transfer') as icx_transfer:
+            self.score.withdraw_refund()
+
+        icx_transfer.assert_called_once_with(self.test_account2, 2300)
+        self.assertEqual(self.score.refund_balance(self.test_account2), 0)
+        self.assertEqual(self.score.refund_balance(bidder), 0)
+        with self.assertRaises(IconScoreException) as e:
+            self.score.withdraw_refund()
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "There is no refund to withdraw")
+
+    def test_make_offer_throws_when_sender_owns_token(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+
+        self.set_msg(self.test_account1, 1000)
+        with self.assertRaises(IconScoreException) as e:
+            self.score.make_offer(11)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "You can not make an offer for your own token")
+
+    def test_make_offer_throws_when_offer_is_lower_than_lowest_of_maximum_offers(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        with patch.object(self.score, '_MAX_TOKEN_OFFERS', 2):
+            self._make_offers(11, [2000, 1000])
+            self.set_msg(self.test_account2, 1000)
+            with self.assertRaises(IconScoreException) as e:
+                self.score.make_offer(11)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Offer needs to be higher than the lowest offer (1000)")
+
+    def _make_collection_offers(self, _amounts: list) -> list:
+        bidders = [Address.from_string(f"hx{str(index + 3) * 40}") for index in range(len(_amounts))]
+        self.initialize_accounts({bidder: 10 ** 21 for bidder in bidders})
+        for bidder, amount in zip(bidders, _amounts):
+            self.set_msg(bidder, amount)
+            self.score.make_collection_offer()
+        return bidders
+
+    def test_best_collection_offer_is_the_highest_one(self):
+        bidders = self._make_collection_offers([1000, 5000, 3000, 4000, 2000])
+
+        self.assertEqual(self.score.best_collection_offer(), {"offer_id": 2, "bidder": bidders[1], "amount": 5000})
+        self.assertEqual(self.score.open_collection_offer_count(), 5)
+
+        self.set_msg(bidders[1])
+        with patch.object(self.score.icx, 'transfer') as icx_transfer:
+            self.score.cancel_collection_offer(2)
+
+        icx_transfer.assert_called_once_with(bidders[1], 5000)
+        self.assertEqual(self.score.best_collection_offer()['amount'], 4000)
+        self.assertEqual(self.score.open_collection_offer_count(), 4)
+
+    def test_earlier_collection_offer_comes_first_when_amounts_are_equal(self):
+        bidders = self._make_collection_offers([1000, 2000, 1000, 1000])
+        self.set_msg(bidders[1])
+        self.score.cancel_collection_offer(2)
+
+        self.assertEqual(self.score.best_collection_offer(), {"offer_id": 1, "bidder": bidders[0], "amount": 1000})
+
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        with patch.object(self.score, 'CollectionOfferAccepted') as accepted_event:
+            self.score.accept_collection_offer(11)
+
+        accepted_event.assert_called_once_with(1, self.test_account1, bidders[0], 11, 1000)
+        self.assertEqual(self.score.best_collection_offer()['offer_id'], 3)
+
+    def test_accept_collection_offer_sells_token_to_highest_offer(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.score.mint(self.test_account1, 12, "12.json")
+        self.score.list_token(12, 10000)
+        bidders = self._make_collection_offers([1000, 3000, 2000])
+
+        self.set_msg(self.test_account1)
+        with patch.object(self.score.icx, 'transfer') as icx_transfer:
+            with patch.object(self.score, 'CollectionOfferAccepted') as accepted_event:
+                self.score.accept_collection_offer(12)
+        self.score.accept_collection_offer(11)
+
+        icx_transfer.assert_any_call(self.test_account1, 3000)
+        accepted_event.assert_called_once_with(2, self.test_account1, bidders[1], 12, 3000)
+        self.assertEqual(self.score.ownerOf(12), bidders[1])
+        self.assertEqual(self.score.ownerOf(11), bidders[2])
+        self.assertEqual(self.score.get_token_price(12), 0)
+        self.assertEqual(self.score.best_collection_offer()['amount'], 1000)
+        record = self.score.get_sale_record(1)
+        self.assertEqual((record['type'], record['buyer'], record['final_price']),
+                         ('collection_offer_accepted', bidders[1], 3000))
+        with self.assertRaises(IconScoreException) as e:
+            self.score.get_collection_offer(2)
+        self.assertEqual(e.exception.message, "Collection offer does not exist")
+
+    def test_accept_collection_offer_skips_offers_of_token_owner(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        bidders = self._make_collection_offers([1000, 5000, 3000])
+        for amount in (9000, 7000, 8000):
+            self.set_msg(self.test_account1, amount)
+            self.score.make_collection_offer()
+
+        self.set_msg(self.test_account1)
+        self.score.accept_collection_offer(11, 5000)
+
+        self.assertEqual(self.score.ownerOf(11), bidders[1])
+        self.assertEqual(self.score.best_collection_offer()['bidder'], self.test_account1)
+        self.assertEqual(self.score.open_collection_offer_count(), 5)
+
+    def test_accept_collection_offer_throws_when_there_are_only_own_offers(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self.set_msg(self.test_account1, 1000)
+        self.score.make_collection_offer()
+
+        self.set_msg(self.test_account1)
+        with self.assertRaises(IconScoreException) as e:
+            self.score.accept_collection_offer(11)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "There are no collection offers from other accounts")
+
+    def test_accept_collection_offer_throws_when_highest_offer_is_lower_than_minimum(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+        self._make_collection_offers([1000])
+
+        self.set_msg(self.test_account1)
+        with self.assertRaises(IconScoreException) as e:
+            self.score.accept_collection_offer(11, 2000)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Highest collection offer (1000) is lower than minimum amount (2000)")
+
+    def test_accept_collection_offer_throws_when_there_are_no_offers(self):
+        self.set_msg(self.test_account1)
+        self.score.mint(self.test_account1, 11, "11.json")
+
+        with self.assertRaises(IconScoreException) as e:
+            self.score.accept_collection_offer(11)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "There are no collection offers")
+
+    def test_cancel_collection_offer_throws_when_sender_did_not_make_it(self):
+        self._make_collection_offers([1000])
+
+        self.set_msg(self.test_account2)
+        with self.assertRaises(IconScoreException) as e:
+            self.score.cancel_collection_offer(1)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "You did not make this collection offer")
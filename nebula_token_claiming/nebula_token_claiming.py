@@ -21,8 +21,13 @@ class NebulaTokenClaiming(IconScoreBase):
     _DISTRIBUTOR = 'distributor'  # Role responsible for sending out tokens claimed in-game
     _WHITELIST_DURATION = 'whitelist_duration'  # Duration of how long a whitelist record is valid for (in minutes)
     _TOTAL_LISTED_TOKEN_COUNT = 'total_listed_token_count'  # Tracks total number of listed tokens
+    _WHITELIST_QUEUE_HEAD = 'whitelist_queue_head'  # Position of the oldest whitelist record that is not yet pruned
+    _WHITELIST_QUEUE_TAIL = 'whitelist_queue_tail'  # Position of the most recently added whitelist record
     _ICX_TO_LOOPS = 1000000000000000000
 
+    _MAX_ITERATION_LOOP = 100
+    _WHITELIST_PRUNE_BATCH = 2  # Number of expired whitelist records pruned with each new whitelist record
+
     def __init__(self, db: IconScoreDatabase) -> None:
         super().__init__(db)
         self._nft_contract_address = VarDB(self._NFT_CONTRACT_ADDRESS, db, value_type=Address)
@@ -32,6 +37,8 @@ class NebulaTokenClaiming(IconScoreBase):
         self._distributor = VarDB(self._DISTRIBUTOR, db, value_type=Address)
         self._whitelist_duration = VarDB(self._WHITELIST_DURATION, db, value_type=int)
         self._total_listed_token_count = VarDB(self._TOTAL_LISTED_TOKEN_COUNT, db, value_type=int)
+        self._whitelist_queue_head = VarDB(self._WHITELIST_QUEUE_HEAD, db, value_type=int)
+        self._whitelist_queue_tail = VarDB(self._WHITELIST_QUEUE_TAIL, db, value_type=int)
 
         self._db = db
 
@@ -135,6 +142,15 @@ class NebulaTokenClaiming(IconScoreBase):
     def _user_token_whitelist_modified_price(self, _token_id: int, _address: Address) -> VarDB:
         return VarDB(f'WHITELIST_TOKEN_{str(_token_id)}_ADDRESS_{str(_address)}_MODIFIED_PRICE', self._db, value_type=int)
 
+    def _whitelist_queue_token_id(self, _position: int) -> VarDB:
+        return VarDB(f'WHITELIST_QUEUE_{str(_position)}_TOKEN_ID', self._db, value_type=int)
+
+    def _whitelist_queue_address(self, _position: int) -> VarDB:
+        return VarDB(f'WHITELIST_QUEUE_{str(_position)}_ADDRESS', self._db, value_type=Address)
+
+    def _whitelist_queue_time(self, _position: int) -> VarDB:
+        return VarDB(f'WHITELIST_QUEUE_{str(_position)}_TIME', self._db, value_type=int)
+
     @external(readonly=True)
     def total_listed_token_count(self) -> int:
         """ Returns total number of tokens listed for claims. """
@@ -228,8 +244,73 @@ class NebulaTokenClaiming(IconScoreBase):
         if _modified_price < token_price / 2:
             revert('Modified price is too low')
 
-        self._user_token_whitelist_time(_token_id, _address).set(self.now())
+        self._prune_expired_whitelists(self._WHITELIST_PRUNE_BATCH)
+
+        whitelist_time = self.now()
+        self._user_token_whitelist_time(_token_id, _address).set(whitelist_time)
         self._user_token_whitelist_modified_price(_token_id, _address).set(_modified_price)
+        self._enqueue_whitelist_record(_token_id, _address, whitelist_time)
+
+    def _remove_whitelist_record(self, _token_id: int, _address: Address):
+        self._user_token_whitelist_time(_token_id, _address).remove()
+        self._user_token_whitelist_modified_price(_token_id, _address).remove()
+
+    def _enqueue_whitelist_record(self, _token_id: int, _address: Address, _whitelist_time: int):
+        """
+        Appends a whitelist record to the expiry queue. Records are created in time order and share the same
+        duration, so the queue is also ordered by expiration time.
+        """
+        position = self._whitelist_queue_tail.get() + 1
+        self._whitelist_queue_token_id(position).set(_token_id)
+        self._whitelist_queue_address(position).set(_address)
+        self._whitelist_queue_time(position).set(_whitelist_time)
+        self._whitelist_queue_tail.set(position)
+
+    def _remove_whitelist_queue_entry(self, _position: int):
+        self._whitelist_queue_token_id(_position).remove()
+        self._whitelist_queue_address(_position).remove()
+        self._whitelist_queue_time(_position).remove()
+
+    @external
+    def prune_expired_whitelists(self, _max_count: int):
+        """
+        Deletes up to _max_count whitelist records that have expired, were already claimed or whose token
+        is no longer listed. Records are processed from oldest to newest, pruning stops at the first record
+        that is still valid. At most 100 records are processed per call.
+        """
+        if _max_count <= 0:
+            revert('Max count needs to be greater than 0')
+        if self._MAX_ITERATION_LOOP < _max_count:
+            _max_count = self._MAX_ITERATION_LOOP
+
+        self._prune_expired_whitelists(_max_count)
+
+    def _prune_expired_whitelists(self, _max_count: int):
+        head = self._whitelist_queue_head.get()
+        tail = self._whitelist_queue_tail.get()
+        whitelist_duration = self._whitelist_duration.get() * 60 * 1000 * 1000
+        now = self.now()
+
+        processed_count = 0
+        while head < tail and processed_count < _max_count:
+            position = head + 1
+            token_id = self._whitelist_queue_token_id(position).get()
+            address = self._whitelist_queue_address(position).get()
+            whitelist_time = self._user_token_whitelist_time(token_id, address).get()
+
+            # Record is removed only when this queue entry is its latest one (it was not claimed or renewed since)
+            if whitelist_time == self._whitelist_queue_time(position).get():
+                is_expired = now >= whitelist_time + whitelist_duration
+                if not is_expired and self._token_base_price(token_id).get():
+                    break
+                self._remove_whitelist_record(token_id, address)
+
+            self._remove_whitelist_queue_entry(position)
+            head = position
+            processed_count += 1
+
+        if processed_count:
+            self._whitelist_queue_head.set(head)
 
     @external(readonly=True)
     def get_whitelist_record(self, _token_id: int, _address: Address) -> dict:
@@ -274,19 +355,62 @@ class NebulaTokenClaiming(IconScoreBase):
             revert(f'Sent ICX amount needs to be greater than 0')
 
         # Check if address (sender) and token is whitelisted (and not expired)
-        whitelist_record = self.get_whitelist_record(_token_id, sender)
-        if not whitelist_record:
+        whitelist_duration = self._whitelist_duration.get() * 60 * 1000 * 1000
+        modified_price = self._get_valid_whitelist_price(_token_id, sender, whitelist_duration)
+
+        # Check that payable amount matches modified_price
+        if self.msg.value != modified_price:
+            revert(f'Whitelist record price does not match sent amount')
+
+        self._claim_token(_token_id, sender)
+
+    @external
+    @payable
+    def claim_tokens(self, _token_ids: List[int]):
+        """
+        Method is used for claiming several previously whitelisted tokens in one transaction.
+        Sent ICX amount has to match the sum of whitelist record prices. Maximum 100 tokens can be claimed at once.
+        Throws when address is not whitelisted for any of the tokens or when any whitelisting has expired.
+        Throws when sending ICX that doesn't match total price. Throws when token IDs repeat.
+        """
+        sender = self.msg.sender
+        if not self.msg.value > 0:
+            revert(f'Sent ICX amount needs to be greater than 0')
+        if not _token_ids:
+            revert('No tokens to claim')
+        if len(_token_ids) > self._MAX_ITERATION_LOOP:
+            revert(f'Can not claim more than {self._MAX_ITERATION_LOOP} tokens at once')
+        if len(set(_token_ids)) != len(_token_ids):
+            revert('Token IDs need to be unique')
+
+        whitelist_duration = self._whitelist_duration.get() * 60 * 1000 * 1000
+        total_price = 0
+        for token_id in _token_ids:
+            total_price += self._get_valid_whitelist_price(token_id, sender, whitelist_duration)
+
+        if self.msg.value != total_price:
+            revert(f'Whitelist record prices do not match sent amount')
+
+        for token_id in _token_ids:
+            self._claim_token(token_id, sender)
+
+    def _get_valid_whitelist_price(self, _token_id: int, _address: Address, _whitelist_duration: int) -> int:
+        """
+        Returns modified price of a whitelist record. Throws when address is not whitelisted for the token
+        or when whitelisting is no longer valid.
+        """
+        whitelist_time = self._user_token_whitelist_time(_token_id, _address).get()
+        if whitelist_time == 0:
             revert(f'This address is not whitelisted for token_id {_token_id}')
 
-        is_valid = whitelist_record["valid"]
-        if not is_valid:
+        if not self._token_base_price(_token_id).get() or self.now() >= whitelist_time + _whitelist_duration:
             revert(f'Whitelist is not valid')
 
-        # Check that payable amount matches modified_price
-        if self.msg.value != whitelist_record["modified_price"]:
-            revert(f'Whitelist record price does not match sent amount')
+        return self._user_token_whitelist_modified_price(_token_id, _address).get()
 
-        self._transferToken(sender, _token_id)
+    def _claim_token(self, _token_id: int, _address: Address):
+        self._remove_whitelist_record(_token_id, _address)
+        self._transferToken(_address, _token_id)
         self._delist_token(_token_id)
 
 
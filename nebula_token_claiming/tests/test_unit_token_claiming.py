@@ -10,6 +10,10 @@ class TestNebulaTokenClaiming(ScoreTestCase):
         self.mock_score_address = Address.from_string(f"cx{'1234'*10}")
         self.score = self.get_score_instance(NebulaTokenClaiming, self.test_account1)
 
+        self.set_msg(self.test_account1)
+        self.score.set_nonfungible_token_contract(self.mock_score_address)
+        self.patch_internal_method(self.mock_score_address, 'ownerOf', lambda _tokenId: self.score.address)
+
     def test_initializes_roles(self):
         self.assertEqual(self.score._director.get(), self.test_account1)
         self.assertEqual(self.score._treasurer.get(), self.test_account1)
@@ -180,3 +184,138 @@ class TestNebulaTokenClaiming(ScoreTestCase):
         self.assertEqual(e.exception.code, 32)
         self.assertEqual(e.exception.message, "Sent ICX amount needs to be greater than 0")
 
+
+    def test_claim_token_removes_whitelist_record(self):
+        self.set_msg(self.test_account1)
+        self.score.list_token(1, 100000000000000000)
+        self.score.add_whitelist_record(1, self.test_account2, 80000000000000000)
+
+        self.set_msg(self.test_account2, 80000000000000000)
+        self.score.claim_token(1)
+
+        self.assertEqual(self.score.get_whitelist_record(1, self.test_account2), {})
+
+    def test_prune_expired_whitelists(self):
+        self.set_msg(self.test_account1)
+        self.set_block(1, 1000)
+        self.score.list_token(1, 100000000000000000)
+        self.score.list_token(2, 100000000000000000)
+        self.score.add_whitelist_record(1, self.test_account2, 80000000000000000)
+        self.set_block(2, 2000)
+        self.score.add_whitelist_record(2, self.test_account2, 80000000000000000)
+
+        self.set_block(3, 1000 + 60 * 60 * 1000 * 1000)
+        self.score.prune_expired_whitelists(10)
+
+        self.assertEqual(self.score.get_whitelist_record(1, self.test_account2), {})
+        self.assertEqual(self.score.get_whitelist_record(2, self.test_account2)['valid'], True)
+
+    def test_prune_expired_whitelists_respects_max_count(self):
+        self.set_msg(self.test_account1)
+        self.set_block(1, 1000)
+        self.score.list_token(1, 100000000000000000)
+        self.score.list_token(2, 100000000000000000)
+        self.score.add_whitelist_record(1, self.test_account2, 80000000000000000)
+        self.score.add_whitelist_record(2, self.test_account2, 80000000000000000)
+
+        self.set_block(2, 2000 + 60 * 60 * 1000 * 1000)
+        self.score.prune_expired_whitelists(1)
+
+        self.assertEqual(self.score.get_whitelist_record(1, self.test_account2), {})
+        self.assertEqual(self.score.get_whitelist_record(2, self.test_account2)['valid'], False)
+
+    def test_prune_expired_whitelists_keeps_renewed_record(self):
+        self.set_msg(self.test_account1)
+        self.set_block(1, 1000)
+        self.score.list_token(1, 100000000000000000)
+        self.score.add_whitelist_record(1, self.test_account2, 80000000000000000)
+        self.set_block(2, 1000 + 30 * 60 * 1000 * 1000)
+        self.score.add_whitelist_record(1, self.test_account2, 90000000000000000)
+
+        self.set_block(3, 1000 + 60 * 60 * 1000 * 1000)
+        self.score.prune_expired_whitelists(10)
+
+        record = self.score.get_whitelist_record(1, self.test_account2)
+        self.assertEqual(record['valid'], True)
+        self.assertEqual(record['modified_price'], 90000000000000000)
+
+    def test_prune_expired_whitelists_removes_records_of_delisted_tokens(self):
+        self.set_msg(self.test_account1)
+        self.score.list_token(1, 100000000000000000)
+        self.score.add_whitelist_record(1, self.test_account2, 80000000000000000)
+        self.score.delist_token(1)
+
+        self.score.prune_expired_whitelists(10)
+
+        self.assertEqual(self.score.get_whitelist_record(1, self.test_account2), {})
+
+    def test_throws_when_pruning_with_non_positive_max_count(self):
+        self.set_msg(self.test_account1)
+
+        with self.assertRaises(IconScoreException) as e:
+            self.score.prune_expired_whitelists(0)
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Max count needs to be greater than 0")
+
+    def test_claim_tokens(self):
+        self.set_msg(self.test_account1)
+        self.score.list_token(1, 100000000000000000)
+        self.score.list_token(2, 200000000000000000)
+        self.score.add_whitelist_record(1, self.test_account2, 80000000000000000)
+        self.score.add_whitelist_record(2, self.test_account2, 150000000000000000)
+
+        self.set_msg(self.test_account2, 230000000000000000)
+        self.score.claim_tokens([1, 2])
+
+        self.assertEqual(self.score.total_listed_token_count(), 0)
+        self.assertEqual(self.score.get_whitelist_record(1, self.test_account2), {})
+        self.assertEqual(self.score.get_whitelist_record(2, self.test_account2), {})
+
+    def test_throws_when_claiming_tokens_with_wrong_amount(self):
+        self.set_msg(self.test_account1)
+        self.score.list_token(1, 100000000000000000)
+        self.score.list_token(2, 200000000000000000)
+        self.score.add_whitelist_record(1, self.test_account2, 80000000000000000)
+        self.score.add_whitelist_record(2, self.test_account2, 150000000000000000)
+
+        with self.assertRaises(IconScoreException) as e:
+            self.set_msg(self.test_account2, 80000000000000000)
+            self.score.claim_tokens([1, 2])
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Whitelist record prices do not match sent amount")
+
+    def test_throws_when_claiming_tokens_with_one_not_whitelisted(self):
+        self.set_msg(self.test_account1)
+        self.score.list_token(1, 100000000000000000)
+        self.score.list_token(2, 200000000000000000)
+        self.score.add_whitelist_record(1, self.test_account2, 80000000000000000)
+
+        with self.assertRaises(IconScoreException) as e:
+            self.set_msg(self.test_account2, 280000000000000000)
+            self.score.claim_tokens([1, 2])
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "This address is not whitelisted for token_id 2")
+
+    def test_throws_when_claiming_tokens_with_duplicate_ids(self):
+        self.set_msg(self.test_account1)
+        self.score.list_token(1, 100000000000000000)
+        self.score.add_whitelist_record(1, self.test_account2, 80000000000000000)
+
+        with self.assertRaises(IconScoreException) as e:
+            self.set_msg(self.test_account2, 160000000000000000)
+            self.score.claim_tokens([1, 1])
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Token IDs need to be unique")
+
+    def test_throws_when_claiming_expired_whitelist(self):
+        self.set_msg(self.test_account1)
+        self.set_block(1, 1000)
+        self.score.list_token(1, 100000000000000000)
+        self.score.add_whitelist_record(1, self.test_account2, 80000000000000000)
+
+        with self.assertRaises(IconScoreException) as e:
+            self.set_block(2, 1000 + 60 * 60 * 1000 * 1000)
+            self.set_msg(self.test_account2, 80000000000000000)
+            self.score.claim_tokens([1])
+        self.assertEqual(e.exception.code, 32)
+        self.assertEqual(e.exception.message, "Whitelist is not valid")